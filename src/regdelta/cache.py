@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Iterable
+
+from regdelta import codec
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used INTEGER NOT NULL
+)
+"""
+
+
+def cache_key(*parts: Any) -> str:
+    return hashlib.sha256(codec.dumpb(parts, sort_keys=True)).hexdigest()
+
+
+class LRUCache:
+    # Persistent JSON value cache in a single SQLite file. Reads refresh the
+    # entry's recency; writes evict least recently used entries until both
+    # the entry count and the total payload size are within bounds.
+
+    def __init__(self, path: Path, max_entries: int = 10000, max_bytes: int = 64 << 20) -> None:
+        self.path = path
+        self.max_entries = max(int(max_entries), 1)
+        self.max_bytes = max(int(max_bytes), 1)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(path), timeout=30.0)
+        with self._connection:
+            self._connection.execute(_SCHEMA)
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)"
+            )
+
+    def __enter__(self) -> LRUCache:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        wanted = list(dict.fromkeys(keys))
+        found: dict[str, Any] = {}
+        # Stay under SQLite's default bound-parameter limit.
+        for start in range(0, len(wanted), 500):
+            chunk = wanted[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._connection.execute(
+                f"SELECT key, value FROM entries WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            for key, value in rows:
+                found[key] = codec.loads(value)
+        if found:
+            now = time.time_ns()
+            with self._connection:
+                self._connection.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+        self.hits += len(found)
+        self.misses += len(wanted) - len(found)
+        return found
+
+    def get(self, key: str) -> Any | None:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: dict[str, Any]) -> None:
+        if not items:
+            return
+        now = time.time_ns()
+        rows = []
+        for key, value in items.items():
+            payload = codec.dumpb(value)
+            rows.append((key, payload, len(payload), now))
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+
+    def put(self, key: str, value: Any) -> None:
+        self.put_many({key: value})
+
+    def _evict(self) -> None:
+        count, total = self._connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        stale: list[tuple[str]] = []
+        for key, size in self._connection.execute(
+            "SELECT key, size FROM entries ORDER BY last_used, key"
+        ):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            stale.append((key,))
+            count -= 1
+            total -= size
+        self._connection.executemany("DELETE FROM entries WHERE key = ?", stale)
+        self.evictions += len(stale)
+
+    def stats(self) -> dict[str, Any]:
+        count, total = self._connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        return {
+            "path": str(self.path),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": int(count),
+            "bytes": int(total),
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
@@ -15,6 +15,11 @@ def _parser() -> argparse.ArgumentParser:
         p.add_argument("--config", default="configs/base.json", help="Path to base config")
         p.add_argument("--profile", default=None, help="Override profile name")
         p.add_argument("--stages", default=None, help="Comma-separated subset of stages")
+        p.add_argument(
+            "--no-generation-cache",
+            action="store_true",
+            help="Regenerate every claim instead of reusing cached LLM output",
+        )
 
     add_common(subparsers.add_parser("plan", help="Print stage execution plan"))
     add_common(subparsers.add_parser("run", help="Run pipeline stages"))
@@ -26,6 +31,8 @@ def main() -> None:
     args = _parser().parse_args()
     repo_root = Path(__file__).resolve().parents[2]
     config = load_config(args.config, args.profile)
+    if args.no_generation_cache:
+        config.setdefault("generation", {}).setdefault("cache", {})["enabled"] = False
     stages = resolve_stage_list(config, args.stages)
 
     if args.command == "plan":
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+# Fastest available backend wins: orjson, then msgspec, then the stdlib.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Every backend reports malformed input as a ValueError subclass.
+DecodeError: type[ValueError]
+if orjson is not None:
+    BACKEND = "orjson"
+    DecodeError = orjson.JSONDecodeError
+elif msgspec is not None:
+    BACKEND = "msgspec"
+    DecodeError = ValueError
+    _MSGSPEC_ENCODER = msgspec.json.Encoder()
+else:
+    BACKEND = "json"
+    DecodeError = json.JSONDecodeError
+
+
+def loads(data: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    if msgspec is not None:
+        try:
+            return msgspec.json.decode(data)
+        except msgspec.DecodeError as exc:
+            raise ValueError(str(exc)) from exc
+    return json.loads(data)
+
+
+def dumpb(obj: Any, pretty: bool = False, sort_keys: bool = False) -> bytes:
+    # Non-ASCII is always written as UTF-8, matching ensure_ascii=False.
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=option)
+    if msgspec is not None and not pretty and not sort_keys:
+        return _MSGSPEC_ENCODER.encode(obj)
+    return json.dumps(
+        obj,
+        ensure_ascii=False,
+        indent=2 if pretty else None,
+        separators=None if pretty else (",", ":"),
+        sort_keys=sort_keys,
+    ).encode("utf-8")
+
+
+def dumps(obj: Any, pretty: bool = False, sort_keys: bool = False) -> str:
+    return dumpb(obj, pretty=pretty, sort_keys=sort_keys).decode("utf-8")
+
+
+def read(path: str | Path) -> Any:
+    return loads(Path(path).read_bytes())
+
+
+def load_artifact(path: str | None) -> dict[str, Any] | None:
+    if not path:
+        return None
+    payload_path = Path(path)
+    if not payload_path.exists():
+        return None
+    loaded = read(payload_path)
+    if not isinstance(loaded, dict):
+        return None
+    return loaded
+
+
+def write(path: Path, obj: Any, pretty: bool = False) -> Path:
+    path.write_bytes(dumpb(obj, pretty=pretty))
+    return path
+
+
+def write_atomic(path: Path, obj: Any, pretty: bool = False) -> Path:
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    write(tmp_path, obj, pretty=pretty)
+    os.replace(tmp_path, path)
+    return path
+
+
+def pretty_output(config: dict[str, Any]) -> bool:
+    return bool(config.get("runtime", {}).get("pretty_json", False))
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import bz2
+import gzip
+import io
+import lzma
+import queue
+import threading
+from pathlib import Path
+from typing import IO, Any, BinaryIO
+
+try:  # optional dependency
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODECS = ("gzip", "bz2", "xz", "zstd")
+
+EXTENSIONS = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+    ".lzma": "xz",
+    ".zst": "zstd",
+    ".zstd": "zstd",
+}
+
+_MAGIC = (
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+)
+
+_READ_CHUNK = 1 << 20
+_READ_AHEAD = 4
+
+
+def codec_for_extension(path: Path) -> str | None:
+    return EXTENSIONS.get(path.suffix.lower())
+
+
+def detect(path: Path) -> str | None:
+    codec = codec_for_extension(path)
+    if codec is not None:
+        return codec
+    try:
+        with path.open("rb") as f:
+            head = f.read(6)
+    except OSError:
+        return None
+    for magic, name in _MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def suffix(codec: str | None) -> str:
+    if not codec or codec == "none":
+        return ""
+    for extension, name in EXTENSIONS.items():
+        if name == codec:
+            return extension
+    raise ValueError(f"Unsupported compression '{codec}'. Use one of {list(CODECS)} or 'none'.")
+
+
+def _require_zstandard() -> Any:
+    if zstandard is None:
+        raise ValueError("zstd compression requires the optional 'zstandard' package")
+    return zstandard
+
+
+class _ThreadedReader(io.RawIOBase):
+    # Decompresses on a background thread into a bounded queue of chunks, so
+    # the consumer parses one chunk while the next is being inflated
+    # (zlib/bz2/lzma release the GIL while they work).
+
+    def __init__(self, stream: BinaryIO, chunk_size: int = _READ_CHUNK, depth: int = _READ_AHEAD) -> None:
+        super().__init__()
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max(depth, 1))
+        self._stop = threading.Event()
+        self._pending = memoryview(b"")
+        self._eof = False
+        self._thread = threading.Thread(target=self._pump, name="regdelta-decompress", daemon=True)
+        self._thread.start()
+
+    def _put(self, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _pump(self) -> None:
+        try:
+            while True:
+                chunk = self._stream.read(self._chunk_size)
+                if not self._put(chunk) or not chunk:
+                    return
+        except BaseException as exc:  # surfaced to the reading thread
+            self._put(exc)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        if not self._pending and not self._eof:
+            item = self._queue.get()
+            if isinstance(item, BaseException):
+                raise item
+            if not item:
+                self._eof = True
+            self._pending = memoryview(item)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._stream.close()
+        super().close()
+
+
+def _open_decompressor(path: Path, codec: str) -> BinaryIO:
+    if codec == "gzip":
+        return gzip.open(path, "rb")
+    if codec == "bz2":
+        return bz2.open(path, "rb")
+    if codec == "xz":
+        return lzma.open(path, "rb")
+    if codec == "zstd":
+        return _require_zstandard().ZstdDecompressor().stream_reader(path.open("rb"), closefd=True)
+    raise ValueError(f"Unsupported compression '{codec}'")
+
+
+def open_binary(path: Path, threaded: bool = True) -> BinaryIO:
+    codec = detect(path)
+    if codec is None:
+        return path.open("rb")
+    stream = _open_decompressor(path, codec)
+    if not threaded:
+        return stream
+    return io.BufferedReader(_ThreadedReader(stream), buffer_size=_READ_CHUNK)  # type: ignore[return-value]
+
+
+def open_text(path: Path, mode: str = "r", codec: str | None = None) -> IO[str]:
+    if mode == "r":
+        return io.TextIOWrapper(open_binary(path), encoding="utf-8")
+    if mode != "w":
+        raise ValueError(f"Unsupported mode '{mode}'")
+    codec = codec or codec_for_extension(path)
+    if codec is None or codec == "none":
+        return path.open("w", encoding="utf-8")
+    if codec == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8")
+    if codec == "bz2":
+        return bz2.open(path, "wt", encoding="utf-8")
+    if codec == "xz":
+        return lzma.open(path, "wt", encoding="utf-8")
+    if codec == "zstd":
+        writer = _require_zstandard().ZstdCompressor().stream_writer(path.open("wb"), closefd=True)
+        return io.TextIOWrapper(writer, encoding="utf-8")
+    raise ValueError(f"Unsupported compression '{codec}'")
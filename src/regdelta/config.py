@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Any
 
+from regdelta import codec
+
 
 def _deep_merge(base: dict[str, Any], override: dict[str, Any]) -> dict[str, Any]:
     out = dict(base)
@@ -16,8 +17,7 @@ def _deep_merge(base: dict[str, Any], override: dict[str, Any]) -> dict[str, Any
 
 
 def load_json(path: Path) -> dict[str, Any]:
-    with path.open("r", encoding="utf-8") as f:
-        loaded = json.load(f)
+    loaded = codec.read(path)
     if not isinstance(loaded, dict):
         raise ValueError(f"Expected mapping in JSON file: {path}")
     return loaded
@@ -41,3 +41,16 @@ def resolve_stage_list(config: dict[str, Any], stages: str | None = None) -> lis
     if stages:
         return [stage.strip() for stage in stages.split(",") if stage.strip()]
     return list(config.get("pipeline", {}).get("enabled_stages", []))
+
+
+def resolve_configured_path(context: dict[str, Any], key: str) -> Path | None:
+    value = context.get("config", {}).get("paths", {}).get(key)
+    repo_root = context.get("repo_root")
+    if not value:
+        return None
+    path = Path(str(value))
+    if path.is_absolute():
+        return path
+    if repo_root is None:
+        return None
+    return Path(repo_root) / path
@@ -0,0 +1 @@
+"""Source connectors."""
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import codecs
+import re
+import time
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Iterator
+
+from regdelta import compression
+
+HTML_SUFFIXES = (".html", ".htm", ".xhtml")
+
+_FEED_CHUNK = 64 << 10
+
+# Subtrees that never carry legal text.
+_SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "nav", "header", "footer", "aside", "form", "button"}
+_BLOCK_TAGS = {
+    "address", "article", "blockquote", "br", "dd", "div", "dl", "dt", "h1", "h2", "h3", "h4", "h5",
+    "h6", "hr", "li", "main", "ol", "p", "pre", "section", "table", "tbody", "td", "th", "tr", "ul",
+}
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# Preferred containers for the document body, when the page has one.
+_CONTENT_TAGS = {"main", "article"}
+
+# <meta name|property> -> record field, in priority order per field.
+_META_FIELDS = {
+    "doc_id": ("doc_id", "dc.identifier", "citation_doc_id"),
+    "title": ("dc.title", "citation_title", "og:title"),
+    "issuer": ("issuer", "dc.publisher", "dc.creator", "citation_publisher"),
+    "issue_date": ("issue_date", "dc.date.issued", "dc.date", "citation_date", "article:published_time"),
+    "effective_date": ("effective_date", "dc.date.valid", "dcterms.valid"),
+    "replaces_doc_id": ("replaces_doc_id", "dc.relation.replaces", "dcterms.replaces"),
+    "source_url": ("og:url", "dc.source"),
+}
+
+_DATE_PATTERNS = (
+    re.compile(r"(?P<y>\d{4})-(?P<m>\d{1,2})-(?P<d>\d{1,2})"),
+    re.compile(r"(?P<d>\d{1,2})[/.-](?P<m>\d{1,2})[/.-](?P<y>\d{4})"),
+    re.compile(r"ngày\s+(?P<d>\d{1,2})\s+tháng\s+(?P<m>\d{1,2})\s+năm\s+(?P<y>\d{4})", re.IGNORECASE),
+)
+# Only the head of the text is searched for an issue date fallback.
+_DATE_SEARCH_CHARS = 2000
+
+
+def find_date(value: str) -> str | None:
+    for pattern in _DATE_PATTERNS:
+        match = pattern.search(value)
+        if match:
+            year, month, day = int(match["y"]), int(match["m"]), int(match["d"])
+            if 1 <= month <= 12 and 1 <= day <= 31:
+                return f"{year:04d}-{month:02d}-{day:02d}"
+    return None
+
+
+class PortalPageParser(HTMLParser):
+    # Single-pass extraction of a saved portal page: metadata from <title>,
+    # <meta> and the canonical link, and block-structured text with one line
+    # per paragraph/heading/list item so clause segmentation still works.
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.meta: dict[str, str] = {}
+        self.canonical = ""
+        self.title_parts: list[str] = []
+        self.heading_parts: list[str] = []
+        self.body_lines: list[str] = []
+        self.content_lines: list[str] = []
+        self.tag_count = 0
+        self._line: list[str] = []
+        self._skip_depth = 0
+        self._content_depth = 0
+        self._in_title = False
+        self._in_h1 = False
+        self._h1_seen = False
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.tag_count += 1
+        if tag == "meta":
+            values = {name: value or "" for name, value in attrs}
+            key = (values.get("name") or values.get("property") or "").strip().lower()
+            if key and key not in self.meta and values.get("content"):
+                self.meta[key] = values["content"].strip()
+            return
+        if tag == "link":
+            values = {name: value or "" for name, value in attrs}
+            if "canonical" in values.get("rel", "").lower().split() and not self.canonical:
+                self.canonical = values.get("href", "").strip()
+            return
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if tag in _BLOCK_TAGS:
+            self._break()
+        if tag in _CONTENT_TAGS:
+            self._content_depth += 1
+        if tag == "title":
+            self._in_title = True
+        elif tag == "h1" and not self._h1_seen:
+            self._in_h1 = True
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+            return
+        if tag in _BLOCK_TAGS:
+            self._break()
+        if tag in _CONTENT_TAGS:
+            self._content_depth = max(self._content_depth - 1, 0)
+        if tag == "title":
+            self._in_title = False
+        elif tag == "h1" and self._in_h1:
+            self._in_h1 = False
+            self._h1_seen = True
+
+    def handle_data(self, data: str) -> None:
+        if self._in_title:
+            self.title_parts.append(data)
+            return
+        if self._skip_depth:
+            return
+        if self._in_h1:
+            self.heading_parts.append(data)
+        self._line.append(data)
+
+    def _break(self) -> None:
+        line = " ".join("".join(self._line).split())
+        self._line = []
+        if not line:
+            return
+        self.body_lines.append(line)
+        if self._content_depth:
+            self.content_lines.append(line)
+
+    def close(self) -> None:
+        super().close()
+        self._break()
+
+    def record(self) -> dict[str, Any]:
+        record: dict[str, Any] = {}
+        for field, names in _META_FIELDS.items():
+            for name in names:
+                if self.meta.get(name):
+                    record[field] = self.meta[name]
+                    break
+        text = "\n".join(self.content_lines or self.body_lines)
+        title = " ".join("".join(self.title_parts).split())
+        heading = " ".join("".join(self.heading_parts).split())
+        record.setdefault("title", heading or title)
+        record.setdefault("source_url", self.canonical)
+        for field in ("issue_date", "effective_date"):
+            if record.get(field):
+                record[field] = find_date(record[field]) or record[field]
+        if not record.get("issue_date"):
+            record["issue_date"] = find_date(text[:_DATE_SEARCH_CHARS]) or ""
+        record["text"] = text
+        return record
+
+
+def list_files(path: Path) -> list[Path]:
+    if path.is_file():
+        return [path]
+
+    def is_html(item: Path) -> bool:
+        name = item.name.lower()
+        if compression.codec_for_extension(item) is not None:
+            name = name.rsplit(".", 1)[0]
+        return name.endswith(HTML_SUFFIXES)
+
+    return sorted(item for item in path.rglob("*") if item.is_file() and is_html(item))
+
+
+def default_doc_id(path: Path, root: Path) -> str:
+    # Relative path without the HTML/compression suffixes, so mirrored pages
+    # keep stable ids across runs.
+    relative = path.relative_to(root) if root.is_dir() else Path(path.name)
+    name = relative.name
+    if compression.codec_for_extension(relative) is not None:
+        name = name.rsplit(".", 1)[0]
+    for suffix in HTML_SUFFIXES:
+        if name.lower().endswith(suffix):
+            name = name[: -len(suffix)]
+            break
+    return "/".join((*relative.parent.parts, name))
+
+
+def _iter_text(path: Path, encoding: str) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    with compression.open_binary(path) as f:
+        while True:
+            chunk = f.read(_FEED_CHUNK)
+            if not chunk:
+                break
+            yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def parse_file(path: Path, root: Path, encoding: str = "utf-8") -> tuple[dict[str, Any], dict[str, Any]]:
+    started = time.perf_counter()
+    parser = PortalPageParser()
+    for text in _iter_text(path, encoding):
+        parser.feed(text)
+    parser.close()
+    record = parser.record()
+    record.setdefault("doc_id", default_doc_id(path, root))
+    stats = {
+        "path": str(path),
+        "bytes": path.stat().st_size,
+        "tags": parser.tag_count,
+        "text_chars": len(record["text"]),
+        "seconds": round(time.perf_counter() - started, 6),
+    }
+    return record, stats
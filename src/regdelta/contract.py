@@ -1,14 +1,14 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Any
 
+from regdelta import codec
+
 
 def load_pipeline_contract(repo_root: Path, contract_path: str) -> dict[str, Any]:
     full_path = repo_root / contract_path
-    with full_path.open("r", encoding="utf-8") as f:
-        payload = json.load(f)
+    payload = codec.read(full_path)
     if not isinstance(payload, dict):
         raise ValueError(f"Invalid pipeline contract: {full_path}")
     return payload
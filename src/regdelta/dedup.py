@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import hashlib
+import random
+from typing import Any, Sequence
+
+# Permutations are x -> (a * x + b) mod 2**64 with odd a: bijections on the
+# 64-bit shingle hashes, and about twice as cheap as a Mersenne-prime modulus.
+# LSH only proposes candidates; exact Jaccard decides.
+_MASK = (1 << 64) - 1
+
+
+def shingles(tokens: Sequence[str], size: int = 3) -> set[int]:
+    # Word n-grams hashed to 64-bit ints. Texts shorter than one shingle
+    # become a single shingle, so they only match exact copies.
+    size = max(size, 1)
+    grams = [" ".join(tokens[idx : idx + size]) for idx in range(max(len(tokens) - size + 1, 1))]
+    return {
+        int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "little")
+        for gram in grams
+        if gram
+    }
+
+
+def jaccard(left: set[int], right: set[int]) -> float:
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 64, seed: int = 1) -> None:
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [(rng.getrandbits(64) | 1, rng.getrandbits(64)) for _ in range(num_perm)]
+
+    def signature(self, hashes: set[int]) -> tuple[int, ...]:
+        if not hashes:
+            return (_MASK,) * self.num_perm
+        values = list(hashes)
+        return tuple(min([(a * value + b) & _MASK for value in values]) for a, b in self._perms)
+
+
+class NearDuplicateIndex:
+    # Leader clustering over MinHash LSH buckets. Each item is compared only
+    # with the canonical items that share at least one band bucket with it,
+    # and joins the first canonical whose exact shingle Jaccard reaches the
+    # threshold. Comparing against canonicals (never against other
+    # duplicates) keeps clusters from drifting through chains of
+    # near-matches, and a bucket full of copies holds a single canonical.
+    # Items added with the same non-None ``group`` never join each other.
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        num_perm: int = 64,
+        bands: int = 8,
+        shingle_size: int = 3,
+        seed: int = 1,
+    ) -> None:
+        if bands < 1 or num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self._hasher = MinHasher(num_perm, seed)
+        self._buckets: list[dict[tuple[int, ...], list[str]]] = [{} for _ in range(bands)]
+        self._shingles: dict[str, set[int]] = {}
+        self._exact: dict[frozenset[int], str] = {}
+        self._groups: dict[str, Any] = {}
+        self.canonical_of: dict[str, str] = {}
+        self.clusters: dict[str, list[str]] = {}
+        self.items = 0
+        self.comparisons = 0
+
+    def add(
+        self, key: str, tokens: Sequence[str], allow_duplicate: bool = True, group: Any = None
+    ) -> str | None:
+        # Returns the canonical key when ``key`` is a near-duplicate.
+        self.items += 1
+        hashes = shingles(tokens, self.shingle_size)
+        # Verbatim copies (most boilerplate) skip the signature entirely.
+        exact = frozenset(hashes)
+        if allow_duplicate and exact in self._exact and self._joinable(self._exact[exact], group):
+            return self._join(key, self._exact[exact])
+        signature = self._hasher.signature(hashes)
+        band_keys = [
+            signature[band * self.rows : (band + 1) * self.rows] for band in range(self.bands)
+        ]
+
+        if allow_duplicate:
+            seen: set[str] = set()
+            for band, band_key in enumerate(band_keys):
+                for candidate in self._buckets[band].get(band_key, ()):
+                    if candidate in seen or not self._joinable(candidate, group):
+                        continue
+                    seen.add(candidate)
+                    self.comparisons += 1
+                    if jaccard(hashes, self._shingles[candidate]) >= self.threshold:
+                        return self._join(key, candidate)
+
+        self._shingles[key] = hashes
+        self._exact.setdefault(exact, key)
+        if group is not None:
+            self._groups[key] = group
+        self.clusters[key] = []
+        for band, band_key in enumerate(band_keys):
+            self._buckets[band].setdefault(band_key, []).append(key)
+        return None
+
+    def _joinable(self, canonical: str, group: Any) -> bool:
+        return group is None or self._groups.get(canonical) != group
+
+    def _join(self, key: str, canonical: str) -> str:
+        self.canonical_of[key] = canonical
+        self.clusters[canonical].append(key)
+        return canonical
+
+    def duplicate_clusters(self) -> list[dict[str, Any]]:
+        return [
+            {"canonical": canonical, "duplicates": duplicates}
+            for canonical, duplicates in self.clusters.items()
+            if duplicates
+        ]
+
+
+def index_from_config(cfg: dict[str, Any]) -> NearDuplicateIndex:
+    return NearDuplicateIndex(
+        threshold=float(cfg.get("threshold", 0.9)),
+        num_perm=int(cfg.get("num_perm", 64)),
+        bands=int(cfg.get("bands", 8)),
+        shingle_size=int(cfg.get("shingle_size", 3)),
+        seed=int(cfg.get("seed", 1)),
+    )
@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import re
+from collections import Counter, defaultdict, deque
+from typing import Any, Hashable, Sequence
+
+from regdelta import tokenizer
+
+# Words and single punctuation marks, so "30" -> "15" or "." -> ";" are
+# changes of their own.
+_TOKEN = re.compile(r"\w+|[^\w\s]", flags=re.UNICODE)
+
+# Myers search stops after this many edits in a region with no unique
+# anchors; the region is then treated as a block replacement.
+MAX_EDIT_DISTANCE = 2048
+# Block replacements larger than this pair clauses positionally instead of
+# scoring every deleted/inserted combination.
+_MAX_PAIRING_CELLS = 250_000
+
+
+def clause_hash(text: str) -> bytes:
+    # Whitespace-insensitive, so re-wrapped but identical clauses match.
+    return hashlib.blake2b(" ".join(text.split()).encode("utf-8"), digest_size=16).digest()
+
+
+def _lis(pairs: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    # Longest increasing subsequence on the second coordinate (pairs are
+    # sorted by the first), via patience sorting.
+    tails: list[int] = []
+    tail_idx: list[int] = []
+    parents: list[int] = []
+    for idx, (_, j) in enumerate(pairs):
+        pos = bisect.bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_idx.append(idx)
+        else:
+            tails[pos] = j
+            tail_idx[pos] = idx
+        parents.append(tail_idx[pos - 1] if pos else -1)
+    result: list[tuple[int, int]] = []
+    idx = tail_idx[-1] if tail_idx else -1
+    while idx >= 0:
+        result.append(pairs[idx])
+        idx = parents[idx]
+    result.reverse()
+    return result
+
+
+def _unique_anchors(
+    a: Sequence[Hashable], b: Sequence[Hashable], a_lo: int, a_hi: int, b_lo: int, b_hi: int
+) -> list[tuple[int, int]]:
+    a_counts = Counter(a[a_lo:a_hi])
+    b_positions: dict[Hashable, int] = {}
+    b_counts: Counter[Hashable] = Counter()
+    for j in range(b_lo, b_hi):
+        b_counts[b[j]] += 1
+        b_positions[b[j]] = j
+    pairs = [
+        (i, b_positions[a[i]])
+        for i in range(a_lo, a_hi)
+        if a_counts[a[i]] == 1 and b_counts.get(a[i]) == 1
+    ]
+    return _lis(pairs)
+
+
+def _myers(
+    a: Sequence[Hashable], b: Sequence[Hashable], a_lo: int, a_hi: int, b_lo: int, b_hi: int, max_d: int
+) -> list[tuple[int, int]]:
+    n, m = a_hi - a_lo, b_hi - b_lo
+    limit = min(n + m, max_d)
+    v = {1: 0}
+    trace: list[dict[int, int]] = []
+    for d in range(limit + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[a_lo + x] == b[b_lo + y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _myers_backtrack(trace, a_lo, b_lo, n, m, d)
+    return []
+
+
+def _myers_backtrack(
+    trace: list[dict[int, int]], a_lo: int, b_lo: int, n: int, m: int, d: int
+) -> list[tuple[int, int]]:
+    # Walk back from (n, m): at each depth, undo the snake (diagonal run of
+    # matches) and then the single edit that preceded it.
+    matches: list[tuple[int, int]] = []
+    x, y = n, m
+    for depth in range(d, 0, -1):
+        previous = trace[depth]
+        k = x - y
+        if k == -depth or (k != depth and previous[k - 1] < previous[k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = previous[prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            matches.append((a_lo + x, b_lo + y))
+        x, y = prev_x, prev_y
+    while x > 0 and y > 0:
+        x -= 1
+        y -= 1
+        matches.append((a_lo + x, b_lo + y))
+    matches.reverse()
+    return matches
+
+
+def align(
+    a: Sequence[Hashable], b: Sequence[Hashable], max_d: int = MAX_EDIT_DISTANCE
+) -> list[tuple[int, int]]:
+    # Patience diff: common prefix/suffix are matched directly, elements
+    # unique to both sides anchor the alignment (longest increasing run of
+    # them), and the gaps between anchors are solved recursively. Regions
+    # without unique elements fall back to Myers' O(ND) search.
+    matches: list[tuple[int, int]] = []
+    # Explicit stack of regions and anchor matches, popped in output order.
+    stack: list[tuple[int, int, int, int] | tuple[int, int]] = [(0, len(a), 0, len(b))]
+    while stack:
+        item = stack.pop()
+        if len(item) == 2:
+            matches.append(item)  # type: ignore[arg-type]
+            continue
+        a_lo, a_hi, b_lo, b_hi = item  # type: ignore[misc]
+        while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+            matches.append((a_lo, b_lo))
+            a_lo += 1
+            b_lo += 1
+        suffix: list[tuple[int, int]] = []
+        while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+            a_hi -= 1
+            b_hi -= 1
+            suffix.append((a_hi, b_hi))
+        pending: list[tuple[int, int, int, int] | tuple[int, int]] = []
+        if a_lo < a_hi and b_lo < b_hi:
+            anchors = _unique_anchors(a, b, a_lo, a_hi, b_lo, b_hi)
+            if anchors:
+                prev_a, prev_b = a_lo, b_lo
+                for i, j in anchors:
+                    pending.append((prev_a, i, prev_b, j))
+                    pending.append((i, j))
+                    prev_a, prev_b = i + 1, j + 1
+                pending.append((prev_a, a_hi, prev_b, b_hi))
+            else:
+                pending.extend(_myers(a, b, a_lo, a_hi, b_lo, b_hi, max_d))
+        pending.extend(reversed(suffix))
+        stack.extend(reversed(pending))
+    return matches
+
+
+def _token_set(text: str) -> set[str]:
+    return set(tokenizer.tokenize(text))
+
+
+def _jaccard(left: set[str], right: set[str]) -> float:
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+
+def similarity(left: str, right: str) -> float:
+    return _jaccard(_token_set(left), _token_set(right))
+
+
+def _pair_block(
+    deleted: list[int],
+    inserted: list[int],
+    old_texts: Sequence[str],
+    new_texts: Sequence[str],
+    threshold: float,
+) -> list[tuple[int, int, float]]:
+    # Greedy best-first pairing of a block's deleted and inserted clauses.
+    old_tokens = {i: _token_set(old_texts[i]) for i in deleted}
+    new_tokens = {j: _token_set(new_texts[j]) for j in inserted}
+    if len(deleted) * len(inserted) > _MAX_PAIRING_CELLS:
+        candidates = list(zip(deleted, inserted))
+    else:
+        candidates = [(i, j) for i in deleted for j in inserted]
+    scored = sorted(
+        ((_jaccard(old_tokens[i], new_tokens[j]), i, j) for i, j in candidates),
+        key=lambda item: (-item[0], item[1], item[2]),
+    )
+    used_old: set[int] = set()
+    used_new: set[int] = set()
+    pairs: list[tuple[int, int, float]] = []
+    for score, i, j in scored:
+        if score < threshold:
+            break
+        if i in used_old or j in used_new:
+            continue
+        used_old.add(i)
+        used_new.add(j)
+        pairs.append((i, j, score))
+    return pairs
+
+
+def diff_clauses(
+    old: Sequence[tuple[str, str]],
+    new: Sequence[tuple[str, str]],
+    amend_similarity: float = 0.5,
+    max_d: int = MAX_EDIT_DISTANCE,
+) -> list[dict[str, Any]]:
+    return clause_mapping(old, new, amend_similarity, max_d)[0]
+
+
+def clause_mapping(
+    old: Sequence[tuple[str, str]],
+    new: Sequence[tuple[str, str]],
+    amend_similarity: float = 0.5,
+    max_d: int = MAX_EDIT_DISTANCE,
+) -> tuple[list[dict[str, Any]], list[tuple[str, str]]]:
+    # ``old``/``new`` are (clause_id, text) in document order. Identical
+    # clauses are aligned by hash and returned as unchanged (old_id, new_id)
+    # pairs; the rest become moved (same text elsewhere), amended (similar
+    # text in the same gap), added or repealed.
+    old_ids = [clause_id for clause_id, _ in old]
+    new_ids = [clause_id for clause_id, _ in new]
+    old_texts = [text for _, text in old]
+    new_texts = [text for _, text in new]
+    old_hashes = [clause_hash(text) for text in old_texts]
+    new_hashes = [clause_hash(text) for text in new_texts]
+
+    matches = align(old_hashes, new_hashes, max_d)
+    blocks: list[tuple[list[int], list[int]]] = []
+    prev_i, prev_j = 0, 0
+    for i, j in [*matches, (len(old), len(new))]:
+        if i > prev_i or j > prev_j:
+            blocks.append((list(range(prev_i, i)), list(range(prev_j, j))))
+        prev_i, prev_j = i + 1, j + 1
+
+    # Unmatched old clauses by hash, for move detection across blocks.
+    unmatched_old: defaultdict[bytes, deque[int]] = defaultdict(deque)
+    for deleted, _ in blocks:
+        for i in deleted:
+            unmatched_old[old_hashes[i]].append(i)
+    moved: dict[int, int] = {}
+    for _, inserted in blocks:
+        for j in inserted:
+            pool = unmatched_old.get(new_hashes[j])
+            if pool:
+                moved[j] = pool.popleft()
+    moved_old = set(moved.values())
+
+    deltas: list[dict[str, Any]] = []
+
+    def delta(change_type: str, i: int | None, j: int | None, **extra: Any) -> dict[str, Any]:
+        return {
+            "change_type": change_type,
+            "old_clause_id": old_ids[i] if i is not None else None,
+            "new_clause_id": new_ids[j] if j is not None else None,
+            "old_text": old_texts[i] if i is not None else "",
+            "new_text": new_texts[j] if j is not None else "",
+            **extra,
+        }
+
+    for deleted, inserted in blocks:
+        deleted = [i for i in deleted if i not in moved_old]
+        remaining = [j for j in inserted if j not in moved]
+        amended = {
+            j: (i, score)
+            for i, j, score in _pair_block(deleted, remaining, old_texts, new_texts, amend_similarity)
+        }
+        paired_old = {i for i, _ in amended.values()}
+        for j in inserted:
+            if j in moved:
+                deltas.append(delta("moved", moved[j], j))
+            elif j in amended:
+                i, score = amended[j]
+                deltas.append(delta("amended", i, j, similarity=round(score, 4)))
+            else:
+                deltas.append(delta("added", None, j))
+        for i in deleted:
+            if i not in paired_old:
+                deltas.append(delta("repealed", i, None))
+    return deltas, [(old_ids[i], new_ids[j]) for i, j in matches]
+
+
+def _tokenize_with_offsets(text: str) -> list[tuple[str, int, int]]:
+    return [(match.group(), match.start(), match.end()) for match in _TOKEN.finditer(text)]
+
+
+def word_spans(old_text: str, new_text: str, max_d: int = MAX_EDIT_DISTANCE) -> list[dict[str, Any]]:
+    # Changed token ranges between two versions of a clause. Tokens are
+    # interned to ints shared by both sides so the alignment compares ints,
+    # not strings. Each span has token ranges and character offsets on both
+    # sides; an empty side marks an insertion or deletion point.
+    old_tokens = _tokenize_with_offsets(old_text)
+    new_tokens = _tokenize_with_offsets(new_text)
+    interned: dict[str, int] = {}
+    old_ids = [interned.setdefault(token, len(interned)) for token, _, _ in old_tokens]
+    new_ids = [interned.setdefault(token, len(interned)) for token, _, _ in new_tokens]
+
+    def char_range(tokens: list[tuple[str, int, int]], text: str, start: int, end: int) -> tuple[int, int]:
+        if start < end:
+            return tokens[start][1], tokens[end - 1][2]
+        position = tokens[start][1] if start < len(tokens) else len(text)
+        return position, position
+
+    spans: list[dict[str, Any]] = []
+    prev_i, prev_j = 0, 0
+    for i, j in [*align(old_ids, new_ids, max_d), (len(old_ids), len(new_ids))]:
+        if i > prev_i or j > prev_j:
+            old_start, old_end = char_range(old_tokens, old_text, prev_i, i)
+            new_start, new_end = char_range(new_tokens, new_text, prev_j, j)
+            spans.append(
+                {
+                    "op": "replace" if i > prev_i and j > prev_j else ("delete" if i > prev_i else "insert"),
+                    "old_tokens": [prev_i, i],
+                    "new_tokens": [prev_j, j],
+                    "old_start": old_start,
+                    "old_end": old_end,
+                    "new_start": new_start,
+                    "new_end": new_end,
+                    "old": old_text[old_start:old_end],
+                    "new": new_text[new_start:new_end],
+                }
+            )
+        prev_i, prev_j = i + 1, j + 1
+    return spans
+
+
+def span_query(text: str, spans: list[dict[str, Any]], side: str = "new", context_tokens: int = 0) -> str:
+    # The changed tokens on one side, each widened by ``context_tokens``
+    # neighbours; overlapping windows are merged.
+    tokens = _tokenize_with_offsets(text)
+    windows: list[list[int]] = []
+    for span in spans:
+        start, end = span.get(f"{side}_tokens") or (0, 0)
+        if start >= end:
+            continue
+        start, end = max(start - context_tokens, 0), min(end + context_tokens, len(tokens))
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+    return " ".join(token for start, end in windows for token, _, _ in tokens[start:end])
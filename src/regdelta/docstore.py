@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Iterator
+
+from regdelta import codec
+
+STORE_FORMAT = 3
+
+
+def link_or_copy(source: Path, destination: Path) -> str:
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = destination.with_name(f"{destination.name}.tmp-{os.getpid()}")
+    tmp_path.unlink(missing_ok=True)
+    try:
+        os.link(source, tmp_path)
+        method = "hardlink"
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+        method = "copy"
+    os.replace(tmp_path, destination)
+    return method
+
+
+class DocumentStore:
+    # Content-addressed store of document texts. Objects live at
+    # objects/<key[:2]>/<key>.txt where key is the document checksum, so a
+    # text shared by several doc_ids or sources is stored once. Each read task
+    # of a run (a JSONL chunk, an HTML page batch) leaves tasks/<fingerprint>
+    # .jsonl: one [doc_id, metadata] line per record, text omitted, then a
+    # trailer with the task's warnings, so an unchanged file is rebuilt from
+    # the store instead of re-parsed. manifest.jsonl maps doc_id -> checksum
+    # (sorted by doc_id), snapshot.jsonl is the last documents.jsonl (with its
+    # offset index alongside, when it has one) and state.json describes the
+    # snapshot.
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.objects_dir = root / "objects"
+        self.tasks_dir = root / "tasks"
+        self.manifest_path = root / "manifest.jsonl"
+        self.snapshot_path = root / "snapshot.jsonl"
+        self.snapshot_index_path = root / "snapshot.jsonl.idx"
+        self.state_path = root / "state.json"
+
+    def object_path(self, key: str) -> Path:
+        return self.objects_dir / key[:2] / f"{key}.txt"
+
+    def task_path(self, fingerprint: str) -> Path:
+        return self.tasks_dir / f"{fingerprint}.jsonl"
+
+    def put(self, key: str, text: str) -> bool:
+        # Returns whether a new object was written. Writers in other worker
+        # processes race benignly: every writer renames the same content.
+        path = self.object_path(key)
+        if path.exists():
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, path)
+        return True
+
+    def get(self, key: str) -> str:
+        return self.object_path(key).read_text(encoding="utf-8")
+
+    def load_state(self) -> dict[str, Any]:
+        if not self.state_path.exists() or not self.manifest_path.exists():
+            return {}
+        try:
+            state = codec.read(self.state_path)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(state, dict) or state.get("format") != STORE_FORMAT:
+            return {}
+        return state
+
+    def iter_manifest(self) -> Iterator[tuple[str, str]]:
+        if not self.manifest_path.exists():
+            return
+        with self.manifest_path.open("rb") as f:
+            for line in f:
+                doc_id, key = codec.loads(line)
+                yield doc_id, key
+
+    def commit(
+        self,
+        manifest_tmp: Path,
+        documents_path: Path,
+        state: dict[str, Any],
+        index_path: Path | None = None,
+    ) -> None:
+        # Manifest and snapshot are swapped in before state.json, which is
+        # what marks the snapshot as complete.
+        self.root.mkdir(parents=True, exist_ok=True)
+        os.replace(manifest_tmp, self.manifest_path)
+        link_or_copy(documents_path, self.snapshot_path)
+        if index_path is not None:
+            link_or_copy(index_path, self.snapshot_index_path)
+        else:
+            self.snapshot_index_path.unlink(missing_ok=True)
+        codec.write_atomic(self.state_path, {"format": STORE_FORMAT, **state})
+
+    def prune(self, live_tasks: set[str]) -> dict[str, int]:
+        # Drops task entries the last run did not use and objects its manifest
+        # no longer references. Objects a kept task entry still points at are
+        # dropped too when their doc_id was superseded; replaying that entry
+        # then falls back to parsing.
+        live_objects = {key for _, key in self.iter_manifest()}
+        removed = {"objects": 0, "tasks": 0}
+        for kind, directory, pattern, live in (
+            ("tasks", self.tasks_dir, "*.jsonl", live_tasks),
+            ("objects", self.objects_dir, "*/*.txt", live_objects),
+        ):
+            for path in directory.glob(pattern):
+                if path.stem in live:
+                    continue
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                removed[kind] += 1
+        return removed
+
+
+class ChangeTracker:
+    # Merge-joins the previous doc_id-sorted manifest with the current
+    # doc_id-sorted document stream, classifying each doc_id on the fly.
+
+    def __init__(self, previous: Iterator[tuple[str, str]]) -> None:
+        self._previous = previous
+        self._pending = next(previous, None)
+        self.new: list[str] = []
+        self.changed: list[str] = []
+        self.removed: list[str] = []
+        self.unchanged = 0
+
+    def _drain_before(self, doc_id: str | None) -> None:
+        while self._pending is not None and (doc_id is None or self._pending[0] < doc_id):
+            self.removed.append(self._pending[0])
+            self._pending = next(self._previous, None)
+
+    def observe(self, doc_id: str, key: str) -> None:
+        self._drain_before(doc_id)
+        if self._pending is not None and self._pending[0] == doc_id:
+            if self._pending[1] == key:
+                self.unchanged += 1
+            else:
+                self.changed.append(doc_id)
+            self._pending = next(self._previous, None)
+        else:
+            self.new.append(doc_id)
+
+    def finish(self) -> dict[str, Any]:
+        self._drain_before(None)
+        return {
+            "counts": {
+                "new": len(self.new),
+                "changed": len(self.changed),
+                "removed": len(self.removed),
+                "unchanged": self.unchanged,
+            },
+            "new": self.new,
+            "changed": self.changed,
+            "removed": self.removed,
+        }
@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Any
 
+from regdelta import codec
+
 
 def load_payload(path: str | Path) -> dict[str, Any]:
-    with Path(path).open("r", encoding="utf-8") as f:
-        payload = json.load(f)
+    payload = codec.read(path)
     if not isinstance(payload, dict):
         raise ValueError(f"Expected JSON object: {path}")
     return payload
@@ -86,14 +86,15 @@ def compare_variants(prompt_payload: dict[str, Any], rag_payload: dict[str, Any]
     }
 
 
-def run_eval(prompt_path: str | Path, rag_path: str | Path, output_path: str | Path) -> Path:
+def run_eval(
+    prompt_path: str | Path, rag_path: str | Path, output_path: str | Path, pretty: bool = False
+) -> Path:
     prompt_payload = load_payload(prompt_path)
     rag_payload = load_payload(rag_path)
     report = compare_variants(prompt_payload, rag_payload)
 
     output = Path(output_path)
     output.parent.mkdir(parents=True, exist_ok=True)
-    with output.open("w", encoding="utf-8") as f:
-        json.dump(report, f, ensure_ascii=False, indent=2)
+    codec.write(output, report, pretty=pretty)
 
     return output
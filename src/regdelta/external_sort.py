@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import heapq
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import IO, Iterator
+
+from regdelta import codec
+
+# (sort key, sequence number, payload). Sequence numbers keep equal keys in
+# arrival order so callers can apply last-writer-wins after the sort.
+SortItem = tuple[str, int, str]
+
+_ITEM_OVERHEAD = 120
+_MAX_FANIN = 64
+
+
+def _read_run(path: Path) -> Iterator[SortItem]:
+    with path.open("rb") as f:
+        for line in f:
+            key, seq, payload = codec.loads(line)
+            yield key, seq, payload
+
+
+class ExternalSorter:
+    # Buffers items until their estimated in-memory size reaches the budget,
+    # then writes the buffer as a sorted run file. ``sorted_items`` k-way
+    # merges all runs with the remaining buffer, in passes of at most
+    # ``_MAX_FANIN`` open files.
+
+    def __init__(self, memory_budget_bytes: int, spill_dir: Path | None = None) -> None:
+        self.memory_budget_bytes = max(int(memory_budget_bytes), 1)
+        self._spill_root = spill_dir
+        self._spill_dir: Path | None = None
+        self._buffer: list[SortItem] = []
+        self._buffered_bytes = 0
+        self.runs: list[Path] = []
+        self.item_count = 0
+        self.spill_count = 0
+        self.spilled_items = 0
+        self.peak_buffered_bytes = 0
+
+    def __enter__(self) -> ExternalSorter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.cleanup()
+
+    def add(self, key: str, seq: int, payload: str) -> None:
+        self._buffer.append((key, seq, payload))
+        self._buffered_bytes += sys.getsizeof(key) + sys.getsizeof(payload) + _ITEM_OVERHEAD
+        self.item_count += 1
+        self.peak_buffered_bytes = max(self.peak_buffered_bytes, self._buffered_bytes)
+        if self._buffered_bytes >= self.memory_budget_bytes:
+            self._spill()
+
+    def _new_run(self) -> tuple[Path, IO[str]]:
+        if self._spill_dir is None:
+            if self._spill_root is not None:
+                self._spill_root.mkdir(parents=True, exist_ok=True)
+            self._spill_dir = Path(tempfile.mkdtemp(prefix="sort-", dir=self._spill_root))
+        path = self._spill_dir / f"run_{len(self.runs):06d}.jsonl"
+        self.runs.append(path)
+        return path, path.open("w", encoding="utf-8")
+
+    def _write_run(self, items: Iterator[SortItem] | list[SortItem]) -> Path:
+        path, f = self._new_run()
+        with f:
+            for item in items:
+                f.write(codec.dumps(item) + "\n")
+        return path
+
+    def _spill(self) -> None:
+        if not self._buffer:
+            return
+        self._buffer.sort()
+        self._write_run(self._buffer)
+        self.spill_count += 1
+        self.spilled_items += len(self._buffer)
+        self._buffer = []
+        self._buffered_bytes = 0
+
+    def sorted_items(self) -> Iterator[SortItem]:
+        self._buffer.sort()
+        runs = list(self.runs)
+        while len(runs) >= _MAX_FANIN:
+            group, runs = runs[:_MAX_FANIN], runs[_MAX_FANIN:]
+            runs.append(self._write_run(heapq.merge(*(_read_run(path) for path in group))))
+            for path in group:
+                path.unlink()
+        return heapq.merge(*(_read_run(path) for path in runs), iter(self._buffer))
+
+    def cleanup(self) -> None:
+        self._buffer = []
+        self._buffered_bytes = 0
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
@@ -0,0 +1 @@
+"""Retrieval index structures."""
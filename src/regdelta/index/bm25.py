@@ -0,0 +1,391 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import heapq
+import math
+from array import array
+from collections import Counter
+from typing import Any, Callable, Container, Iterable, Iterator, Mapping, Sequence
+
+from regdelta.segments import SegmentTable
+
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+
+# Relative slack for pruning decisions so float rounding in upper-bound sums
+# never discards a segment that ties the current top-k threshold.
+_PRUNE_EPSILON = 1e-9
+
+SearchHit = tuple[float, float, str, int]
+
+DIGEST_SIZE = 8
+
+
+def segment_digest(segment: Mapping[str, Any]) -> bytes:
+    content = "\x1f".join(
+        str(segment.get(field) or "") for field in ("doc_id", "clause_id", "text")
+    )
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+class BM25Index:
+    # Postings are stored CSR-style: the postings of term id ``t`` are the
+    # slices ``[offsets[t]:offsets[t + 1]]`` of ``postings_segments`` (segment
+    # ordinals, ascending) and ``postings_freqs`` (term frequencies).
+
+    def __init__(
+        self,
+        vocabulary: Sequence[str],
+        offsets: Sequence[int],
+        postings_segments: Sequence[int],
+        postings_freqs: Sequence[int],
+        doc_lengths: Sequence[int],
+        unique_term_counts: Sequence[int],
+        term_max_freqs: Sequence[int],
+        term_min_lengths: Sequence[int],
+        segment_ids: Sequence[str],
+        segments: Sequence[Mapping[str, Any]],
+        segment_digests: bytes | memoryview,
+        k1: float = DEFAULT_K1,
+        b: float = DEFAULT_B,
+        total_length: int | None = None,
+    ) -> None:
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.postings_segments = postings_segments
+        self.postings_freqs = postings_freqs
+        self.doc_lengths = doc_lengths
+        self.unique_term_counts = unique_term_counts
+        self.term_max_freqs = term_max_freqs
+        self.term_min_lengths = term_min_lengths
+        self.segment_ids = segment_ids
+        self.segments = segments
+        self.segment_digests = segment_digests
+        self.k1 = float(k1)
+        self.b = float(b)
+        self.mapping: Any = None
+
+        self.segment_count = len(doc_lengths)
+        self.ordinal_count = self.segment_count
+        self.postings_count = len(postings_segments)
+        self.total_length = int(sum(doc_lengths) if total_length is None else total_length)
+        self.avg_doc_length = (
+            self.total_length / self.segment_count if self.segment_count else 0.0
+        )
+        # BM25 length norm k1 * (1 - b + b * dl / avgdl) split into constants.
+        self._norm_base = self.k1 * (1.0 - self.b)
+        self._norm_scale = (
+            self.k1 * self.b / self.avg_doc_length if self.avg_doc_length else 0.0
+        )
+
+    @classmethod
+    def build(
+        cls,
+        segments: Iterable[Mapping[str, Any]],
+        tokenize: Callable[[str], list[str]],
+        k1: float = DEFAULT_K1,
+        b: float = DEFAULT_B,
+    ) -> BM25Index:
+        by_id: dict[str, Mapping[str, Any]] = {}
+        for segment in segments:
+            segment_id = str(segment.get("segment_id", "")).strip()
+            if segment_id:
+                by_id[segment_id] = segment
+
+        records = SegmentTable()
+        digests = bytearray()
+        doc_lengths = array("I")
+        unique_term_counts = array("I")
+        # Interleaved (ordinal, tf) pairs per term until the CSR arrays are laid out.
+        term_postings: dict[str, array] = {}
+
+        for ordinal, (segment_id, segment) in enumerate(by_id.items()):
+            text = str(segment.get("text", ""))
+            records.add(segment.get("doc_id"), segment.get("clause_id"), text, segment_id=segment_id)
+            digests += segment_digest(records[ordinal])
+            counts = Counter(tokenize(text))
+            doc_lengths.append(sum(counts.values()))
+            unique_term_counts.append(len(counts))
+            for term, tf in counts.items():
+                postings = term_postings.get(term)
+                if postings is None:
+                    postings = term_postings[term] = array("I")
+                postings.append(ordinal)
+                postings.append(tf)
+
+        vocabulary = sorted(term_postings)
+        offsets = array("Q", [0])
+        postings_segments = array("I")
+        postings_freqs = array("I")
+        term_max_freqs = array("I")
+        term_min_lengths = array("I")
+        for term in vocabulary:
+            pairs = term_postings.pop(term)
+            ordinals = pairs[0::2]
+            freqs = pairs[1::2]
+            postings_segments.extend(ordinals)
+            postings_freqs.extend(freqs)
+            offsets.append(len(postings_segments))
+            term_max_freqs.append(max(freqs))
+            term_min_lengths.append(min(doc_lengths[ordinal] for ordinal in ordinals))
+
+        return cls(
+            vocabulary=vocabulary,
+            offsets=offsets,
+            postings_segments=postings_segments,
+            postings_freqs=postings_freqs,
+            doc_lengths=doc_lengths,
+            unique_term_counts=unique_term_counts,
+            term_max_freqs=term_max_freqs,
+            term_min_lengths=term_min_lengths,
+            segment_ids=records.segment_ids,
+            segments=records,
+            segment_digests=bytes(digests),
+            k1=k1,
+            b=b,
+        )
+
+    def term_id(self, term: str) -> int | None:
+        idx = bisect.bisect_left(self.vocabulary, term)
+        if idx < len(self.vocabulary) and self.vocabulary[idx] == term:
+            return idx
+        return None
+
+    def term_ids(self, terms: Iterable[str]) -> list[int]:
+        ids = {self.term_id(term) for term in terms}
+        return sorted(term_id for term_id in ids if term_id is not None)
+
+    def document_frequency(self, term_id: int) -> int:
+        return int(self.offsets[term_id + 1] - self.offsets[term_id])
+
+    def idf(self, term_id: int) -> float:
+        df = self.document_frequency(term_id)
+        return math.log(1.0 + (self.segment_count - df + 0.5) / (df + 0.5))
+
+    def weight(self, idf: float, tf: int, doc_length: int) -> float:
+        return idf * tf * (self.k1 + 1.0) / (tf + self._norm_base + self._norm_scale * doc_length)
+
+    def upper_bound(self, term_id: int, idf: float | None = None) -> float:
+        if idf is None:
+            idf = self.idf(term_id)
+        return self.weight(idf, self.term_max_freqs[term_id], self.term_min_lengths[term_id])
+
+    def is_live(self, ordinal: int) -> bool:
+        return 0 <= ordinal < self.segment_count
+
+    def score(self, term_ids: Sequence[int]) -> dict[int, list[float]]:
+        # Term-at-a-time accumulation in ascending term id order; every scoring
+        # path sums contributions in this order so scores are bit-identical.
+        rows = [[(term_id, self.idf(term_id)) for term_id in term_ids]]
+        return self.accumulate_batch(rows, self._norm_base, self._norm_scale)[0]
+
+    def search(self, term_ids: Sequence[int], query_term_count: int, k: int) -> list[SearchHit]:
+        top: list[SearchHit] = []
+        self.search_into(
+            top,
+            term_ids,
+            [self.idf(term_id) for term_id in term_ids],
+            query_term_count,
+            k,
+            self._norm_base,
+            self._norm_scale,
+        )
+        return sorted(top, reverse=True)
+
+    def search_into(
+        self,
+        top: list[SearchHit],
+        term_ids: Sequence[int],
+        idfs: Sequence[float],
+        query_term_count: int,
+        k: int,
+        norm_base: float,
+        norm_scale: float,
+        dead: Container[int] = (),
+        base: int = 0,
+    ) -> None:
+        # MaxScore document-at-a-time traversal feeding the bounded min-heap
+        # ``top`` of (score, rerank_score, segment_id, base + ordinal). Terms
+        # are ordered by upper bound; once the heap is full, the lowest-bound
+        # terms whose combined bound cannot reach the threshold become
+        # non-essential and are only probed (by binary search) for segments
+        # that an essential term already surfaced. ``idfs`` and the norm
+        # constants may come from a wider collection than this index, and
+        # ``dead`` ordinals are skipped, which lets a multi-part index share
+        # one heap (and threshold) across its parts.
+        if k <= 0:
+            return
+        k1p1 = self.k1 + 1.0
+
+        terms: list[tuple[float, int, float, int, int]] = []
+        for term_id, idf in zip(term_ids, idfs):
+            start, end = int(self.offsets[term_id]), int(self.offsets[term_id + 1])
+            if start == end:
+                continue
+            max_tf = self.term_max_freqs[term_id]
+            bound = idf * max_tf * k1p1 / (
+                max_tf + norm_base + norm_scale * self.term_min_lengths[term_id]
+            )
+            terms.append((bound, term_id, idf, start, end))
+        if not terms:
+            return
+        terms.sort()
+
+        # prefix[i] is the summed upper bound of terms[0:i].
+        prefix = [0.0]
+        for bound, *_ in terms:
+            prefix.append(prefix[-1] + bound)
+
+        postings_segments = self.postings_segments
+        postings_freqs = self.postings_freqs
+        doc_lengths = self.doc_lengths
+        positions = [start for _, _, _, start, _ in terms]
+        cursors = [(postings_segments[start], idx) for idx, (_, _, _, start, _) in enumerate(terms)]
+        heapq.heapify(cursors)
+
+        floor = -math.inf
+        first_essential = 0
+        if len(top) >= k:
+            threshold = top[0][0]
+            floor = threshold - _PRUNE_EPSILON * max(1.0, abs(threshold))
+            while first_essential < len(terms) and prefix[first_essential + 1] < floor:
+                first_essential += 1
+
+        while cursors and first_essential < len(terms):
+            ordinal = cursors[0][0]
+            contributions: dict[int, float] = {}
+            while cursors and cursors[0][0] == ordinal:
+                _, idx = heapq.heappop(cursors)
+                if idx < first_essential:
+                    # Demoted to non-essential; probed lazily from positions[idx].
+                    continue
+                position = positions[idx]
+                _, _, idf, _, end = terms[idx]
+                tf = postings_freqs[position]
+                contributions[idx] = idf * tf * k1p1 / (
+                    tf + norm_base + norm_scale * doc_lengths[ordinal]
+                )
+                positions[idx] = position + 1
+                if position + 1 < end:
+                    heapq.heappush(cursors, (postings_segments[position + 1], idx))
+            if not contributions or ordinal in dead:
+                continue
+
+            partial = sum(contributions.values())
+            pruned = False
+            for idx in range(first_essential - 1, -1, -1):
+                if partial + prefix[idx + 1] < floor:
+                    pruned = True
+                    break
+                _, _, idf, _, end = terms[idx]
+                position = bisect.bisect_left(postings_segments, ordinal, positions[idx], end)
+                positions[idx] = position
+                if position < end and postings_segments[position] == ordinal:
+                    tf = postings_freqs[position]
+                    contribution = idf * tf * k1p1 / (
+                        tf + norm_base + norm_scale * doc_lengths[ordinal]
+                    )
+                    contributions[idx] = contribution
+                    partial += contribution
+            if pruned or partial < floor:
+                continue
+
+            # Sum in ascending term id order to match the exhaustive scorer.
+            score = 0.0
+            for idx in sorted(contributions, key=lambda item: terms[item][1]):
+                score += contributions[idx]
+            hit = (
+                score,
+                self.jaccard(ordinal, len(contributions), query_term_count),
+                self.segment_ids[ordinal],
+                base + ordinal,
+            )
+            if len(top) < k:
+                heapq.heappush(top, hit)
+            elif hit > top[0]:
+                heapq.heapreplace(top, hit)
+            else:
+                continue
+
+            if len(top) == k:
+                threshold = top[0][0]
+                floor = threshold - _PRUNE_EPSILON * max(1.0, abs(threshold))
+                while first_essential < len(terms) and prefix[first_essential + 1] < floor:
+                    first_essential += 1
+
+    def search_batch(
+        self, queries: Sequence[tuple[Sequence[int], int]], k: int
+    ) -> list[list[SearchHit]]:
+        rows = [[(term_id, self.idf(term_id)) for term_id in term_ids] for term_ids, _ in queries]
+        accumulators = self.accumulate_batch(rows, self._norm_base, self._norm_scale)
+        return [
+            heapq.nlargest(k, self.batch_hits(row_acc, query_term_count)) if k > 0 else []
+            for (_, query_term_count), row_acc in zip(queries, accumulators)
+        ]
+
+    def accumulate_batch(
+        self,
+        rows: Sequence[Sequence[tuple[int, float]]],
+        norm_base: float,
+        norm_scale: float,
+        dead: Container[int] = (),
+    ) -> list[dict[int, list[float]]]:
+        # Sparse (query x term) by (term x segment) product: rows are queries
+        # given as (term_id, idf) pairs, and each distinct term's posting
+        # weights are computed once and scattered into every row that uses
+        # the term. Terms are visited in ascending id order so per-row sums
+        # match ``search`` bit for bit.
+        k1p1 = self.k1 + 1.0
+        idfs: dict[int, float] = {}
+        rows_by_term: dict[int, list[int]] = {}
+        for row, terms in enumerate(rows):
+            for term_id, idf in terms:
+                idfs[term_id] = idf
+                rows_by_term.setdefault(term_id, []).append(row)
+
+        accumulators: list[dict[int, list[float]]] = [{} for _ in rows]
+        doc_lengths = self.doc_lengths
+        for term_id in sorted(rows_by_term):
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            if start == end:
+                continue
+            idf = idfs[term_id]
+            postings: list[tuple[int, float]] = []
+            for ordinal, tf in zip(self.postings_segments[start:end], self.postings_freqs[start:end]):
+                if ordinal in dead:
+                    continue
+                postings.append(
+                    (ordinal, idf * tf * k1p1 / (tf + norm_base + norm_scale * doc_lengths[ordinal]))
+                )
+            for row in rows_by_term[term_id]:
+                row_acc = accumulators[row]
+                for ordinal, contribution in postings:
+                    acc = row_acc.get(ordinal)
+                    if acc is None:
+                        row_acc[ordinal] = [contribution, 1]
+                    else:
+                        acc[0] += contribution
+                        acc[1] += 1
+        return accumulators
+
+    def batch_hits(
+        self, accumulator: dict[int, list[float]], query_term_count: int, base: int = 0
+    ) -> Iterator[SearchHit]:
+        for ordinal, (score, matched) in accumulator.items():
+            yield (
+                score,
+                self.jaccard(ordinal, int(matched), query_term_count),
+                self.segment_ids[ordinal],
+                base + ordinal,
+            )
+
+    def jaccard(self, ordinal: int, matched_terms: int, query_term_count: int) -> float:
+        union = query_term_count + self.unique_term_counts[ordinal] - matched_terms
+        return matched_terms / union if union else 0.0
+
+    def term_document_frequency(self) -> dict[str, int]:
+        return {
+            term: self.document_frequency(term_id)
+            for term_id, term in enumerate(self.vocabulary)
+        }
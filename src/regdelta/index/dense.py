@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import hashlib
+import heapq
+import importlib
+import math
+import operator
+import random
+import struct
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Iterable, Protocol, Sequence
+
+from regdelta import tokenizer
+from regdelta.index import storage
+
+MAGIC = b"RDDENSE1"
+FORMAT_VERSION = 1
+
+QUANTIZATIONS = ("float32", "int8")
+
+# magic, format_version, section_count, vector_count, dimension, nlist, quantization
+_HEADER = struct.Struct("<8sIIQIII")
+_TYPECODES = ["f", "b", "f", "f", "Q", "I"]
+
+# k-means trains on at most this many vectors; every vector is then assigned
+# to its nearest centroid in a single pass.
+TRAIN_SAMPLE = 1024
+# Upper bound on the default sqrt(count) list count.
+_MAX_NLIST = 64
+
+
+class Embedder(Protocol):
+    name: str
+    dimension: int
+
+    def embed(self, texts: Sequence[str]) -> list[array]: ...
+
+
+def _default_tokenize(text: str) -> list[str]:
+    return tokenizer.tokenize(text)
+
+
+class HashingEmbedder:
+    # Deterministic feature-hashing embedder: word unigrams plus character
+    # trigrams of each word are hashed to signed buckets and L2-normalised.
+    # Needs no model weights, which makes it suitable for tests and CPU runs.
+    name = "hashing"
+
+    def __init__(
+        self, dimension: int = 128, tokenize: Callable[[str], list[str]] | None = None
+    ) -> None:
+        self.dimension = int(dimension)
+        self._tokenize = tokenize or _default_tokenize
+        self._features: dict[str, tuple[int, float]] = {}
+
+    def _feature(self, feature: str) -> tuple[int, float]:
+        cached = self._features.get(feature)
+        if cached is None:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            cached = (value % self.dimension, 1.0 if value >> 63 else -1.0)
+            self._features[feature] = cached
+        return cached
+
+    def embed(self, texts: Sequence[str]) -> list[array]:
+        vectors: list[array] = []
+        for text in texts:
+            values = [0.0] * self.dimension
+            for token in self._tokenize(text):
+                bucket, sign = self._feature(f"w:{token}")
+                values[bucket] += sign
+                padded = f"<{token}>"
+                for start in range(max(len(padded) - 2, 1)):
+                    bucket, sign = self._feature(f"c:{padded[start:start + 3]}")
+                    values[bucket] += 0.5 * sign
+            norm = math.sqrt(sum(value * value for value in values))
+            if norm:
+                values = [value / norm for value in values]
+            vectors.append(array("f", values))
+        return vectors
+
+
+EMBEDDERS: dict[str, Callable[..., Embedder]] = {"hashing": HashingEmbedder}
+
+
+def build_embedder(
+    name: str, dimension: int, tokenize: Callable[[str], list[str]] | None = None
+) -> Embedder:
+    factory = EMBEDDERS.get(name)
+    if factory is not None:
+        return factory(dimension=dimension, tokenize=tokenize)
+    if ":" not in name:
+        raise ValueError(f"Unknown embedder '{name}'. Use one of {sorted(EMBEDDERS)} or 'module:Class'.")
+    module_name, _, attr = name.partition(":")
+    factory = getattr(importlib.import_module(module_name), attr)
+    return factory(dimension=dimension)
+
+
+def _dot(left: Iterable[float], right: Iterable[float]) -> float:
+    return sum(map(operator.mul, left, right))
+
+
+def _nearest(vector: Sequence[float], centroids: Sequence[array]) -> int:
+    scores = [sum(map(operator.mul, vector, centroid)) for centroid in centroids]
+    return scores.index(max(scores))
+
+
+def _train_centroids(
+    vectors: Sequence[array],
+    dimension: int,
+    nlist: int | None,
+    iterations: int,
+    seed: int,
+    train_sample: int,
+) -> list[array]:
+    # Spherical k-means over a seeded sample of the vectors.
+    count = len(vectors)
+    if not count:
+        return [array("f", [0.0] * dimension)]
+    rng = random.Random(seed)
+    sample = [vectors[idx] for idx in sorted(rng.sample(range(count), min(count, max(train_sample, 1))))]
+    if nlist is None or nlist <= 0:
+        nlist = min(int(round(math.sqrt(count))), _MAX_NLIST)
+    nlist = max(1, min(nlist, len(sample)))
+
+    centroids = [array("f", sample[idx]) for idx in sorted(rng.sample(range(len(sample)), nlist))]
+    for _ in range(max(iterations, 1)):
+        sums = [[0.0] * dimension for _ in range(nlist)]
+        for vector in sample:
+            total = sums[_nearest(vector, centroids)]
+            for dim, value in enumerate(vector):
+                total[dim] += value
+        for cid, total in enumerate(sums):
+            norm = math.sqrt(sum(value * value for value in total))
+            if norm:
+                centroids[cid] = array("f", [value / norm for value in total])
+    return centroids
+
+
+class DenseIndex:
+    # Inverted-file (IVF) index: vectors are clustered with spherical k-means
+    # and a query only scans the members of its ``nprobe`` closest centroids.
+
+    def __init__(
+        self,
+        dimension: int,
+        quantization: str,
+        vectors: Sequence[float] | Sequence[int],
+        scales: Sequence[float],
+        centroids: Sequence[float],
+        list_offsets: Sequence[int],
+        list_members: Sequence[int],
+    ) -> None:
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unsupported dense quantization: {quantization}")
+        self.dimension = dimension
+        self.quantization = quantization
+        self.vectors = vectors
+        self.scales = scales
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_members = list_members
+        self.count = len(vectors) // dimension if dimension else 0
+        self.nlist = len(list_offsets) - 1
+        self.mapping: Any = None
+
+    @classmethod
+    def build(
+        cls,
+        vectors: Sequence[array],
+        dimension: int,
+        nlist: int | None = None,
+        iterations: int = 8,
+        seed: int = 42,
+        quantization: str = "float32",
+        train_sample: int = TRAIN_SAMPLE,
+        centroids: Sequence[float] | None = None,
+    ) -> DenseIndex:
+        # ``centroids`` (flat, as persisted) skips training entirely, so an
+        # incremental rebuild only pays for the assignment pass.
+        if centroids is not None and len(centroids) >= dimension > 0:
+            trained = [
+                array("f", centroids[start : start + dimension])
+                for start in range(0, len(centroids) - dimension + 1, dimension)
+            ]
+        else:
+            trained = _train_centroids(vectors, dimension, nlist, iterations, seed, train_sample)
+        nlist = len(trained)
+        assignments = [_nearest(vector, trained) for vector in vectors]
+
+        members: list[list[int]] = [[] for _ in range(nlist)]
+        for ordinal, cid in enumerate(assignments):
+            members[cid].append(ordinal)
+        list_offsets = array("Q", [0])
+        list_members = array("I")
+        for bucket in members:
+            list_members.extend(bucket)
+            list_offsets.append(len(list_members))
+
+        flat_centroids = array("f")
+        for centroid in trained:
+            flat_centroids.extend(centroid)
+
+        scales = array("f")
+        if quantization == "int8":
+            flat = array("b")
+            for vector in vectors:
+                peak = max((abs(value) for value in vector), default=0.0)
+                scale = peak / 127.0 if peak else 1.0
+                scales.append(scale)
+                flat.extend(max(-127, min(127, int(round(value / scale)))) for value in vector)
+        else:
+            flat = array("f")
+            for vector in vectors:
+                flat.extend(vector)
+
+        return cls(
+            dimension=dimension,
+            quantization=quantization,
+            vectors=flat,
+            scales=scales,
+            centroids=flat_centroids,
+            list_offsets=list_offsets,
+            list_members=list_members,
+        )
+
+    def _similarity(self, query: Sequence[float], ordinal: int) -> float:
+        start = ordinal * self.dimension
+        raw = _dot(query, self.vectors[start : start + self.dimension])
+        if self.quantization == "int8":
+            return raw * self.scales[ordinal]
+        return raw
+
+    def search(self, query: Sequence[float], k: int, nprobe: int = 8) -> list[tuple[float, int]]:
+        if k <= 0 or not self.count:
+            return []
+        dimension = self.dimension
+        probes = heapq.nlargest(
+            min(max(nprobe, 1), self.nlist),
+            range(self.nlist),
+            key=lambda cid: (_dot(query, self.centroids[cid * dimension : (cid + 1) * dimension]), -cid),
+        )
+        candidates: list[tuple[float, int]] = []
+        for cid in probes:
+            for position in range(self.list_offsets[cid], self.list_offsets[cid + 1]):
+                ordinal = self.list_members[position]
+                candidates.append((self._similarity(query, ordinal), -ordinal))
+        return [(score, -neg_ordinal) for score, neg_ordinal in heapq.nlargest(k, candidates)]
+
+
+def write_index(index: DenseIndex, path: Path) -> Path:
+    header = _HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        len(_TYPECODES),
+        index.count,
+        index.dimension,
+        index.nlist,
+        QUANTIZATIONS.index(index.quantization),
+    )
+    float_vectors = index.vectors if index.quantization == "float32" else array("f")
+    int8_vectors = index.vectors if index.quantization == "int8" else array("b")
+    payloads = [
+        storage.as_bytes(float_vectors, "f"),
+        storage.as_bytes(int8_vectors, "b"),
+        storage.as_bytes(index.scales, "f"),
+        storage.as_bytes(index.centroids, "f"),
+        storage.as_bytes(index.list_offsets, "Q"),
+        storage.as_bytes(index.list_members, "I"),
+    ]
+    return storage.write_sectioned_file(path, header, payloads)
+
+
+def open_index(path: Path) -> DenseIndex:
+    mapping, view = storage.map_file(path)
+    if len(view) < _HEADER.size:
+        raise ValueError(f"Truncated dense index file: {path}")
+    magic, version, section_count, count, dimension, nlist, quantization = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version != FORMAT_VERSION or section_count != len(_TYPECODES):
+        raise ValueError(f"Unsupported dense index format in {path}")
+    if quantization >= len(QUANTIZATIONS):
+        raise ValueError(f"Unsupported dense quantization code {quantization} in {path}")
+
+    float_vectors, int8_vectors, scales, centroids, list_offsets, list_members = storage.read_sections(
+        view, _HEADER.size, _TYPECODES, path
+    )
+    index = DenseIndex(
+        dimension=dimension,
+        quantization=QUANTIZATIONS[quantization],
+        vectors=int8_vectors if quantization else float_vectors,
+        scales=scales,
+        centroids=centroids,
+        list_offsets=list_offsets,
+        list_members=list_members,
+    )
+    if index.count != count or index.nlist != nlist:
+        raise ValueError(f"Inconsistent dense index section sizes: {path}")
+    index.mapping = mapping
+    return index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> dict[int, float]:
+    fused: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, ordinal in enumerate(ranking, start=1):
+            fused[ordinal] = fused.get(ordinal, 0.0) + 1.0 / (k + rank)
+    return fused
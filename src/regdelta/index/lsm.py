@@ -0,0 +1,482 @@
+from __future__ import annotations
+
+import bisect
+import contextlib
+import hashlib
+import heapq
+import math
+import time
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+from itertools import count, repeat
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+# Advisory locking between processes; without fcntl (Windows) index updates
+# are not serialized.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from regdelta import codec
+from regdelta.index import storage
+from regdelta.index.bm25 import DIGEST_SIZE, BM25Index, SearchHit, segment_digest
+from regdelta.segments import SegmentTable
+
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".lock"
+
+Tokenizer = Callable[[str], list[str]]
+
+
+class _Concatenated:
+    def __init__(self, index: LiveIndex, attribute: str) -> None:
+        self._index = index
+        self._attribute = attribute
+
+    def __len__(self) -> int:
+        return self._index.ordinal_count
+
+    def __getitem__(self, ordinal: int) -> Any:
+        part, local = self._index.locate(ordinal)
+        return getattr(self._index.parts[part], self._attribute)[local]
+
+
+class LiveIndex:
+    # LSM-style view over immutable BM25 parts plus per-part tombstones.
+    # Ordinals are global (part base + local ordinal) and collection
+    # statistics (N, avgdl, df) cover live segments only, so scores are
+    # identical to a single index rebuilt over the live corpus.
+
+    def __init__(
+        self,
+        directory: Path,
+        manifest: dict[str, Any],
+        parts: list[BM25Index],
+        dead: list[set[int]],
+        tokenize: Tokenizer,
+    ) -> None:
+        self.directory = directory
+        self.manifest = manifest
+        self.parts = parts
+        self.dead = dead
+        self.version = int(manifest.get("version", 0))
+        self.k1 = float(manifest["k1"])
+        self.b = float(manifest["b"])
+
+        self.bases: list[int] = []
+        base = 0
+        for part in parts:
+            self.bases.append(base)
+            base += part.segment_count
+        self.ordinal_count = base
+
+        dead_length = 0
+        self._dead_df: Counter[str] = Counter()
+        for part, dead_ordinals, entry in zip(parts, dead, manifest["parts"]):
+            if not dead_ordinals:
+                continue
+            dead_length += sum(part.doc_lengths[local] for local in dead_ordinals)
+            dead_df = entry.get("dead_df")
+            if isinstance(dead_df, dict):
+                self._dead_df.update(dead_df)
+            else:
+                # Manifests written before dead_df was persisted.
+                self._dead_df.update(dead_document_frequency(part, dead_ordinals, tokenize))
+
+        self.segment_count = self.ordinal_count - sum(len(item) for item in dead)
+        self.total_length = sum(part.total_length for part in parts) - dead_length
+        self.avg_doc_length = (
+            self.total_length / self.segment_count if self.segment_count else 0.0
+        )
+        self.postings_count = sum(part.postings_count for part in parts)
+        self._norm_base = self.k1 * (1.0 - self.b)
+        self._norm_scale = (
+            self.k1 * self.b / self.avg_doc_length if self.avg_doc_length else 0.0
+        )
+        self.segments = _Concatenated(self, "segments")
+        self.segment_ids = _Concatenated(self, "segment_ids")
+
+    def locate(self, ordinal: int) -> tuple[int, int]:
+        part = bisect.bisect_right(self.bases, ordinal) - 1
+        return part, ordinal - self.bases[part]
+
+    def is_live(self, ordinal: int) -> bool:
+        if not 0 <= ordinal < self.ordinal_count:
+            return False
+        part, local = self.locate(ordinal)
+        return local not in self.dead[part]
+
+    def document_frequency(self, term: str) -> int:
+        df = -self._dead_df.get(term, 0)
+        for part in self.parts:
+            term_id = part.term_id(term)
+            if term_id is not None:
+                df += part.document_frequency(term_id)
+        return df
+
+    def idf(self, term: str) -> float:
+        df = self.document_frequency(term)
+        return math.log(1.0 + (self.segment_count - df + 0.5) / (df + 0.5))
+
+    def term_ids(self, terms: Iterable[str]) -> list[str]:
+        # Terms act as their own ids: each part interns them separately.
+        return sorted(term for term in set(terms) if self.document_frequency(term) > 0)
+
+    def _part_terms(self, part: BM25Index, terms: Sequence[str], idfs: dict[str, float]) -> list[tuple[int, float]]:
+        local: list[tuple[int, float]] = []
+        for term in terms:
+            term_id = part.term_id(term)
+            if term_id is not None:
+                local.append((term_id, idfs[term]))
+        return local
+
+    def search(self, terms: Sequence[str], query_term_count: int, k: int) -> list[SearchHit]:
+        idfs = {term: self.idf(term) for term in terms}
+        top: list[SearchHit] = []
+        for part, dead, base in zip(self.parts, self.dead, self.bases):
+            local = self._part_terms(part, terms, idfs)
+            part.search_into(
+                top,
+                [term_id for term_id, _ in local],
+                [idf for _, idf in local],
+                query_term_count,
+                k,
+                self._norm_base,
+                self._norm_scale,
+                dead=dead,
+                base=base,
+            )
+        return sorted(top, reverse=True)
+
+    def search_batch(
+        self, queries: Sequence[tuple[Sequence[str], int]], k: int
+    ) -> list[list[SearchHit]]:
+        idfs = {term: self.idf(term) for terms, _ in queries for term in terms}
+        hits: list[list[SearchHit]] = [[] for _ in queries]
+        for part, dead, base in zip(self.parts, self.dead, self.bases):
+            rows = [self._part_terms(part, terms, idfs) for terms, _ in queries]
+            accumulators = part.accumulate_batch(rows, self._norm_base, self._norm_scale, dead=dead)
+            for row_hits, row_acc, (_, query_term_count) in zip(hits, accumulators, queries):
+                row_hits.extend(part.batch_hits(row_acc, query_term_count, base=base))
+        return [heapq.nlargest(k, row_hits) if k > 0 else [] for row_hits in hits]
+
+    def jaccard(self, ordinal: int, matched_terms: int, query_term_count: int) -> float:
+        part, local = self.locate(ordinal)
+        return self.parts[part].jaccard(local, matched_terms, query_term_count)
+
+    def term_document_frequency(self) -> dict[str, int]:
+        counts: Counter[str] = Counter()
+        for part in self.parts:
+            for term_id, term in enumerate(part.vocabulary):
+                counts[term] += part.document_frequency(term_id)
+        counts.subtract(self._dead_df)
+        return {term: counts[term] for term in sorted(counts) if counts[term] > 0}
+
+    def layout(self) -> str:
+        parts = [[entry["file"], entry.get("dead", [])] for entry in self.manifest["parts"]]
+        return hashlib.sha256(codec.dumpb(parts)).hexdigest()[:16]
+
+
+def dead_document_frequency(part: BM25Index, ordinals: Iterable[int], tokenize: Tokenizer) -> Counter[str]:
+    counts: Counter[str] = Counter()
+    for local in ordinals:
+        counts.update(set(tokenize(str(part.segments[local].get("text", "")))))
+    return counts
+
+
+@contextlib.contextmanager
+def locked(directory: Path) -> Iterator[None]:
+    # Exclusive lock on the index directory. Every load-manifest, write-part,
+    # publish-manifest, prune sequence runs under it, so concurrent runs
+    # never allocate the same part name or prune a part another run is about
+    # to publish.
+    directory.mkdir(parents=True, exist_ok=True)
+    with (directory / LOCK_NAME).open("a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def load_manifest(directory: Path) -> dict[str, Any] | None:
+    path = directory / MANIFEST_NAME
+    if not path.exists():
+        return None
+    try:
+        manifest = codec.read(path)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("parts"), list):
+        return None
+    return manifest
+
+
+def is_compatible(manifest: dict[str, Any], k1: float, b: float) -> bool:
+    return (
+        manifest.get("format_version") == storage.FORMAT_VERSION
+        and manifest.get("k1") == k1
+        and manifest.get("b") == b
+    )
+
+
+def write_manifest(directory: Path, manifest: dict[str, Any]) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    return codec.write_atomic(directory / MANIFEST_NAME, manifest)
+
+
+def open_live_index(directory: Path, manifest: dict[str, Any], tokenize: Tokenizer) -> LiveIndex:
+    parts: list[BM25Index] = []
+    dead: list[set[int]] = []
+    for entry in manifest["parts"]:
+        part = storage.open_index(directory / str(entry["file"]))
+        if part.k1 != float(manifest["k1"]) or part.b != float(manifest["b"]):
+            raise ValueError(f"Index part {entry['file']} has mismatched BM25 parameters")
+        parts.append(part)
+        dead.append({int(ordinal) for ordinal in entry.get("dead", [])})
+    return LiveIndex(directory, manifest, parts, dead, tokenize)
+
+
+def _write_part(directory: Path, manifest: dict[str, Any], part: BM25Index) -> str:
+    sequence = int(manifest.get("next_part", 1))
+    name = f"part_{sequence:06d}.idx"
+    storage.write_index(part, directory / name)
+    manifest["next_part"] = sequence + 1
+    return name
+
+
+def create(
+    directory: Path,
+    part: BM25Index,
+    corpus_checksum: str,
+    previous: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    manifest: dict[str, Any] = {
+        "format_version": storage.FORMAT_VERSION,
+        "version": int((previous or {}).get("version", 0)) + 1,
+        "next_part": int((previous or {}).get("next_part", 1)),
+        "k1": part.k1,
+        "b": part.b,
+        "corpus_checksum": corpus_checksum,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "parts": [],
+    }
+    manifest["parts"].append({"file": _write_part(directory, manifest, part), "dead": [], "dead_df": {}})
+    write_manifest(directory, manifest)
+    return manifest
+
+
+def _normalized_segments(segments: Iterable[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    incoming: dict[str, dict[str, Any]] = {}
+    for segment in segments:
+        segment_id = str(segment.get("segment_id", "")).strip()
+        if segment_id:
+            incoming[segment_id] = segment
+    return incoming
+
+
+def plan_update(
+    live: LiveIndex, segments: Iterable[dict[str, Any]]
+) -> tuple[list[dict[str, Any]], dict[int, set[int]], dict[str, int]]:
+    current: dict[str, tuple[int, int, bytes]] = {}
+    for part_idx, (part, dead) in enumerate(zip(live.parts, live.dead)):
+        digests = part.segment_digests
+        for local in range(part.segment_count):
+            if local in dead:
+                continue
+            digest = bytes(digests[local * DIGEST_SIZE : (local + 1) * DIGEST_SIZE])
+            current[part.segment_ids[local]] = (part_idx, local, digest)
+
+    changed: list[dict[str, Any]] = []
+    tombstones: dict[int, set[int]] = {}
+    added = updated = 0
+    for segment_id, segment in _normalized_segments(segments).items():
+        record = {
+            "segment_id": segment_id,
+            "doc_id": segment.get("doc_id"),
+            "clause_id": segment.get("clause_id"),
+            "text": segment.get("text", ""),
+        }
+        existing = current.pop(segment_id, None)
+        if existing is None:
+            added += 1
+            changed.append(segment)
+        elif existing[2] != segment_digest(record):
+            updated += 1
+            changed.append(segment)
+            tombstones.setdefault(existing[0], set()).add(existing[1])
+
+    for part_idx, local, _ in current.values():
+        tombstones.setdefault(part_idx, set()).add(local)
+
+    stats = {"added": added, "updated": updated, "removed": len(current)}
+    return changed, tombstones, stats
+
+
+def apply_update(
+    live: LiveIndex,
+    changed: list[dict[str, Any]],
+    tombstones: dict[int, set[int]],
+    corpus_checksum: str,
+    tokenize: Tokenizer,
+) -> dict[str, Any]:
+    manifest = codec.loads(codec.dumpb(live.manifest))
+    manifest["corpus_checksum"] = corpus_checksum
+    if changed or tombstones:
+        manifest["version"] = int(manifest.get("version", 0)) + 1
+        manifest["updated_at"] = datetime.now(timezone.utc).isoformat()
+        parts: list[dict[str, Any]] = []
+        for part_idx, (entry, part) in enumerate(zip(manifest["parts"], live.parts)):
+            dead = set(entry.get("dead", []))
+            new_dead = tombstones.get(part_idx, set()) - dead
+            # Parts whose every segment is tombstoned carry no live data.
+            if len(dead | new_dead) >= part.segment_count:
+                continue
+            # Document frequencies of tombstoned segments are kept in the
+            # manifest, so opening the index never re-tokenizes dead text;
+            # only newly tombstoned segments are tokenized here.
+            if isinstance(entry.get("dead_df"), dict):
+                dead_df = Counter(entry["dead_df"]) + dead_document_frequency(part, new_dead, tokenize)
+            else:
+                dead_df = dead_document_frequency(part, dead | new_dead, tokenize)
+            parts.append(
+                {
+                    "file": entry["file"],
+                    "dead": sorted(dead | new_dead),
+                    "dead_df": {term: dead_df[term] for term in sorted(dead_df)},
+                }
+            )
+        if changed:
+            part = BM25Index.build(changed, tokenize=tokenize, k1=live.k1, b=live.b)
+            parts.append({"file": _write_part(live.directory, manifest, part), "dead": [], "dead_df": {}})
+        manifest["parts"] = parts
+    write_manifest(live.directory, manifest)
+    return manifest
+
+
+def needs_merge(live: LiveIndex, max_parts: int, tombstone_ratio: float) -> bool:
+    if len(live.parts) > max(max_parts, 1):
+        return True
+    dead = live.ordinal_count - live.segment_count
+    return bool(live.ordinal_count) and dead / live.ordinal_count > tombstone_ratio
+
+
+def merge_parts(live: LiveIndex) -> BM25Index:
+    # Posting-level merge: live postings are concatenated per term with
+    # ordinals remapped past tombstones, so no text is re-tokenised.
+    remaps: list[array] = []
+    records = SegmentTable()
+    digests = bytearray()
+    doc_lengths = array("I")
+    unique_term_counts = array("I")
+    for part, dead in zip(live.parts, live.dead):
+        remap = array("q", [-1]) * part.segment_count
+        for local in range(part.segment_count):
+            if local in dead:
+                continue
+            remap[local] = len(records)
+            records.append(part.segments[local])
+            digests += part.segment_digests[local * DIGEST_SIZE : (local + 1) * DIGEST_SIZE]
+            doc_lengths.append(part.doc_lengths[local])
+            unique_term_counts.append(part.unique_term_counts[local])
+        remaps.append(remap)
+
+    vocabulary: list[str] = []
+    offsets = array("Q", [0])
+    postings_segments = array("I")
+    postings_freqs = array("I")
+    term_max_freqs = array("I")
+    term_min_lengths = array("I")
+
+    streams = [
+        zip(part.vocabulary, repeat(part_idx), count()) for part_idx, part in enumerate(live.parts)
+    ]
+    pending_term: str | None = None
+    pending: list[tuple[int, int]] = []
+
+    def flush() -> None:
+        start = len(postings_segments)
+        for part_idx, term_id in pending:
+            part = live.parts[part_idx]
+            remap = remaps[part_idx]
+            lo, hi = part.offsets[term_id], part.offsets[term_id + 1]
+            for ordinal, tf in zip(part.postings_segments[lo:hi], part.postings_freqs[lo:hi]):
+                merged = remap[ordinal]
+                if merged >= 0:
+                    postings_segments.append(merged)
+                    postings_freqs.append(tf)
+        if len(postings_segments) == start:
+            return
+        vocabulary.append(pending_term or "")
+        offsets.append(len(postings_segments))
+        term_max_freqs.append(max(postings_freqs[start:]))
+        term_min_lengths.append(min(doc_lengths[ordinal] for ordinal in postings_segments[start:]))
+
+    for term, part_idx, term_id in heapq.merge(*streams):
+        if term != pending_term and pending:
+            flush()
+            pending = []
+        pending_term = term
+        pending.append((part_idx, term_id))
+    if pending:
+        flush()
+
+    return BM25Index(
+        vocabulary=vocabulary,
+        offsets=offsets,
+        postings_segments=postings_segments,
+        postings_freqs=postings_freqs,
+        doc_lengths=doc_lengths,
+        unique_term_counts=unique_term_counts,
+        term_max_freqs=term_max_freqs,
+        term_min_lengths=term_min_lengths,
+        segment_ids=records.segment_ids,
+        segments=records,
+        segment_digests=bytes(digests),
+        k1=live.k1,
+        b=live.b,
+    )
+
+
+def compact(directory: Path, manifest: dict[str, Any], tokenize: Tokenizer) -> dict[str, Any]:
+    # Callers hold ``locked(directory)``. ``manifest`` is the one the caller
+    # opened; if another run has published since, the merge is skipped.
+    started = time.perf_counter()
+    if load_manifest(directory) != manifest:
+        return {"status": "skipped", "reason": "index changed since it was opened"}
+    live = open_live_index(directory, manifest, tokenize)
+    merged = merge_parts(live)
+
+    compacted = codec.loads(codec.dumpb(manifest))
+    name = _write_part(directory, compacted, merged)
+    compacted["parts"] = [{"file": name, "dead": [], "dead_df": {}}]
+    compacted["merged_at"] = datetime.now(timezone.utc).isoformat()
+    write_manifest(directory, compacted)
+    return {
+        "status": "merged",
+        "parts_before": len(manifest["parts"]),
+        "segment_count": merged.segment_count,
+        "seconds": round(time.perf_counter() - started, 6),
+    }
+
+
+def remove_unreferenced_parts(directory: Path) -> list[str]:
+    manifest = load_manifest(directory)
+    if manifest is None:
+        return []
+    referenced = {str(entry["file"]) for entry in manifest["parts"]}
+    removed: list[str] = []
+    for path in directory.glob("*.idx"):
+        if path.name in referenced:
+            continue
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        removed.append(path.name)
+    return sorted(removed)
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import bisect
+import struct
+from array import array
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from regdelta import codec
+from regdelta.index import storage
+
+MAGIC = b"RDDOCOFF"
+FORMAT_VERSION = 1
+SUFFIX = ".idx"
+
+# magic, format_version, section_count, document_count, documents_size
+_HEADER = struct.Struct("<8sIIQQ")
+# doc_id offsets, doc_id blob, byte offsets, byte lengths
+_TYPECODES = ["Q", "B", "Q", "I"]
+
+
+def index_path_for(documents_path: Path) -> Path:
+    return documents_path.with_name(f"{documents_path.name}{SUFFIX}")
+
+
+class OffsetIndexWriter:
+    # Records where each line of a doc_id-sorted JSONL file starts. Lines
+    # must arrive in file order and doc_ids in strictly ascending order, so
+    # the written index can be binary searched without a sort step.
+
+    def __init__(self) -> None:
+        self.doc_ids: list[str] = []
+        self.offsets = array("Q")
+        self.lengths = array("I")
+        self.position = 0
+
+    def add(self, doc_id: str, line_length: int) -> None:
+        if self.doc_ids and doc_id <= self.doc_ids[-1]:
+            raise ValueError(f"Document ids must be strictly ascending: {doc_id!r} after {self.doc_ids[-1]!r}")
+        self.doc_ids.append(doc_id)
+        self.offsets.append(self.position)
+        # The stored length excludes the trailing newline.
+        self.lengths.append(line_length - 1)
+        self.position += line_length
+
+    def write(self, path: Path) -> Path:
+        id_offsets, id_blob = storage.string_table(self.doc_ids)
+        header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(_TYPECODES), len(self.doc_ids), self.position)
+        payloads = [
+            storage.as_bytes(id_offsets, "Q"),
+            id_blob,
+            storage.as_bytes(self.offsets, "Q"),
+            storage.as_bytes(self.lengths, "I"),
+        ]
+        return storage.write_sectioned_file(path, header, payloads)
+
+
+def build_offset_index(documents_path: Path, index_path: Path | None = None) -> Path:
+    # For plain JSONL files written before the sidecar existed. Every line
+    # is parsed once for its doc_id; lines are then indexed in doc_id order
+    # with the last occurrence of a duplicate doc_id winning.
+    entries: dict[str, tuple[int, int]] = {}
+    position = 0
+    with documents_path.open("rb") as f:
+        for raw_line in f:
+            line = raw_line.rstrip(b"\r\n")
+            if line.strip():
+                record = codec.loads(line)
+                if isinstance(record, dict) and record.get("doc_id") is not None:
+                    entries[str(record["doc_id"])] = (position, len(line))
+            position += len(raw_line)
+
+    writer = OffsetIndexWriter()
+    for doc_id in sorted(entries):
+        writer.doc_ids.append(doc_id)
+        offset, length = entries[doc_id]
+        writer.offsets.append(offset)
+        writer.lengths.append(length)
+    writer.position = position
+    return writer.write(index_path or index_path_for(documents_path))
+
+
+class DocumentReader:
+    # Random access to a JSONL documents file through its offset index. Both
+    # files are memory-mapped; a lookup is a binary search over the sorted
+    # doc_id table followed by parsing only the matching line.
+
+    def __init__(self, documents_path: Path, index_path: Path | None = None) -> None:
+        index_path = index_path or index_path_for(documents_path)
+        self.documents_path = documents_path
+        self.index_path = index_path
+
+        index_mapping, view = storage.map_file(index_path)
+        if len(view) < _HEADER.size:
+            raise ValueError(f"Truncated document offset index: {index_path}")
+        magic, version, section_count, document_count, documents_size = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or section_count != len(_TYPECODES):
+            raise ValueError(f"Unsupported document offset index format in {index_path}")
+        id_offsets, id_blob, self._offsets, self._lengths = storage.read_sections(
+            view, _HEADER.size, _TYPECODES, index_path
+        )
+        self._doc_ids = storage.StringTable(id_offsets, id_blob)
+        if len(self._doc_ids) != document_count or len(self._offsets) != document_count:
+            raise ValueError(f"Inconsistent document offset index section sizes: {index_path}")
+        if documents_path.stat().st_size != documents_size:
+            raise ValueError(f"Document offset index {index_path} does not match {documents_path}")
+
+        # Keep the mappings alive for as long as the section views reference them.
+        self.mappings = [index_mapping]
+        self._documents = memoryview(b"")
+        if documents_size:
+            documents_mapping, self._documents = storage.map_file(documents_path)
+            self.mappings.append(documents_mapping)
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    def __contains__(self, doc_id: object) -> bool:
+        return isinstance(doc_id, str) and self._position(doc_id) is not None
+
+    def _position(self, doc_id: str) -> int | None:
+        idx = bisect.bisect_left(self._doc_ids, doc_id)
+        if idx < len(self._doc_ids) and self._doc_ids[idx] == doc_id:
+            return idx
+        return None
+
+    def doc_ids(self) -> Iterator[str]:
+        return iter(self._doc_ids)
+
+    def raw(self, doc_id: str) -> bytes | None:
+        idx = self._position(doc_id)
+        if idx is None:
+            return None
+        offset = self._offsets[idx]
+        return bytes(self._documents[offset : offset + self._lengths[idx]])
+
+    def get(self, doc_id: str) -> dict[str, Any] | None:
+        payload = self.raw(doc_id)
+        return codec.loads(payload) if payload is not None else None
+
+    def get_many(self, doc_ids: Iterable[str]) -> dict[str, dict[str, Any]]:
+        found: dict[str, dict[str, Any]] = {}
+        # Sorted lookups walk the mapped file front to back.
+        for doc_id in sorted(set(doc_ids)):
+            document = self.get(doc_id)
+            if document is not None:
+                found[doc_id] = document
+        return found
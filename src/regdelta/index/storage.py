@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Sequence
+
+from regdelta import codec, tokenizer
+from regdelta.index.bm25 import BM25Index
+
+MAGIC = b"RDBM25IX"
+FORMAT_VERSION = 3
+
+# magic, format_version, section_count, segment_count, vocabulary_size,
+# postings_count, total_length, k1, b
+_HEADER = struct.Struct("<8sIIQQQQdd")
+_SECTION = struct.Struct("<QQ")
+_ALIGN = 8
+
+# Section order is part of the format; bump FORMAT_VERSION when it changes.
+_SECTIONS: tuple[tuple[str, str], ...] = (
+    ("vocab_offsets", "Q"),
+    ("vocab_blob", "B"),
+    ("postings_offsets", "Q"),
+    ("postings_segments", "I"),
+    ("postings_freqs", "I"),
+    ("doc_lengths", "I"),
+    ("unique_term_counts", "I"),
+    ("term_max_freqs", "I"),
+    ("term_min_lengths", "I"),
+    ("segment_id_offsets", "Q"),
+    ("segment_id_blob", "B"),
+    ("segment_digests", "B"),
+    ("record_offsets", "Q"),
+    ("record_blob", "B"),
+)
+
+
+class StringTable:
+    def __init__(self, offsets: Sequence[int], blob: memoryview) -> None:
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[idx] for idx in range(len(self)))
+
+    def __getitem__(self, idx: int) -> str:
+        return bytes(self._blob[self._offsets[idx] : self._offsets[idx + 1]]).decode("utf-8")
+
+
+class _RecordTable(StringTable):
+    def __iter__(self) -> Iterator[dict[str, Any]]:  # type: ignore[override]
+        return (self[idx] for idx in range(len(self)))
+
+    def __getitem__(self, idx: int) -> dict[str, Any]:  # type: ignore[override]
+        return codec.loads(bytes(self._blob[self._offsets[idx] : self._offsets[idx + 1]]))
+
+
+def corpus_checksum(segments: Iterable[dict[str, Any]], k1: float, b: float) -> str:
+    digest = hashlib.sha256(f"bm25:v{FORMAT_VERSION}:tok{tokenizer.VERSION}:{k1!r}:{b!r}".encode("utf-8"))
+    for segment in segments:
+        fields = (
+            str(segment.get("segment_id", "")),
+            str(segment.get("doc_id", "")),
+            str(segment.get("clause_id", "")),
+            str(segment.get("text", "")),
+        )
+        digest.update("\x1f".join(fields).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def string_table(values: Iterable[str]) -> tuple[array, bytes]:
+    offsets = array("Q", [0])
+    chunks: list[bytes] = []
+    total = 0
+    for value in values:
+        encoded = value.encode("utf-8")
+        chunks.append(encoded)
+        total += len(encoded)
+        offsets.append(total)
+    return offsets, b"".join(chunks)
+
+
+def as_bytes(data: Any, typecode: str) -> bytes:
+    if typecode == "B":
+        return bytes(data)
+    if isinstance(data, array) and data.typecode == typecode:
+        return data.tobytes()
+    return array(typecode, data).tobytes()
+
+
+def write_index(index: BM25Index, path: Path) -> Path:
+    vocab_offsets, vocab_blob = string_table(index.vocabulary)
+    segment_id_offsets, segment_id_blob = string_table(index.segment_ids)
+    record_offsets, record_blob = string_table(
+        codec.dumps(dict(index.segments[ordinal]))
+        for ordinal in range(index.segment_count)
+    )
+    sections = {
+        "vocab_offsets": vocab_offsets,
+        "vocab_blob": vocab_blob,
+        "postings_offsets": index.offsets,
+        "postings_segments": index.postings_segments,
+        "postings_freqs": index.postings_freqs,
+        "doc_lengths": index.doc_lengths,
+        "unique_term_counts": index.unique_term_counts,
+        "term_max_freqs": index.term_max_freqs,
+        "term_min_lengths": index.term_min_lengths,
+        "segment_id_offsets": segment_id_offsets,
+        "segment_id_blob": segment_id_blob,
+        "segment_digests": index.segment_digests,
+        "record_offsets": record_offsets,
+        "record_blob": record_blob,
+    }
+
+    header = _HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        len(_SECTIONS),
+        index.segment_count,
+        len(index.vocabulary),
+        len(index.postings_segments),
+        index.total_length,
+        index.k1,
+        index.b,
+    )
+    return write_sectioned_file(
+        path, header, [as_bytes(sections[name], typecode) for name, typecode in _SECTIONS]
+    )
+
+
+def write_sectioned_file(path: Path, header: bytes, payloads: list[bytes]) -> Path:
+    # Layout: header, (offset, length) table, then 8-byte aligned sections.
+    position = len(header) + _SECTION.size * len(payloads)
+    table: list[tuple[int, int]] = []
+    for data in payloads:
+        position += -position % _ALIGN
+        table.append((position, len(data)))
+        position += len(data)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    with tmp_path.open("wb") as f:
+        f.write(header)
+        for offset, length in table:
+            f.write(_SECTION.pack(offset, length))
+        for (offset, _), data in zip(table, payloads):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(data)
+    # Atomic swap so concurrent readers only ever see a complete file.
+    os.replace(tmp_path, path)
+    return path
+
+
+def map_file(path: Path) -> tuple[mmap.mmap, memoryview]:
+    if sys.byteorder != "little":
+        raise ValueError("Memory-mapped index files require a little-endian host")
+    with path.open("rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return mapping, memoryview(mapping)
+
+
+def read_sections(
+    view: memoryview, header_size: int, typecodes: list[str], path: Path
+) -> list[memoryview]:
+    if len(view) < header_size + _SECTION.size * len(typecodes):
+        raise ValueError(f"Truncated index file: {path}")
+    sections: list[memoryview] = []
+    for idx, typecode in enumerate(typecodes):
+        offset, length = _SECTION.unpack_from(view, header_size + idx * _SECTION.size)
+        if offset + length > len(view):
+            raise ValueError(f"Truncated index section {idx}: {path}")
+        chunk = view[offset : offset + length]
+        sections.append(chunk if typecode == "B" else chunk.cast(typecode))
+    return sections
+
+
+def open_index(path: Path) -> BM25Index:
+    mapping, view = map_file(path)
+    if len(view) < _HEADER.size:
+        raise ValueError(f"Truncated BM25 index file: {path}")
+    (
+        magic,
+        version,
+        section_count,
+        segment_count,
+        vocabulary_size,
+        postings_count,
+        total_length,
+        k1,
+        b,
+    ) = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version != FORMAT_VERSION or section_count != len(_SECTIONS):
+        raise ValueError(f"Unsupported BM25 index format in {path}")
+
+    views = read_sections(view, _HEADER.size, [typecode for _, typecode in _SECTIONS], path)
+    sections = {name: section for (name, _), section in zip(_SECTIONS, views)}
+
+    if len(sections["doc_lengths"]) != segment_count or len(sections["postings_segments"]) != postings_count:
+        raise ValueError(f"Inconsistent BM25 index section sizes: {path}")
+
+    index = BM25Index(
+        vocabulary=StringTable(sections["vocab_offsets"], sections["vocab_blob"]),
+        offsets=sections["postings_offsets"],
+        postings_segments=sections["postings_segments"],
+        postings_freqs=sections["postings_freqs"],
+        doc_lengths=sections["doc_lengths"],
+        unique_term_counts=sections["unique_term_counts"],
+        term_max_freqs=sections["term_max_freqs"],
+        term_min_lengths=sections["term_min_lengths"],
+        segment_ids=StringTable(sections["segment_id_offsets"], sections["segment_id_blob"]),
+        segments=_RecordTable(sections["record_offsets"], sections["record_blob"]),
+        segment_digests=sections["segment_digests"],
+        k1=k1,
+        b=b,
+        total_length=total_length,
+    )
+    if len(index.vocabulary) != vocabulary_size:
+        raise ValueError(f"Inconsistent BM25 index vocabulary size: {path}")
+    # Keep the mapping alive for as long as the index views reference it.
+    index.mapping = mapping
+    return index
+
+
+def prune_indices(directory: Path, keep: int, pattern: str = "*.idx") -> list[Path]:
+    candidates = sorted(
+        directory.glob(pattern), key=lambda item: item.stat().st_mtime, reverse=True
+    )
+    removed: list[Path] = []
+    for stale in candidates[max(keep, 1) :]:
+        try:
+            stale.unlink()
+        except OSError:
+            continue
+        removed.append(stale)
+    return removed
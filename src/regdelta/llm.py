@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import http.client
+import os
+import urllib.error
+import urllib.request
+from typing import Any
+
+from regdelta import codec
+
+# Rate limiting and transient server-side failures; other HTTP errors are
+# request problems that a retry would only repeat.
+_RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class CompletionError(RuntimeError):
+    pass
+
+
+class ChatClient:
+    # Client for the /chat/completions endpoint of an OpenAI-compatible server
+    # (vLLM, llama.cpp, TGI). urllib is blocking, so each request runs on a
+    # worker thread and callers bound concurrency with their own semaphore.
+
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        api_key: str | None = None,
+        timeout: float = 120.0,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.5,
+    ) -> None:
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max(int(max_retries), 0)
+        self.backoff_seconds = max(float(backoff_seconds), 0.0)
+
+    @classmethod
+    def from_config(cls, settings: dict[str, Any], model: str) -> ChatClient:
+        api_key_env = str(settings.get("api_key_env", "") or "")
+        return cls(
+            base_url=str(settings.get("base_url", "http://127.0.0.1:8000/v1")),
+            model=model,
+            api_key=os.environ.get(api_key_env) if api_key_env else None,
+            timeout=float(settings.get("timeout_seconds", 120.0)),
+            max_retries=int(settings.get("max_retries", 3)),
+            backoff_seconds=float(settings.get("backoff_seconds", 0.5)),
+        )
+
+    def _post(self, body: dict[str, Any]) -> dict[str, Any]:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(self.url, data=codec.dumpb(body), headers=headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            payload = codec.loads(response.read())
+        # Shape errors are raised here as ValueError, so they are retried like
+        # any other bad response instead of escaping the caller's gather.
+        choices = payload.get("choices") if isinstance(payload, dict) else None
+        if not isinstance(choices, list) or not choices or not isinstance(choices[0], dict):
+            raise ValueError("completion response has no choices")
+        message = choices[0].get("message")
+        if message is not None and not isinstance(message, dict):
+            raise ValueError("completion choice has a malformed message")
+        if not isinstance(payload.get("usage") or {}, dict):
+            raise ValueError("completion response has malformed usage")
+        return payload
+
+    async def complete(
+        self,
+        messages: list[dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        json_mode: bool = False,
+    ) -> tuple[dict[str, Any], int]:
+        # Returns the response payload and the number of attempts it took.
+        # Retries back off exponentially: backoff, 2*backoff, 4*backoff, ...
+        body: dict[str, Any] = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+        if json_mode:
+            body["response_format"] = {"type": "json_object"}
+
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await asyncio.to_thread(self._post, body), attempt
+            except urllib.error.HTTPError as exc:
+                retryable = exc.code in _RETRY_STATUSES
+                error = f"HTTP {exc.code}"
+            except (urllib.error.URLError, OSError, http.client.HTTPException, ValueError) as exc:
+                retryable = True
+                error = str(getattr(exc, "reason", exc))
+            if not retryable or attempt > self.max_retries:
+                raise CompletionError(f"{error} after {attempt} attempt(s)")
+            await asyncio.sleep(self.backoff_seconds * 2 ** (attempt - 1))
+
+
+def message_content(payload: dict[str, Any]) -> str:
+    choice = payload["choices"][0]
+    message = choice.get("message") or {}
+    return str(message.get("content") or choice.get("text") or "")
+
+
+def request_stats(payload: dict[str, Any] | None, seconds: float) -> dict[str, Any]:
+    usage = (payload or {}).get("usage") or {}
+    prompt_tokens = usage.get("prompt_tokens")
+    completion_tokens = usage.get("completion_tokens")
+    if not isinstance(completion_tokens, int):
+        completion_tokens = None
+    return {
+        "seconds": round(seconds, 6),
+        "prompt_tokens": prompt_tokens if isinstance(prompt_tokens, int) else None,
+        "completion_tokens": completion_tokens,
+        "tokens_per_second": (
+            round(completion_tokens / seconds, 2)
+            if completion_tokens is not None and seconds > 0
+            else None
+        ),
+    }
+
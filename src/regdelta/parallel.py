@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def configured_workers(config: dict[str, Any]) -> int:
+    try:
+        workers = int(config.get("runtime", {}).get("max_workers", 1))
+    except (TypeError, ValueError):
+        return 1
+    return max(workers, 1)
+
+
+def can_fork() -> bool:
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def process_pool(
+    workers: int,
+    initializer: Callable[..., None] | None = None,
+    initargs: tuple[Any, ...] = (),
+) -> ProcessPoolExecutor:
+    # Fork lets workers inherit read-only state (indices, lookups) copy-on-write.
+    context = multiprocessing.get_context("fork" if can_fork() else None)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=initializer,
+        initargs=initargs,
+    )
+
+
+def ordered_map(
+    executor: Executor, fn: Callable[[T], R], tasks: Iterable[T], window: int
+) -> Iterator[R]:
+    # Like Executor.map, but keeps at most ``window`` tasks in flight so large
+    # task streams do not buffer every result in memory at once.
+    pending: deque[Future[R]] = deque()
+    for task in tasks:
+        pending.append(executor.submit(fn, task))
+        if len(pending) >= max(window, 1):
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def chunked(items: list[T], size: int) -> list[list[T]]:
+    size = max(size, 1)
+    return [items[start : start + size] for start in range(0, len(items), size)]
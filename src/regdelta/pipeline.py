@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-import json
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Callable
 
+from regdelta import codec
 from regdelta.contract import (
     load_pipeline_contract,
     stage_contract_map,
@@ -86,7 +86,6 @@ def run_pipeline(config: dict[str, Any], stages: list[str], repo_root: Path) ->
     }
 
     summary_path = run_dir / "run_summary.json"
-    with summary_path.open("w", encoding="utf-8") as f:
-        json.dump(summary, f, ensure_ascii=False, indent=2)
+    codec.write(summary_path, summary, pretty=codec.pretty_output(config))
 
     return summary_path
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import contextlib
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator
+
+from regdelta import codec
+
+FORMAT = "jsonl"
+
+
+def shard_name(header_path: Path, shard: int | None) -> str:
+    stem = header_path.name.removesuffix(".json")
+    return f"{stem}.jsonl" if shard is None else f"{stem}-{shard:05d}.jsonl"
+
+
+def write_records(
+    header_path: Path,
+    header: dict[str, Any],
+    records: Iterable[Any],
+    shard_records: int = 0,
+    pretty: bool = False,
+) -> Path:
+    # Streams ``records`` to JSONL next to ``header_path`` (one file, or
+    # shards of ``shard_records`` lines each), then writes the header: the
+    # caller's fields plus the format, record count and shard file names.
+    # The header is written only after every shard is complete.
+    stem = header_path.name.removesuffix(".json")
+    for pattern in (f"{stem}.jsonl", f"{stem}-*.jsonl"):
+        for stale in header_path.parent.glob(pattern):
+            stale.unlink()
+
+    shards: list[str] = []
+    count = 0
+    with contextlib.ExitStack() as stack:
+        f: IO[bytes] | None = None
+        for record in records:
+            if f is None or (shard_records > 0 and count % shard_records == 0):
+                stack.close()
+                shards.append(shard_name(header_path, len(shards) if shard_records > 0 else None))
+                f = stack.enter_context((header_path.parent / shards[-1]).open("wb"))
+            f.write(codec.dumpb(record))
+            f.write(b"\n")
+            count += 1
+
+    return codec.write(header_path, {**header, "format": FORMAT, "record_count": count, "shards": shards}, pretty=pretty)
+
+
+def read_header(path: str | Path) -> dict[str, Any]:
+    payload = codec.read(path)
+    if not isinstance(payload, dict):
+        raise ValueError(f"Expected JSON object in record artifact: {path}")
+    return payload
+
+
+def iter_records(path: str | Path, key: str) -> Iterator[Any]:
+    # Yields records from a JSONL artifact written by ``write_records``, or
+    # from the ``key`` list of a single-object artifact from older runs.
+    path = Path(path)
+    header = read_header(path)
+    if header.get("format") != FORMAT:
+        records = header.get(key, [])
+        if not isinstance(records, list):
+            raise ValueError(f"Expected {key!r} list in record artifact: {path}")
+        yield from records
+        return
+
+    for name in header.get("shards", []):
+        with (path.parent / str(name)).open("rb") as f:
+            for line in f:
+                if line.strip():
+                    yield codec.loads(line)
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import sys
+from array import array
+from collections.abc import Mapping
+from typing import Any, Iterable, Iterator, Sequence
+
+# token_count is optional per row; this code marks rows without one.
+_NO_COUNT = 0xFFFFFFFF
+_FIELDS = ("segment_id", "doc_id", "clause_id", "text")
+
+
+class _Interner:
+    def __init__(self) -> None:
+        self.values: list[Any] = []
+        self.codes: dict[Any, int] = {}
+
+    def code(self, value: Any) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class SegmentTable:
+    # Columnar segment storage. doc_id and clause_id are interned to integer
+    # codes, all texts live in one UTF-8 buffer addressed by an offsets
+    # array, and segment_id is derived as "{doc_id}:{clause_id}" unless a
+    # row overrides it. Fields outside the fixed columns (rare, e.g.
+    # duplicate_segment_ids) are kept sparsely per row. Rows are read through
+    # Segment views, which behave like the dicts they replace.
+
+    def __init__(self) -> None:
+        self._doc_ids = _Interner()
+        self._clause_ids = _Interner()
+        self._doc_codes = array("I")
+        self._clause_codes = array("I")
+        self._text_offsets = array("Q", [0])
+        self._text = bytearray()
+        self._token_counts = array("I")
+        self._extras: dict[int, dict[str, Any]] = {}
+
+    @classmethod
+    def from_records(cls, records: Iterable[Mapping[str, Any]]) -> SegmentTable:
+        table = cls()
+        table.extend(records)
+        return table
+
+    def __len__(self) -> int:
+        return len(self._doc_codes)
+
+    def __getitem__(self, row: int) -> Segment:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return Segment(self, row)
+
+    def __iter__(self) -> Iterator[Segment]:
+        return (Segment(self, row) for row in range(len(self)))
+
+    def add(
+        self,
+        doc_id: Any,
+        clause_id: Any,
+        text: str,
+        token_count: int | None = None,
+        segment_id: str | None = None,
+    ) -> int:
+        row = len(self)
+        self._doc_codes.append(self._doc_ids.code(doc_id))
+        self._clause_codes.append(self._clause_ids.code(clause_id))
+        self._text += text.encode("utf-8")
+        self._text_offsets.append(len(self._text))
+        self._token_counts.append(_NO_COUNT if token_count is None else token_count)
+        if segment_id is not None and segment_id != f"{doc_id}:{clause_id}":
+            self._extras[row] = {"segment_id": segment_id}
+        return row
+
+    def append(self, record: Mapping[str, Any]) -> int:
+        token_count = record.get("token_count")
+        segment_id = record.get("segment_id")
+        row = self.add(
+            record.get("doc_id"),
+            record.get("clause_id"),
+            str(record.get("text", "")),
+            int(token_count) if token_count is not None else None,
+            str(segment_id) if segment_id is not None else None,
+        )
+        for key, value in record.items():
+            if key not in _FIELDS and key != "token_count":
+                self.set_extra(row, key, value)
+        return row
+
+    def extend(self, records: Iterable[Mapping[str, Any]]) -> None:
+        for record in records:
+            self.append(record)
+
+    def copy_rows(self, source: SegmentTable, rows: Iterable[int]) -> None:
+        # Appends rows of another table without decoding their text.
+        for row in rows:
+            new_row = len(self)
+            self._doc_codes.append(self._doc_ids.code(source.doc_id(row)))
+            self._clause_codes.append(self._clause_ids.code(source.clause_id(row)))
+            start, end = source._text_offsets[row], source._text_offsets[row + 1]
+            self._text += source._text[start:end]
+            self._text_offsets.append(len(self._text))
+            self._token_counts.append(source._token_counts[row])
+            if row in source._extras:
+                self._extras[new_row] = dict(source._extras[row])
+
+    def select(self, rows: Iterable[int]) -> SegmentTable:
+        table = SegmentTable()
+        table.copy_rows(self, rows)
+        return table
+
+    def set_extra(self, row: int, key: str, value: Any) -> None:
+        self._extras.setdefault(row, {})[key] = value
+
+    def doc_id(self, row: int) -> Any:
+        return self._doc_ids.values[self._doc_codes[row]]
+
+    def clause_id(self, row: int) -> Any:
+        return self._clause_ids.values[self._clause_codes[row]]
+
+    def segment_id(self, row: int) -> str:
+        extras = self._extras.get(row)
+        if extras is not None and "segment_id" in extras:
+            return extras["segment_id"]
+        return f"{self.doc_id(row)}:{self.clause_id(row)}"
+
+    def text(self, row: int) -> str:
+        return self._text[self._text_offsets[row] : self._text_offsets[row + 1]].decode("utf-8")
+
+    def token_count(self, row: int) -> int | None:
+        count = self._token_counts[row]
+        return None if count == _NO_COUNT else count
+
+    @property
+    def segment_ids(self) -> SegmentIds:
+        return SegmentIds(self)
+
+    def records(self) -> Iterator[dict[str, Any]]:
+        return (dict(Segment(self, row)) for row in range(len(self)))
+
+    def nbytes(self) -> int:
+        # Columns and buffer, plus the interned id strings and sparse extras
+        # (shallow sizes: the extras' values are not walked).
+        total = sum(
+            sys.getsizeof(column)
+            for column in (self._doc_codes, self._clause_codes, self._text_offsets, self._text, self._token_counts)
+        )
+        for interner in (self._doc_ids, self._clause_ids):
+            total += sys.getsizeof(interner.values) + sys.getsizeof(interner.codes)
+            total += sum(sys.getsizeof(value) for value in interner.values)
+        total += sys.getsizeof(self._extras) + sum(sys.getsizeof(extra) for extra in self._extras.values())
+        return total
+
+    def memory_stats(self) -> dict[str, Any]:
+        total = self.nbytes()
+        return {
+            "segment_count": len(self),
+            "table_bytes": total,
+            "bytes_per_segment": round(total / len(self), 1) if len(self) else 0.0,
+        }
+
+
+class SegmentIds(Sequence[str]):
+    # segment_id column of a SegmentTable, derived on access.
+    __slots__ = ("_table",)
+
+    def __init__(self, table: SegmentTable) -> None:
+        self._table = table
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __getitem__(self, row: int) -> str:  # type: ignore[override]
+        return self._table.segment_id(row)
+
+
+class Segment(Mapping[str, Any]):
+    # Read-only view of one table row with the keys and order of the dict it
+    # replaces: segment_id, doc_id, clause_id, text, token_count (when set),
+    # then any extras.
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table: SegmentTable, row: int) -> None:
+        self._table = table
+        self._row = row
+
+    @property
+    def row(self) -> int:
+        return self._row
+
+    def _keys(self) -> list[str]:
+        keys = list(_FIELDS)
+        if self._table._token_counts[self._row] != _NO_COUNT:
+            keys.append("token_count")
+        extras = self._table._extras.get(self._row)
+        if extras:
+            keys.extend(key for key in extras if key != "segment_id")
+        return keys
+
+    def __getitem__(self, key: str) -> Any:
+        table, row = self._table, self._row
+        if key == "segment_id":
+            return table.segment_id(row)
+        if key == "doc_id":
+            return table.doc_id(row)
+        if key == "clause_id":
+            return table.clause_id(row)
+        if key == "text":
+            return table.text(row)
+        if key == "token_count":
+            count = table.token_count(row)
+            if count is not None:
+                return count
+        elif key in table._extras.get(row, ()):
+            return table._extras[row][key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys())
+
+    def __len__(self) -> int:
+        return len(self._keys())
+
+    def __repr__(self) -> str:
+        return f"Segment({dict(self)!r})"
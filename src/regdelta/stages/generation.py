@@ -1,27 +1,80 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import sqlite3
+import time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Iterator
 
+from regdelta import codec, llm, parallel, records
+from regdelta.cache import LRUCache, cache_key
+from regdelta.config import resolve_configured_path
+from regdelta.index import offsets
 
-def _load_json(path: str | None) -> dict[str, Any] | None:
-    if not path:
-        return None
-    payload_path = Path(path)
-    if not payload_path.exists():
-        return None
-    with payload_path.open("r", encoding="utf-8") as f:
-        loaded = json.load(f)
-    if not isinstance(loaded, dict):
-        return None
-    return loaded
+_SYSTEM_PROMPT = (
+    "You draft English compliance notes on changes to Vietnamese regulations. "
+    "For each input claim, write one factual sentence describing the change, using only "
+    "the clause texts and evidence given. Reply with a JSON object of the form "
+    '{"claims": [{"claim_id": "...", "statement": "..."}]} with one entry per input claim.'
+)
+
+
+class _DeltaStream:
+    # One lazy pass over the deltas artifact: yields delta records to claim
+    # building while tallying what the draft header needs, so the records
+    # themselves are never held as a list.
+
+    def __init__(self, deltas: Iterable[Any]) -> None:
+        self._deltas = deltas
+        self.count = 0
+        self.effective_dates: set[str] = set()
+        self.undated_doc_ids: set[str] = set()
+        self.invalid = False
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        try:
+            for delta in self._deltas:
+                if not isinstance(delta, dict):
+                    continue
+                self.count += 1
+                effective_date = str(delta.get("effective_date", "")).strip()
+                if effective_date:
+                    self.effective_dates.add(effective_date)
+                elif str(delta.get("new_doc_id") or "").strip():
+                    self.undated_doc_ids.add(str(delta["new_doc_id"]).strip())
+                yield delta
+        except ValueError:
+            self.invalid = True
+
+
+def _document_effective_dates(context: dict[str, Any], doc_ids: set[str], warnings: list[str]) -> set[str]:
+    # Processing deltas carry no document metadata, so effective dates of
+    # the versions they introduce are read from the documents themselves:
+    # a binary search per doc_id in ingestion's offset index, rather than a
+    # scan of documents.jsonl.
+    ingestion_artifacts = context.get("artifacts", {}).get("ingestion", {})
+    documents_path = ingestion_artifacts.get("documents")
+    index_path = ingestion_artifacts.get("documents_index")
+    if not doc_ids or not documents_path or not index_path:
+        return set()
+    try:
+        reader = offsets.DocumentReader(Path(documents_path), Path(index_path))
+        documents = reader.get_many(doc_ids)
+    except (OSError, ValueError) as exc:
+        warnings.append(f"Could not read document effective dates: {exc}")
+        return set()
+    return {str(doc.get("effective_date", "")).strip() for doc in documents.values()} - {""}
 
 
 def _build_claims(
-    deltas: list[dict[str, Any]], query_candidates: list[dict[str, Any]]
+    deltas: Iterable[dict[str, Any]],
+    query_candidates: list[dict[str, Any]],
+    inputs: list[dict[str, Any]] | None = None,
 ) -> list[dict[str, Any]]:
+    # When ``inputs`` is given, the LLM prompt inputs of each claim (the
+    # delta's clause texts plus the text of the candidates it cites) are
+    # appended to it in claim order.
     claims: list[dict[str, Any]] = []
     for idx, delta in enumerate(deltas, start=1):
         change_type = str(delta.get("change_type", "amended")).strip() or "amended"
@@ -34,35 +87,224 @@ def _build_claims(
             if not old_doc_id
             else f"Clause {clause_id} changed from {old_doc_id} to {new_doc_id}"
         )
+        if change_type == "moved" and old_doc_id:
+            statement = (
+                f"Clause {delta.get('old_clause_id')} in {old_doc_id} moved unchanged "
+                f"to {delta.get('new_clause_id')} in {new_doc_id}"
+            )
 
-        citations: list[dict[str, Any]] = []
+        cited: list[dict[str, Any]] = []
         if idx - 1 < len(query_candidates):
             candidates = query_candidates[idx - 1].get("candidates", [])
             if isinstance(candidates, list):
-                for candidate in candidates[:2]:
-                    if not isinstance(candidate, dict):
-                        continue
-                    citations.append(
-                        {
-                            "doc_id": candidate.get("doc_id"),
-                            "clause_id": candidate.get("clause_id"),
-                            "segment_id": candidate.get("segment_id"),
-                            "rank": candidate.get("rank"),
-                        }
-                    )
+                cited = [candidate for candidate in candidates[:2] if isinstance(candidate, dict)]
+        citations = [
+            {
+                "doc_id": candidate.get("doc_id"),
+                "clause_id": candidate.get("clause_id"),
+                "segment_id": candidate.get("segment_id"),
+                "rank": candidate.get("rank"),
+            }
+            for candidate in cited
+        ]
 
+        claim_id = f"claim_{idx:03d}"
         claims.append(
             {
-                "claim_id": f"claim_{idx:03d}",
+                "claim_id": claim_id,
                 "statement": statement,
                 "change_type": change_type,
                 "citations": citations,
             }
         )
+        if inputs is not None:
+            inputs.append(
+                {
+                    "claim_id": claim_id,
+                    "change_type": change_type,
+                    "draft": statement,
+                    "old_text": str(delta.get("old_text", "")),
+                    "new_text": str(delta.get("new_text", "")),
+                    "evidence": [
+                        {"segment_id": candidate.get("segment_id"), "text": str(candidate.get("text", ""))}
+                        for candidate in cited
+                    ],
+                }
+            )
 
     return claims
 
 
+def _parse_statements(content: str) -> dict[str, str]:
+    text = content.strip()
+    if text.startswith("```"):
+        text = text.strip("`").removeprefix("json").strip()
+    try:
+        payload = codec.loads(text)
+    except ValueError:
+        return {}
+    items = payload.get("claims", []) if isinstance(payload, dict) else payload
+    statements: dict[str, str] = {}
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict) and str(item.get("statement", "")).strip():
+            statements[str(item.get("claim_id", ""))] = str(item["statement"]).strip()
+    return statements
+
+
+async def _complete_batches(
+    client: llm.ChatClient,
+    batches: list[list[dict[str, Any]]],
+    concurrency: int,
+    max_tokens: int,
+    temperature: float,
+) -> list[tuple[dict[str, str], dict[str, Any]]]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def complete(request_id: int, batch: list[dict[str, Any]]) -> tuple[dict[str, str], dict[str, Any]]:
+        messages = [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            {"role": "user", "content": codec.dumps({"claims": batch})},
+        ]
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response, attempts = await client.complete(messages, max_tokens, temperature, json_mode=True)
+            except llm.CompletionError as exc:
+                stats = llm.request_stats(None, time.perf_counter() - started)
+                return {}, {"request_id": request_id, "claim_count": len(batch), "status": "failed", "error": str(exc), **stats}
+            seconds = time.perf_counter() - started
+        # Only claims this batch asked for are accepted; a claim_id from another
+        # batch or a made-up one would otherwise overwrite that claim's
+        # statement and be cached under its key.
+        requested = {claim["claim_id"] for claim in batch}
+        replied = _parse_statements(llm.message_content(response))
+        statements = {claim_id: text for claim_id, text in replied.items() if claim_id in requested}
+        return statements, {
+            "request_id": request_id,
+            "claim_count": len(batch),
+            "status": "ok",
+            "attempts": attempts,
+            "unrequested_claims": len(replied) - len(statements),
+            **llm.request_stats(response, seconds),
+        }
+
+    return await asyncio.gather(*(complete(idx, batch) for idx, batch in enumerate(batches)))
+
+
+def _open_generation_cache(context: dict[str, Any], warnings: list[str]) -> LRUCache | None:
+    cache_cfg = context.get("config", {}).get("generation", {}).get("cache", {})
+    if not isinstance(cache_cfg, dict):
+        cache_cfg = {}
+    interim_dir = resolve_configured_path(context, "data_interim")
+    if not bool(cache_cfg.get("enabled", True)) or interim_dir is None:
+        return None
+    path = interim_dir / "generation_cache.sqlite"
+    try:
+        return LRUCache(
+            path,
+            max_entries=int(cache_cfg.get("max_entries", 50000)),
+            max_bytes=int(float(cache_cfg.get("max_mb", 128)) * (1 << 20)),
+        )
+    except sqlite3.Error as exc:
+        warnings.append(f"Generation cache disabled, could not open {path}: {exc}")
+        return None
+
+
+def _generation_cache_key(claim_input: dict[str, Any], settings: dict[str, Any]) -> str:
+    # claim_id is positional within a run, so it is left out: the same delta
+    # and evidence map to the same entry whatever claim number they get.
+    prompt_inputs = {key: value for key, value in claim_input.items() if key != "claim_id"}
+    return cache_key("generation:v1", _SYSTEM_PROMPT, settings, prompt_inputs)
+
+
+def _generate_statements(
+    context: dict[str, Any],
+    claims: list[dict[str, Any]],
+    inputs: list[dict[str, Any]],
+    warnings: list[str],
+) -> dict[str, Any]:
+    # Rewrites claim statements through the configured LLM endpoint, a
+    # micro-batch of claims per request. Claims with a cached statement for
+    # the same model settings and prompt inputs skip the endpoint; claims
+    # whose request failed or whose reply omitted them keep their template
+    # statement.
+    config = context["config"]
+    generation_cfg = config.get("generation", {})
+    settings = generation_cfg.get("llm", {})
+    models = config.get("models", {})
+    model = str(models.get("generator_model", ""))
+    max_tokens = int(generation_cfg.get("max_new_tokens", 1200))
+    temperature = float(generation_cfg.get("temperature", 0.1))
+    client = llm.ChatClient.from_config(settings, model)
+    batch_size = max(int(settings.get("batch_size", 8)), 1)
+    concurrency = int(settings.get("concurrency", 0)) or parallel.configured_workers(config)
+
+    cache = _open_generation_cache(context, warnings)
+    # A reply truncated under a smaller token limit, or served by another
+    # endpoint under the same model name, is a different entry.
+    cache_settings = {
+        "model": model,
+        "quantization": models.get("quantization"),
+        "temperature": temperature,
+        "max_new_tokens": max_tokens,
+        "endpoint": client.url,
+        "schema_version": generation_cfg.get("schema_version", "compliance_pack_v1"),
+    }
+    keys = [_generation_cache_key(claim_input, cache_settings) for claim_input in inputs]
+    cached = cache.get_many(keys) if cache is not None else {}
+    pending = [claim_input for claim_input, key in zip(inputs, keys) if key not in cached]
+    batches = parallel.chunked(pending, batch_size) if pending else []
+
+    started = time.perf_counter()
+    results = asyncio.run(_complete_batches(client, batches, concurrency, max_tokens, temperature))
+    seconds = time.perf_counter() - started
+
+    statements: dict[str, str] = {}
+    for batch_statements, _ in results:
+        statements.update(batch_statements)
+    fallback = 0
+    generated: dict[str, Any] = {}
+    for claim, key in zip(claims, keys):
+        if key in cached:
+            claim["statement"] = str(cached[key]["statement"])
+            claim["statement_source"] = "cache"
+        elif claim["claim_id"] in statements:
+            claim["statement"] = statements[claim["claim_id"]]
+            claim["statement_source"] = "llm"
+            generated[key] = {"statement": claim["statement"]}
+        else:
+            claim["statement_source"] = "template"
+            fallback += 1
+
+    cache_stats: dict[str, Any] = {"enabled": False}
+    if cache is not None:
+        with cache:
+            cache.put_many(generated)
+            cache_stats = {"enabled": True, **cache.stats()}
+
+    requests = [stats for _, stats in results]
+    failed = sum(1 for stats in requests if stats["status"] != "ok")
+    if failed:
+        warnings.append(f"{failed} of {len(requests)} generation request(s) failed.")
+    if fallback:
+        warnings.append(f"{fallback} claim(s) kept template statements.")
+    completion_tokens = sum(stats["completion_tokens"] or 0 for stats in requests)
+    return {
+        "backend": "llm",
+        "model": model,
+        "endpoint": client.url,
+        "batch_size": batch_size,
+        "concurrency": concurrency,
+        "request_count": len(requests),
+        "failed_requests": failed,
+        "seconds": round(seconds, 6),
+        "completion_tokens": completion_tokens,
+        "tokens_per_second": round(completion_tokens / seconds, 2) if requests and seconds > 0 else None,
+        "requests": requests,
+        "cache": cache_stats,
+    }
+
+
 def _validate_draft_schema(draft: dict[str, Any]) -> None:
     required = [
         "pack_id",
@@ -97,7 +339,7 @@ def run_generation(context: dict[str, Any]) -> dict[str, Any]:
     generation_cfg = context["config"].get("generation", {})
     warnings: list[str] = []
 
-    retrieval_payload = _load_json(
+    retrieval_payload = codec.load_artifact(
         context.get("artifacts", {}).get("retrieval", {}).get("retrieval_candidates")
     )
     if retrieval_payload is None:
@@ -111,18 +353,26 @@ def run_generation(context: dict[str, Any]) -> dict[str, Any]:
         query_candidates = []
         warnings.append("Retrieval candidates artifact had invalid shape.")
 
-    deltas_payload = _load_json(context.get("artifacts", {}).get("processing", {}).get("deltas"))
-    if deltas_payload is None:
+    deltas_path = context.get("artifacts", {}).get("processing", {}).get("deltas")
+    deltas = _DeltaStream([])
+    if not deltas_path or not Path(deltas_path).exists():
         warnings.append("No processing deltas artifact found. Generated claims may be generic.")
-    deltas = deltas_payload.get("deltas", []) if isinstance(deltas_payload, dict) else []
-    if not isinstance(deltas, list):
-        deltas = []
+    else:
+        deltas = _DeltaStream(records.iter_records(deltas_path, "deltas"))
+
+    query_candidates = [item for item in query_candidates if isinstance(item, dict)]
+    backend = str(generation_cfg.get("backend", "template"))
+    inputs: list[dict[str, Any]] | None = [] if backend == "llm" else None
+    claims = _build_claims(deltas, query_candidates, inputs)
+    if deltas.invalid:
         warnings.append("Processing deltas artifact had invalid shape.")
 
-    claims = _build_claims(
-        deltas=[delta for delta in deltas if isinstance(delta, dict)],
-        query_candidates=[item for item in query_candidates if isinstance(item, dict)],
-    )
+    execution: dict[str, Any] = {"backend": "template"}
+    if claims and inputs is not None:
+        execution = _generate_statements(context, claims, inputs, warnings)
+    elif backend not in {"template", "llm"}:
+        warnings.append(f"Unknown generation backend {backend!r}; using templates.")
+
     if not claims:
         claims = [
             {
@@ -134,11 +384,7 @@ def run_generation(context: dict[str, Any]) -> dict[str, Any]:
         ]
 
     effective_dates = sorted(
-        {
-            str(delta.get("effective_date", "")).strip()
-            for delta in deltas
-            if isinstance(delta, dict) and str(delta.get("effective_date", "")).strip()
-        }
+        deltas.effective_dates | _document_effective_dates(context, deltas.undated_doc_ids, warnings)
     )
     required_actions = [
         f"Review {claim['change_type']} change in {claim['claim_id']}"
@@ -154,17 +400,17 @@ def run_generation(context: dict[str, Any]) -> dict[str, Any]:
         "schema_version": generation_cfg.get("schema_version", "compliance_pack_v1"),
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "summary": (
-            f"Generated draft with {len(claims)} claim(s) from {len(deltas)} detected delta(s)."
+            f"Generated draft with {len(claims)} claim(s) from {deltas.count} detected delta(s)."
         ),
         "effective_dates": effective_dates,
         "required_actions": required_actions,
         "claims": claims,
+        "execution": execution,
         "warnings": warnings,
     }
     _validate_draft_schema(payload)
 
     draft_path = out_dir / "compliance_pack_draft.json"
-    with draft_path.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+    codec.write(draft_path, payload, pretty=codec.pretty_output(context["config"]))
 
     return {"compliance_pack_draft": str(draft_path)}
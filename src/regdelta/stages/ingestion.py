@@ -1,10 +1,23 @@
 from __future__ import annotations
 
+import contextlib
+import functools
 import hashlib
-import json
+import os
+import shutil
+import tempfile
+import time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import IO, Any, Iterable, Iterator
+
+from regdelta import codec, compression, parallel
+from regdelta.cache import cache_key
+from regdelta.config import resolve_configured_path
+from regdelta.connectors import html as html_connector
+from regdelta.docstore import STORE_FORMAT, ChangeTracker, DocumentStore, link_or_copy
+from regdelta.external_sort import ExternalSorter
+from regdelta.index import offsets
 
 
 def _resolve_path(repo_root: Path, source_path: str) -> Path:
@@ -14,75 +27,313 @@ def _resolve_path(repo_root: Path, source_path: str) -> Path:
     return repo_root / path
 
 
-def _load_records(source: dict[str, Any], repo_root: Path) -> tuple[list[dict[str, Any]], list[str]]:
+# JSONL line problems are recorded as (line_no, kind) so chunk workers can
+# report chunk-relative line numbers that the merge step rebases.
+_LINE_WARNINGS = {
+    "invalid_json": "Source '{source}' has invalid JSONL at line {line}: {path}",
+    "not_object": "Source '{source}' expected JSON object at line {line}: {path}",
+}
+
+WarningEntry = Any  # str, or (line_no, kind) for JSONL line problems
+
+# (source_idx, source, repo_root, JSONL byte range, HTML file batch,
+# document store fingerprint)
+ReadTask = tuple[int, dict[str, Any], Path, tuple[int, int] | None, list[str] | None, str | None]
+
+_HTML_BATCH_FILES = 16
+# Slowest pages listed per source in the manifest.
+_SLOWEST_PAGES = 5
+
+
+def _byte_ranges(path: Path, chunk_bytes: int) -> list[tuple[int, int]]:
+    size = path.stat().st_size
+    if size <= chunk_bytes:
+        return [(0, size)]
+    bounds = [0]
+    with path.open("rb") as f:
+        while bounds[-1] < size:
+            f.seek(min(bounds[-1] + chunk_bytes, size))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    return list(zip(bounds, bounds[1:]))
+
+
+def _iter_jsonl(
+    path: Path,
+    warnings: list[WarningEntry],
+    progress: dict[str, int],
+    byte_range: tuple[int, int] | None = None,
+) -> Iterator[dict[str, Any]]:
+    start, end = byte_range or (0, -1)
+    # Byte ranges only ever cover uncompressed files (see ``_read_tasks``).
+    with (path.open("rb") if byte_range else compression.open_binary(path)) as f:
+        if start:
+            f.seek(start)
+        position = start
+        while end < 0 or position < end:
+            raw_line = f.readline()
+            if not raw_line:
+                break
+            position += len(raw_line)
+            progress["lines"] += 1
+            line = raw_line.strip()
+            if not line:
+                continue
+            try:
+                obj = codec.loads(line)
+            except codec.DecodeError:
+                warnings.append((progress["lines"], "invalid_json"))
+                continue
+            if not isinstance(obj, dict):
+                warnings.append((progress["lines"], "not_object"))
+                continue
+            yield obj
+
+
+def _iter_records(
+    source: dict[str, Any],
+    repo_root: Path,
+    warnings: list[WarningEntry],
+    progress: dict[str, Any] | None = None,
+    byte_range: tuple[int, int] | None = None,
+    files: list[str] | None = None,
+) -> Iterator[dict[str, Any]]:
     source_name = str(source.get("name", "unknown"))
     source_type = str(source.get("type", "")).strip().lower()
     source_path = source.get("path")
 
-    warnings: list[str] = []
-    records: list[dict[str, Any]] = []
-
     if source_type in {"jsonl", "jsonl_file"}:
         if not source_path:
             warnings.append(f"Source '{source_name}' missing required 'path'.")
-            return records, warnings
+            return
 
         path = _resolve_path(repo_root, str(source_path))
         if not path.exists():
             warnings.append(f"Source '{source_name}' path not found: {path}")
-            return records, warnings
-
-        with path.open("r", encoding="utf-8") as f:
-            for line_no, raw_line in enumerate(f, start=1):
-                line = raw_line.strip()
-                if not line:
-                    continue
-                try:
-                    obj = json.loads(line)
-                except json.JSONDecodeError:
-                    warnings.append(
-                        f"Source '{source_name}' has invalid JSONL at line {line_no}: {path}"
-                    )
-                    continue
-                if not isinstance(obj, dict):
-                    warnings.append(
-                        f"Source '{source_name}' expected JSON object at line {line_no}: {path}"
-                    )
-                    continue
-                records.append(obj)
-        return records, warnings
+            return
+
+        yield from _iter_jsonl(path, warnings, progress if progress is not None else {"lines": 0}, byte_range)
+        return
 
     if source_type in {"json", "json_file"}:
         if not source_path:
             warnings.append(f"Source '{source_name}' missing required 'path'.")
-            return records, warnings
+            return
 
         path = _resolve_path(repo_root, str(source_path))
         if not path.exists():
             warnings.append(f"Source '{source_name}' path not found: {path}")
-            return records, warnings
+            return
 
-        with path.open("r", encoding="utf-8") as f:
-            loaded = json.load(f)
+        # A single JSON document has to be parsed whole; use JSONL for large sources.
+        with compression.open_binary(path) as f:
+            loaded = codec.loads(f.read())
 
         if isinstance(loaded, dict):
-            records.append(loaded)
+            yield loaded
         elif isinstance(loaded, list):
             for idx, item in enumerate(loaded, start=1):
                 if isinstance(item, dict):
-                    records.append(item)
+                    yield item
                 else:
                     warnings.append(
                         f"Source '{source_name}' expected JSON object at index {idx}: {path}"
                     )
         else:
             warnings.append(f"Source '{source_name}' expected object or list in JSON: {path}")
-        return records, warnings
+        return
+
+    if source_type in {"html", "html_dir"}:
+        if not source_path:
+            warnings.append(f"Source '{source_name}' missing required 'path'.")
+            return
+
+        path = _resolve_path(repo_root, str(source_path))
+        if not path.exists():
+            warnings.append(f"Source '{source_name}' path not found: {path}")
+            return
+
+        encoding = str(source.get("encoding", "utf-8"))
+        max_bytes = int(float(source.get("max_file_mb", 32)) * (1 << 20))
+        pages = [Path(item) for item in files] if files is not None else html_connector.list_files(path)
+        if not pages:
+            warnings.append(f"Source '{source_name}' has no HTML pages: {path}")
+        for page in pages:
+            size = page.stat().st_size
+            if size > max_bytes:
+                warnings.append(f"Source '{source_name}' skipped {page}: {size} bytes exceeds max_file_mb")
+                continue
+            try:
+                record, stats = html_connector.parse_file(page, path, encoding)
+            except (OSError, ValueError, LookupError) as exc:
+                warnings.append(f"Source '{source_name}' failed to parse {page}: {exc}")
+                continue
+            if progress is not None:
+                progress.setdefault("files", []).append(stats)
+            yield record
+        return
 
     warnings.append(
-        f"Source '{source_name}' unsupported type '{source_type}'. Supported: jsonl, json."
+        f"Source '{source_name}' unsupported type '{source_type}'. Supported: jsonl, json, html."
     )
-    return records, warnings
+
+
+def _html_batches(pages: list[Path], chunk_bytes: int) -> list[list[str]]:
+    batches: list[list[str]] = []
+    batch: list[str] = []
+    batch_bytes = 0
+    for page in pages:
+        size = page.stat().st_size
+        if batch and (len(batch) >= _HTML_BATCH_FILES or batch_bytes + size > chunk_bytes):
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+        batch.append(str(page))
+        batch_bytes += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _task_fingerprint(
+    source: dict[str, Any], path: Path, byte_range: tuple[int, int] | None, files: list[str] | None
+) -> str | None:
+    # A task is identified by its source config, its byte range and the
+    # size/mtime of every file it reads, so it matches a stored task entry
+    # only while those files are untouched.
+    if files is not None:
+        paths = [Path(item) for item in files]
+    elif path.is_file():
+        paths = [path]
+    else:
+        return None
+    stats = []
+    for item in paths:
+        info = item.stat()
+        stats.append([str(item), info.st_size, info.st_mtime_ns])
+    return cache_key(STORE_FORMAT, source, byte_range, stats)
+
+
+def _read_tasks(sources: list[dict[str, Any]], repo_root: Path, chunk_bytes: int) -> list[ReadTask]:
+    tasks: list[ReadTask] = []
+    for source_idx, source in enumerate(sources):
+        if not source.get("enabled", True):
+            continue
+        source_type = str(source.get("type", "")).strip().lower()
+        source_path = source.get("path")
+        path = _resolve_path(repo_root, str(source_path)) if source_path else None
+        if (
+            source_type in {"jsonl", "jsonl_file"}
+            and path is not None
+            and path.is_file()
+            and compression.detect(path) is None
+        ):
+            for byte_range in _byte_ranges(path, chunk_bytes):
+                fingerprint = _task_fingerprint(source, path, byte_range, None)
+                tasks.append((source_idx, source, repo_root, byte_range, None, fingerprint))
+        elif source_type in {"html", "html_dir"} and path is not None and path.is_dir():
+            # Pages are parsed in batches of files; an empty mirror still gets
+            # one task so its warning is reported.
+            batches = _html_batches(html_connector.list_files(path), chunk_bytes)
+            for batch in batches or [None]:
+                fingerprint = _task_fingerprint(source, path, None, batch) if batch else None
+                tasks.append((source_idx, source, repo_root, None, batch, fingerprint))
+        else:
+            fingerprint = _task_fingerprint(source, path, None, None) if path is not None else None
+            tasks.append((source_idx, source, repo_root, None, None, fingerprint))
+    return tasks
+
+
+def _replay_task(
+    store: DocumentStore, fingerprint: str, spill: IO[str]
+) -> tuple[list[WarningEntry], int, int] | None:
+    # Rebuilds a task's documents from its stored entry and the text objects.
+    # Any missing or damaged piece returns None and the task is parsed.
+    path = store.task_path(fingerprint)
+    if not path.exists():
+        return None
+    records = 0
+    trailer: dict[str, Any] | None = None
+    try:
+        with path.open("rb") as f:
+            for line in f:
+                item = codec.loads(line)
+                if isinstance(item, dict):
+                    trailer = item
+                    break
+                doc_id, metadata = item
+                payload = codec.dumps({**metadata, "text": store.get(metadata["checksum"])})
+                spill.write(codec.dumps([doc_id, payload]) + "\n")
+                records += 1
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if trailer is None:
+        return None
+    # Line warnings come back from JSON as lists.
+    warnings = [tuple(entry) if isinstance(entry, list) else entry for entry in trailer["warnings"]]
+    return warnings, int(trailer["lines"]), records
+
+
+def _read_task(task: ReadTask, spill_dir: Path, store_root: Path | None = None) -> dict[str, Any]:
+    # Normalized documents go to a spill file rather than into the result, so
+    # neither the worker nor the results in flight hold a whole chunk. With a
+    # document store, an unchanged task is replayed from its stored entry;
+    # otherwise it is parsed and its entry and text objects are stored.
+    source_idx, source, repo_root, byte_range, files, fingerprint = task
+    source_name = str(source.get("name", "unknown"))
+    started = time.perf_counter()
+    store = DocumentStore(store_root) if store_root is not None and fingerprint else None
+    objects_written = 0
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=spill_dir, prefix="read-", suffix=".jsonl", delete=False
+    ) as f:
+        replayed = _replay_task(store, fingerprint, f) if store is not None and fingerprint else None
+        if replayed is not None:
+            warnings, lines, records = replayed
+            parse_stats: list[dict[str, Any]] = []
+        else:
+            f.seek(0)
+            f.truncate()
+            warnings = []
+            progress: dict[str, Any] = {"lines": 0, "files": []}
+            records = 0
+            with contextlib.ExitStack() as stack:
+                entry_f = None
+                if store is not None and fingerprint:
+                    entry_path = store.task_path(fingerprint)
+                    entry_path.parent.mkdir(parents=True, exist_ok=True)
+                    entry_tmp = entry_path.with_name(f"{entry_path.name}.tmp-{os.getpid()}")
+                    entry_f = stack.enter_context(entry_tmp.open("w", encoding="utf-8"))
+                for record in _iter_records(source, repo_root, warnings, progress, byte_range, files):
+                    normalized = _normalize_document(record, source_name)
+                    if normalized is None:
+                        warnings.append(
+                            f"Source '{source_name}' dropped record missing required fields 'doc_id' or 'text'."
+                        )
+                        continue
+                    f.write(codec.dumps([normalized["doc_id"], codec.dumps(normalized)]) + "\n")
+                    records += 1
+                    if store is not None and entry_f is not None:
+                        objects_written += store.put(normalized["checksum"], normalized["text"])
+                        metadata = {key: value for key, value in normalized.items() if key != "text"}
+                        entry_f.write(codec.dumps([normalized["doc_id"], metadata]) + "\n")
+                if entry_f is not None:
+                    entry_f.write(codec.dumps({"warnings": warnings, "lines": progress["lines"]}) + "\n")
+                    entry_f.close()
+                    os.replace(entry_tmp, entry_path)
+            lines = progress["lines"]
+            parse_stats = progress["files"]
+    return {
+        "source_idx": source_idx,
+        "spill": f.name,
+        "records": records,
+        "fingerprint": fingerprint,
+        "reused": replayed is not None,
+        "objects_written": objects_written,
+        "warnings": warnings,
+        "lines": lines,
+        "files": parse_stats,
+        "seconds": time.perf_counter() - started,
+    }
 
 
 def _normalize_document(record: dict[str, Any], source_name: str) -> dict[str, Any] | None:
@@ -109,64 +360,339 @@ def _normalize_document(record: dict[str, Any], source_name: str) -> dict[str, A
     }
 
 
-def run_ingestion(context: dict[str, Any]) -> dict[str, Any]:
-    out_dir = Path(context["run_dir"]) / "ingestion"
-    out_dir.mkdir(parents=True, exist_ok=True)
+def _parse_summary(files: list[dict[str, Any]]) -> dict[str, Any]:
+    seconds = sum(entry["seconds"] for entry in files)
+    size = sum(entry["bytes"] for entry in files)
+    return {
+        "files": len(files),
+        "bytes": size,
+        "seconds": round(seconds, 6),
+        "mb_per_second": round(size / (1 << 20) / seconds, 3) if seconds > 0 else None,
+        "slowest": sorted(files, key=lambda entry: (-entry["seconds"], entry["path"]))[:_SLOWEST_PAGES],
+    }
+
+
+def _throughput(stats: dict[str, Any] | None) -> dict[str, Any]:
+    if stats is None:
+        return {}
+    seconds = stats["seconds"]
+    throughput = {
+        "records": stats["records"],
+        "chunks": stats["chunks"],
+        "reused_chunks": stats["reused_chunks"],
+        "seconds": round(seconds, 6),
+        "records_per_second": round(stats["records"] / seconds, 2) if seconds > 0 else None,
+    }
+    if stats["files"]:
+        throughput["parse"] = _parse_summary(stats["files"])
+    return throughput
+
 
+def _source_signature(sources: list[dict[str, Any]], repo_root: Path, ingestion_cfg: dict[str, Any]) -> str:
+    # Sources are fingerprinted by config plus file size/mtime, so an
+    # untouched snapshot is recognised without reading it.
+    entries: list[Any] = [
+        STORE_FORMAT,
+        ingestion_cfg.get("chunk_mb"),
+        ingestion_cfg.get("documents_compression"),
+    ]
+    for source in sources:
+        if not source.get("enabled", True):
+            continue
+        stat: list[Any] | None = None
+        if source.get("path"):
+            path = _resolve_path(repo_root, str(source["path"]))
+            if path.is_dir():
+                # A directory's own mtime misses in-place page edits.
+                stat = []
+                for page in html_connector.list_files(path):
+                    info = page.stat()
+                    stat.append([str(page.relative_to(path)), info.st_size, info.st_mtime_ns])
+            elif path.exists():
+                info = path.stat()
+                stat = [info.st_size, info.st_mtime_ns]
+        entries.append([source, stat])
+    return cache_key(*entries)
+
+
+def _open_document_store(context: dict[str, Any]) -> DocumentStore | None:
+    ingestion_cfg = context["config"].get("ingestion", {})
+    store_dir = resolve_configured_path(context, "document_store")
+    if store_dir is None or not bool(ingestion_cfg.get("incremental", True)):
+        return None
+    return DocumentStore(store_dir)
+
+
+def _ingest_sources(
+    context: dict[str, Any],
+    sources: list[dict[str, Any]],
+    out_dir: Path,
+    documents_path: Path,
+    index_path: Path | None,
+    store: DocumentStore | None,
+) -> dict[str, Any]:
     repo_root = Path(context["repo_root"])
-    sources = context["config"].get("ingestion", {}).get("sources", [])
-    enabled_sources = [source for source in sources if source.get("enabled", True)]
+    ingestion_cfg = context["config"].get("ingestion", {})
+    budget_mb = float(ingestion_cfg.get("memory_budget_mb", 256))
+    chunk_bytes = max(int(float(ingestion_cfg.get("chunk_mb", 64)) * (1 << 20)), 1)
+    workers = parallel.configured_workers(context["config"])
 
     warnings: list[str] = []
-    documents_by_id: dict[str, dict[str, Any]] = {}
     duplicate_doc_ids = 0
+    document_count = 0
+    seq = 0
+    source_stats: dict[int, dict[str, Any]] = {}
+    # Lines already consumed per source, to rebase chunk-relative line numbers.
+    line_bases: dict[int, int] = {}
+    store_stats: dict[str, Any] = {"objects_written": 0, "tasks_reused": 0, "live_tasks": set()}
 
-    for source in enabled_sources:
-        source_name = str(source.get("name", "unknown"))
-        records, source_warnings = _load_records(source, repo_root)
-        warnings.extend(source_warnings)
+    tasks = _read_tasks(sources, repo_root, chunk_bytes)
+    pool_workers = min(workers, len(tasks))
+    started = time.perf_counter()
 
-        for record in records:
-            normalized = _normalize_document(record, source_name)
-            if normalized is None:
-                warnings.append(
-                    f"Source '{source_name}' dropped record missing required fields 'doc_id' or 'text'."
+    # Normalized documents are serialized as they arrive and handed to an
+    # external sort on (doc_id, arrival order); the sorted stream then keeps
+    # the last record per doc_id. Only the sort buffer is held in memory.
+    with ExternalSorter(int(budget_mb * (1 << 20)), spill_dir=out_dir) as sorter:
+        with contextlib.ExitStack() as stack:
+            out_dir.mkdir(parents=True, exist_ok=True)
+            spill_dir = Path(tempfile.mkdtemp(prefix="read-", dir=out_dir))
+            stack.callback(shutil.rmtree, spill_dir, True)
+            read_task = functools.partial(
+                _read_task, spill_dir=spill_dir, store_root=store.root if store is not None else None
+            )
+            results: Iterable[dict[str, Any]]
+            if pool_workers > 1:
+                executor = stack.enter_context(parallel.process_pool(pool_workers))
+                # Results come back in task order, so sequence numbers (and
+                # therefore last-writer-wins) match the serial run.
+                results = parallel.ordered_map(executor, read_task, tasks, window=pool_workers * 2)
+            else:
+                results = map(read_task, tasks)
+
+            for result in results:
+                source_idx = result["source_idx"]
+                source_name = str(sources[source_idx].get("name", "unknown"))
+                line_base = line_bases.get(source_idx, 0)
+                for entry in result["warnings"]:
+                    if isinstance(entry, tuple):
+                        line_no, kind = entry
+                        entry = _LINE_WARNINGS[kind].format(
+                            source=source_name,
+                            line=line_base + line_no,
+                            path=_resolve_path(repo_root, str(sources[source_idx].get("path"))),
+                        )
+                    warnings.append(entry)
+                line_bases[source_idx] = line_base + result["lines"]
+
+                spill_path = Path(result["spill"])
+                with spill_path.open("rb") as spill:
+                    for line in spill:
+                        doc_id, payload = codec.loads(line)
+                        sorter.add(doc_id, seq, payload)
+                        seq += 1
+                spill_path.unlink()
+
+                if result["fingerprint"] is not None:
+                    store_stats["live_tasks"].add(result["fingerprint"])
+                store_stats["objects_written"] += result["objects_written"]
+                store_stats["tasks_reused"] += result["reused"]
+
+                stats = source_stats.setdefault(
+                    source_idx, {"records": 0, "chunks": 0, "reused_chunks": 0, "seconds": 0.0, "files": []}
                 )
-                continue
+                stats["records"] += result["records"]
+                stats["chunks"] += 1
+                stats["reused_chunks"] += result["reused"]
+                stats["seconds"] += result["seconds"]
+                stats["files"].extend(result["files"])
 
-            doc_id = normalized["doc_id"]
-            if doc_id in documents_by_id:
-                duplicate_doc_ids += 1
-            documents_by_id[doc_id] = normalized
+        tracker = ChangeTracker(store.iter_manifest()) if store is not None else None
+        store_manifest_tmp = out_dir / "store_manifest.jsonl.tmp"
+        # Plain output is written as bytes so the offset index can track
+        # exact line positions; compressed streams are not randomly accessible.
+        index_writer = offsets.OffsetIndexWriter() if index_path is not None else None
+        with contextlib.ExitStack() as stack:
+            f: Any
+            if index_writer is not None:
+                f = stack.enter_context(documents_path.open("wb"))
+            else:
+                f = stack.enter_context(compression.open_text(documents_path, "w"))
+            manifest_f = None
+            if store is not None:
+                manifest_f = stack.enter_context(store_manifest_tmp.open("w", encoding="utf-8"))
 
-    documents = [documents_by_id[doc_id] for doc_id in sorted(documents_by_id)]
-    documents_path = out_dir / "documents.jsonl"
-    with documents_path.open("w", encoding="utf-8") as f:
-        for doc in documents:
-            f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+            def emit(doc_id: str, payload: str) -> None:
+                if index_writer is not None:
+                    line = (payload + "\n").encode("utf-8")
+                    f.write(line)
+                    index_writer.add(doc_id, len(line))
+                else:
+                    f.write(payload + "\n")
+                if tracker is not None and manifest_f is not None:
+                    checksum = codec.loads(payload)["checksum"]
+                    tracker.observe(doc_id, checksum)
+                    manifest_f.write(codec.dumps([doc_id, checksum]) + "\n")
+
+            pending: tuple[str, str] | None = None
+            for doc_id, _, payload in sorter.sorted_items():
+                if pending is not None and pending[0] == doc_id:
+                    duplicate_doc_ids += 1
+                elif pending is not None:
+                    emit(*pending)
+                    document_count += 1
+                pending = (doc_id, payload)
+            if pending is not None:
+                emit(*pending)
+                document_count += 1
+
+        if index_writer is not None and index_path is not None:
+            index_writer.write(index_path)
+        elapsed = time.perf_counter() - started
+        sort_stats = {
+            "memory_budget_mb": budget_mb,
+            "records": sorter.item_count,
+            "spill_runs": sorter.spill_count,
+            "spilled_records": sorter.spilled_items,
+            "peak_buffer_mb": round(sorter.peak_buffered_bytes / (1 << 20), 3),
+        }
+
+    return {
+        "document_count": document_count,
+        "duplicate_doc_ids": duplicate_doc_ids,
+        "sort": sort_stats,
+        "execution": {
+            "mode": "parallel" if pool_workers > 1 else "serial",
+            "workers": max(pool_workers, 1),
+            "tasks": len(tasks),
+            "seconds": round(elapsed, 6),
+        },
+        "source_stats": source_stats,
+        "warnings": warnings,
+        "changes": tracker.finish() if tracker is not None else None,
+        "store_manifest_tmp": store_manifest_tmp if store is not None else None,
+        "store_stats": store_stats,
+    }
+
+
+def run_ingestion(context: dict[str, Any]) -> dict[str, Any]:
+    out_dir = Path(context["run_dir"]) / "ingestion"
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    repo_root = Path(context["repo_root"])
+    ingestion_cfg = context["config"].get("ingestion", {})
+    sources = ingestion_cfg.get("sources", [])
+    enabled_sources = [source for source in sources if source.get("enabled", True)]
+    documents_codec = ingestion_cfg.get("documents_compression")
+    documents_path = out_dir / f"documents.jsonl{compression.suffix(documents_codec)}"
+    index_path = offsets.index_path_for(documents_path) if not compression.suffix(documents_codec) else None
+    pretty = codec.pretty_output(context["config"])
+
+    parse_stats_path: Path | None = None
+
+    store = _open_document_store(context)
+    state = store.load_state() if store is not None else {}
+    signature = _source_signature(sources, repo_root, ingestion_cfg)
+
+    if store is not None and state.get("source_signature") == signature and store.snapshot_path.exists():
+        # Sources are untouched: link the stored snapshot instead of re-parsing.
+        summary = dict(state["summary"], sources=[{} for _ in sources])
+        summary["execution"] = {"mode": "snapshot", "link": link_or_copy(store.snapshot_path, documents_path)}
+        if index_path is not None:
+            if store.snapshot_index_path.exists():
+                link_or_copy(store.snapshot_index_path, index_path)
+            else:
+                offsets.build_offset_index(documents_path, index_path)
+        changes: dict[str, Any] | None = {
+            "counts": {"new": 0, "changed": 0, "removed": 0, "unchanged": summary["document_count"]},
+            "new": [],
+            "changed": [],
+            "removed": [],
+        }
+        store_version = int(state.get("version", 0))
+        store_stats: dict[str, Any] = {"objects_written": 0, "tasks_reused": 0, "pruned": {"objects": 0, "tasks": 0}}
+    else:
+        summary = _ingest_sources(context, sources, out_dir, documents_path, index_path, store)
+        changes = summary.pop("changes")
+        store_manifest_tmp = summary.pop("store_manifest_tmp")
+        store_stats = summary.pop("store_stats")
+        source_stats = summary.pop("source_stats")
+        parse_entries = [
+            {"source": sources[source_idx].get("name"), **entry}
+            for source_idx, stats in sorted(source_stats.items())
+            for entry in stats["files"]
+        ]
+        if parse_entries:
+            parse_stats_path = out_dir / "parse_stats.json"
+            parse_entries.sort(key=lambda entry: (-entry["seconds"], entry["path"]))
+            codec.write(parse_stats_path, {"status": "ok", "files": parse_entries}, pretty=pretty)
+        summary["sources"] = [_throughput(source_stats.get(source_idx)) for source_idx in range(len(sources))]
+        store_version = int(state.get("version", 0))
+        if store is not None and changes is not None:
+            if not state or any(changes["counts"][kind] for kind in ("new", "changed", "removed")):
+                store_version += 1
+            store.commit(
+                store_manifest_tmp,
+                documents_path,
+                {"version": store_version, "source_signature": signature, "summary": summary},
+                index_path=index_path,
+            )
+            store_stats["pruned"] = store.prune(store_stats.pop("live_tasks"))
 
     manifest = {
         "status": "ok",
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "source_count": len(enabled_sources),
-        "document_count": len(documents),
-        "duplicate_doc_ids": duplicate_doc_ids,
+        "document_count": summary["document_count"],
+        "duplicate_doc_ids": summary["duplicate_doc_ids"],
+        "sort": summary["sort"],
+        "execution": summary["execution"],
         "documents_path": str(documents_path),
+        "documents_index_path": str(index_path) if index_path is not None else None,
         "sources": [
             {
                 "name": source.get("name"),
                 "type": source.get("type"),
                 "enabled": source.get("enabled", True),
+                **stats,
             }
-            for source in sources
+            for source, stats in zip(sources, summary["sources"])
         ],
-        "warnings": warnings,
+        "warnings": summary["warnings"],
     }
+    changes_path: Path | None = None
+    if store is not None and changes is not None:
+        manifest["document_store"] = {
+            "path": str(store.root),
+            "version": store_version,
+            "objects_written": store_stats["objects_written"],
+            "tasks_reused": store_stats["tasks_reused"],
+            "pruned": store_stats["pruned"],
+            "changes": changes["counts"],
+        }
+        changes_path = out_dir / "document_changes.json"
+        codec.write(
+            changes_path,
+            {
+                "status": "ok",
+                "store_version": store_version,
+                "previous_version": state.get("version"),
+                **changes,
+            },
+            pretty=pretty,
+        )
+
     manifest_path = out_dir / "raw_manifest.json"
-    with manifest_path.open("w", encoding="utf-8") as f:
-        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    codec.write(manifest_path, manifest, pretty=pretty)
 
-    return {
+    outputs = {
         "raw_manifest": str(manifest_path),
         "documents": str(documents_path),
     }
+    if index_path is not None:
+        outputs["documents_index"] = str(index_path)
+    if parse_stats_path is not None:
+        outputs["parse_stats"] = str(parse_stats_path)
+    if changes_path is not None:
+        outputs["document_changes"] = str(changes_path)
+    return outputs
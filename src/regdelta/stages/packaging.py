@@ -1,22 +1,10 @@
 from __future__ import annotations
 
-import json
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
-
-def _load_json(path: str | None) -> dict[str, Any] | None:
-    if not path:
-        return None
-    payload_path = Path(path)
-    if not payload_path.exists():
-        return None
-    with payload_path.open("r", encoding="utf-8") as f:
-        loaded = json.load(f)
-    if not isinstance(loaded, dict):
-        return None
-    return loaded
+from regdelta import codec
 
 
 def _to_markdown(package_json: dict[str, Any]) -> str:
@@ -66,8 +54,8 @@ def run_packaging(context: dict[str, Any]) -> dict[str, Any]:
     output_formats = packaging_cfg.get("output_formats", [])
 
     verification_artifacts = context.get("artifacts", {}).get("verification", {})
-    verified_payload = _load_json(verification_artifacts.get("verified_pack"))
-    abstention_payload = _load_json(verification_artifacts.get("abstention_report"))
+    verified_payload = codec.load_artifact(verification_artifacts.get("verified_pack"))
+    abstention_payload = codec.load_artifact(verification_artifacts.get("abstention_report"))
     warnings: list[str] = []
     if verified_payload is None:
         warnings.append("No verified pack artifact found.")
@@ -105,8 +93,8 @@ def run_packaging(context: dict[str, Any]) -> dict[str, Any]:
     }
 
     json_path = out_dir / "compliance_pack.json"
-    with json_path.open("w", encoding="utf-8") as f:
-        json.dump(package_json, f, ensure_ascii=False, indent=2)
+    pretty = codec.pretty_output(context["config"])
+    codec.write(json_path, package_json, pretty=pretty)
 
     md_path = out_dir / "compliance_pack.md"
     md_path.write_text(_to_markdown(package_json), encoding="utf-8")
@@ -122,8 +110,7 @@ def run_packaging(context: dict[str, Any]) -> dict[str, Any]:
         },
     }
     audit_manifest_path = out_dir / "audit_bundle_manifest.json"
-    with audit_manifest_path.open("w", encoding="utf-8") as f:
-        json.dump(audit_manifest, f, ensure_ascii=False, indent=2)
+    codec.write(audit_manifest_path, audit_manifest, pretty=pretty)
 
     return {
         "compliance_pack_json": str(json_path),
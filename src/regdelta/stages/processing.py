@@ -1,9 +1,22 @@
 from __future__ import annotations
 
-import json
+import heapq
+import os
 import re
+import sqlite3
+import time
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
+
+from regdelta import codec, compression, dedup, diff, parallel, records, tokenizer, versions
+from regdelta.cache import LRUCache, cache_key
+from regdelta.config import resolve_configured_path
+from regdelta.segments import SegmentTable
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?;])\s+")
+
+# Corpus handed to forked shard workers through inherited memory.
+_WORKER_DOCUMENTS: list[dict[str, Any]] = []
 
 
 def _load_documents(context: dict[str, Any]) -> tuple[list[dict[str, Any]], list[str]]:
@@ -14,8 +27,7 @@ def _load_documents(context: dict[str, Any]) -> tuple[list[dict[str, Any]], list
     if not documents_path:
         manifest_path = ingestion_artifacts.get("raw_manifest")
         if manifest_path and Path(manifest_path).exists():
-            with Path(manifest_path).open("r", encoding="utf-8") as f:
-                manifest = json.load(f)
+            manifest = codec.read(manifest_path)
             documents_path = manifest.get("documents_path")
 
     if not documents_path:
@@ -28,14 +40,14 @@ def _load_documents(context: dict[str, Any]) -> tuple[list[dict[str, Any]], list
         return [], warnings
 
     documents: list[dict[str, Any]] = []
-    with path.open("r", encoding="utf-8") as f:
+    with compression.open_text(path) as f:
         for line_no, raw_line in enumerate(f, start=1):
             line = raw_line.strip()
             if not line:
                 continue
             try:
-                obj = json.loads(line)
-            except json.JSONDecodeError:
+                obj = codec.loads(line)
+            except codec.DecodeError:
                 warnings.append(f"Invalid JSONL in ingestion documents at line {line_no}: {path}")
                 continue
             if not isinstance(obj, dict):
@@ -46,102 +58,489 @@ def _load_documents(context: dict[str, Any]) -> tuple[list[dict[str, Any]], list
     return documents, warnings
 
 
+def _load_changes(context: dict[str, Any], warnings: list[str]) -> dict[str, Any] | None:
+    # Ingestion's new/changed/removed doc_ids, when it ran with a document
+    # store; None means every document is treated as changed.
+    path = context.get("artifacts", {}).get("ingestion", {}).get("document_changes")
+    if not path:
+        return None
+    try:
+        changes = codec.read(path)
+    except (OSError, ValueError) as exc:
+        warnings.append(f"Ignoring unreadable document changes {path}: {exc}")
+        return None
+    return changes if isinstance(changes, dict) else None
+
+
 def _split_clauses(text: str) -> list[str]:
     lines = [line.strip() for line in text.splitlines() if line.strip()]
     if len(lines) > 1:
         return lines
 
-    split = [chunk.strip() for chunk in re.split(r"(?<=[.!?;])\s+", text.strip()) if chunk.strip()]
+    split = [chunk.strip() for chunk in _SENTENCE_BREAK.split(text.strip()) if chunk.strip()]
     if split:
         return split
     return [text.strip()] if text.strip() else []
 
 
-def _segment_documents(
-    documents: list[dict[str, Any]], granularity: str
-) -> tuple[list[dict[str, Any]], dict[str, list[dict[str, Any]]]]:
-    word_pattern = re.compile(r"\w+", flags=re.UNICODE)
-    segments: list[dict[str, Any]] = []
-    segments_by_doc: dict[str, list[dict[str, Any]]] = {}
+def _segment_document(
+    table: SegmentTable, doc: dict[str, Any], granularity: str, cached: list[list[Any]] | None = None
+) -> list[tuple[str, str]]:
+    # Appends the document's clauses to ``table`` and returns them as
+    # (clause_id, text) for diffing. ``cached`` is a previous segmentation of
+    # the same text as [text, token_count] rows.
+    doc_id = str(doc.get("doc_id", "")).strip()
+    text = str(doc.get("text", "")).strip()
+    if not doc_id or not text:
+        return []
+
+    if cached is None:
+        texts = _split_clauses(text) if granularity == "clause" else [text]
+        cached = [[clause, len(tokenizer.default().token_ids(clause))] for clause in texts]
+    clauses: list[tuple[str, str]] = []
+    for idx, (clause, token_count) in enumerate(cached, start=1):
+        table.add(doc_id, f"cl_{idx}", clause, token_count)
+        clauses.append((f"cl_{idx}", clause))
+    return clauses
+
+
+def _process_shard(
+    task: tuple[
+        list[int],
+        list[dict[str, Any]] | None,
+        str,
+        dict[str, Any],
+        dict[int, tuple[str, Any]],
+        dict[int, list[list[Any]]],
+    ],
+) -> tuple[SegmentTable, list[tuple[int, int, int, dict[str, Any] | None]], int, float]:
+    # Segments one shard and diffs its version pairs. Every version chain is
+    # whole within a shard, so replaces_doc_id lookups never leave it. Pairs
+    # arrive with their cache key and any cached diff; only misses are
+    # diffed. Unchanged documents arrive with their cached segmentation.
+    # Each document's rows are reported by corpus position for the merge,
+    # and the shard's segments travel back as one columnar table.
+    positions, documents, granularity, diff_cfg, pairs, segmented = task
+    started = time.perf_counter()
+    if documents is None:
+        documents = [_WORKER_DOCUMENTS[position] for position in positions]
+    amend_similarity = float(diff_cfg.get("amend_similarity", 0.5))
+    max_d = int(diff_cfg.get("max_edit_distance", diff.MAX_EDIT_DISTANCE))
+
+    table = SegmentTable()
+    row_ranges: list[tuple[int, int]] = []
+    clauses_by_doc: dict[str, list[tuple[str, str]]] = {}
+    for position, doc in zip(positions, documents):
+        start = len(table)
+        clauses = _segment_document(table, doc, granularity, segmented.get(position))
+        row_ranges.append((start, len(table)))
+        if clauses:
+            clauses_by_doc[str(doc.get("doc_id", "")).strip()] = clauses
 
+    results: list[tuple[int, int, int, dict[str, Any] | None]] = []
+    for position, doc, (start, end) in zip(positions, documents, row_ranges):
+        edge: dict[str, Any] | None = None
+        if position in pairs:
+            key, record = pairs[position]
+            new_doc_id = str(doc.get("doc_id", "")).strip()
+            old_doc_id = str(doc.get("replaces_doc_id", "")).strip()
+            edge = {"old_doc_id": old_doc_id, "new_doc_id": new_doc_id, "pair_key": key, "cached": record is not None}
+            if record is None:
+                # Clauses are aligned by content, so an inserted clause no
+                # longer shifts every later clause_id into a spurious amendment.
+                record = versions.pair_record(
+                    clauses_by_doc.get(old_doc_id, []), clauses_by_doc.get(new_doc_id, []), amend_similarity, max_d
+                )
+            edge["record"] = record
+        results.append((position, start, end, edge))
+    return table, results, os.getpid(), time.perf_counter() - started
+
+
+def _version_pairs(
+    documents: list[dict[str, Any]], granularity: str, diff_cfg: dict[str, Any]
+) -> dict[int, str]:
+    # Corpus position -> pair cache key, for every document whose
+    # replaces_doc_id is in the corpus.
+    amend_similarity = float(diff_cfg.get("amend_similarity", 0.5))
+    max_d = int(diff_cfg.get("max_edit_distance", diff.MAX_EDIT_DISTANCE))
+    checksums: dict[str, str] = {}
     for doc in documents:
+        doc_id = str(doc.get("doc_id", "")).strip()
+        if doc_id:
+            checksums[doc_id] = versions.text_checksum(str(doc.get("text", "")))
+
+    pairs: dict[int, str] = {}
+    for position, doc in enumerate(documents):
+        new_doc_id = str(doc.get("doc_id", "")).strip()
+        old_doc_id = str(doc.get("replaces_doc_id", "")).strip()
+        if new_doc_id and old_doc_id and old_doc_id in checksums:
+            new_checksum = versions.text_checksum(str(doc.get("text", "")))
+            pairs[position] = versions.pair_key(
+                checksums[old_doc_id], new_checksum, granularity, amend_similarity, max_d
+            )
+    return pairs
+
+
+def _version_groups(documents: list[dict[str, Any]]) -> list[list[int]]:
+    # Union-find over doc_id and replaces_doc_id, so each version chain (and
+    # every record sharing a doc_id) lands in one group of corpus positions.
+    parent: dict[str, str] = {}
+
+    def find(key: str) -> str:
+        root = key
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+        while parent[key] != root:
+            parent[key], key = root, parent[key]
+        return root
+
+    for doc in documents:
+        doc_id = str(doc.get("doc_id", "")).strip()
+        old_doc_id = str(doc.get("replaces_doc_id", "") or "").strip()
+        if doc_id and old_doc_id:
+            left, right = find(doc_id), find(old_doc_id)
+            if left != right:
+                parent[max(left, right)] = min(left, right)
+
+    groups: dict[str, list[int]] = {}
+    for position, doc in enumerate(documents):
+        doc_id = str(doc.get("doc_id", "")).strip()
+        groups.setdefault(find(doc_id) if doc_id else f"#{position}", []).append(position)
+    return list(groups.values())
+
+
+def _shards(documents: list[dict[str, Any]], shard_count: int) -> list[list[int]]:
+    # Longest-processing-time packing of version groups by text length.
+    # Groups are placed largest first with ties broken by first position, so
+    # the layout depends only on the corpus.
+    groups = _version_groups(documents)
+    weights = [sum(len(str(documents[position].get("text", ""))) + 1 for position in group) for group in groups]
+    order = sorted(range(len(groups)), key=lambda idx: (-weights[idx], groups[idx][0]))
+    heap = [(0, shard) for shard in range(min(shard_count, len(groups)))]
+    shards: list[list[int]] = [[] for _ in heap]
+    for idx in order:
+        load, shard = heapq.heappop(heap)
+        shards[shard].extend(groups[idx])
+        heapq.heappush(heap, (load + weights[idx], shard))
+    return [sorted(shard) for shard in shards if shard]
+
+
+def _open_pair_cache(context: dict[str, Any], warnings: list[str]) -> LRUCache | None:
+    versions_cfg = context.get("config", {}).get("processing", {}).get("versions", {})
+    interim_dir = resolve_configured_path(context, "data_interim")
+    if not bool(versions_cfg.get("cache", True)) or interim_dir is None:
+        return None
+    path = interim_dir / "pair_diffs.sqlite"
+    try:
+        return LRUCache(
+            path,
+            max_entries=int(versions_cfg.get("cache_max_entries", 100000)),
+            max_bytes=int(float(versions_cfg.get("cache_max_mb", 256)) * (1 << 20)),
+        )
+    except sqlite3.Error as exc:
+        warnings.append(f"Version pair cache disabled, could not open {path}: {exc}")
+        return None
+
+
+def _open_segment_cache(context: dict[str, Any], warnings: list[str]) -> LRUCache | None:
+    incremental_cfg = context.get("config", {}).get("processing", {}).get("incremental", {})
+    interim_dir = resolve_configured_path(context, "data_interim")
+    if not bool(incremental_cfg.get("cache", True)) or interim_dir is None:
+        return None
+    path = interim_dir / "segments.sqlite"
+    try:
+        return LRUCache(
+            path,
+            max_entries=int(incremental_cfg.get("cache_max_entries", 500000)),
+            max_bytes=int(float(incremental_cfg.get("cache_max_mb", 512)) * (1 << 20)),
+        )
+    except sqlite3.Error as exc:
+        warnings.append(f"Segment cache disabled, could not open {path}: {exc}")
+        return None
+
+
+def _segment_keys(
+    documents: list[dict[str, Any]], granularity: str, changes: dict[str, Any] | None
+) -> tuple[dict[int, str], set[int]]:
+    # Corpus position -> segment cache key for every document with text, and
+    # the positions ingestion reported as new or changed. Without a change
+    # report nothing is cached.
+    if changes is None:
+        return {}, set()
+    touched = {str(doc_id) for kind in ("new", "changed") for doc_id in changes.get(kind, [])}
+    keys: dict[int, str] = {}
+    changed: set[int] = set()
+    for position, doc in enumerate(documents):
         doc_id = str(doc.get("doc_id", "")).strip()
         text = str(doc.get("text", "")).strip()
-        if not doc_id or not text:
-            continue
-
-        clauses = _split_clauses(text) if granularity == "clause" else [text]
-        doc_segments: list[dict[str, Any]] = []
-        for idx, clause in enumerate(clauses, start=1):
-            clause_id = f"cl_{idx}"
-            segment = {
-                "segment_id": f"{doc_id}:{clause_id}",
-                "doc_id": doc_id,
-                "clause_id": clause_id,
-                "text": clause,
-                "token_count": len(word_pattern.findall(clause)),
+        if doc_id and text:
+            keys[position] = cache_key("segments", versions.text_checksum(text), granularity)
+            if doc_id in touched:
+                changed.add(position)
+    return keys, changed
+
+
+def _segment_and_diff(
+    context: dict[str, Any],
+    documents: list[dict[str, Any]],
+    granularity: str,
+    diff_cfg: dict[str, Any],
+    warnings: list[str],
+    changes: dict[str, Any] | None = None,
+) -> tuple[SegmentTable, list[dict[str, Any]], dict[str, Any]]:
+    global _WORKER_DOCUMENTS
+    config = context.get("config", {})
+    workers = parallel.configured_workers(config)
+    min_documents = int(config.get("processing", {}).get("parallel_min_documents", 256))
+    started = time.perf_counter()
+
+    # Cache lookups happen here, before any work is dispatched to workers.
+    # SQLite connections must not cross a fork, so each cache is closed again
+    # before the pool starts and reopened for the writes afterwards.
+    pair_keys = _version_pairs(documents, granularity, diff_cfg)
+    pair_cache = _open_pair_cache(context, warnings)
+    cached: dict[str, Any] = {}
+    pair_lookups: dict[str, int] = {}
+    if pair_cache is not None:
+        with pair_cache:
+            cached = pair_cache.get_many(pair_keys.values())
+            pair_lookups = {"hits": pair_cache.hits, "misses": pair_cache.misses}
+    pairs = {position: (key, cached.get(key)) for position, key in pair_keys.items()}
+
+    # Only documents ingestion did not report as new or changed are looked up.
+    segment_keys, changed_positions = _segment_keys(documents, granularity, changes)
+    segmented: dict[int, list[list[Any]]] = {}
+    segment_lookups: dict[str, Any] = {}
+    segment_cache = _open_segment_cache(context, warnings) if segment_keys else None
+    if segment_cache is not None:
+        unchanged = {position: key for position, key in segment_keys.items() if position not in changed_positions}
+        with segment_cache:
+            found = segment_cache.get_many(unchanged.values())
+            segment_lookups = {"hits": segment_cache.hits, "misses": segment_cache.misses}
+        segmented = {position: found[key] for position, key in unchanged.items() if key in found}
+
+    shard_results: list[tuple[SegmentTable, list[tuple[int, int, int, dict[str, Any] | None]], int, float]]
+    if workers > 1 and len(documents) >= max(min_documents, 2):
+        # Several shards per worker so one large version chain does not stall
+        # the pool. Forked workers read documents from inherited memory;
+        # otherwise each task carries its own documents.
+        shards = _shards(documents, workers * 4)
+        fork = parallel.can_fork()
+        tasks = [
+            (
+                shard,
+                None if fork else [documents[position] for position in shard],
+                granularity,
+                diff_cfg,
+                {position: pairs[position] for position in shard if position in pairs},
+                {position: segmented[position] for position in shard if position in segmented},
+            )
+            for shard in shards
+        ]
+        _WORKER_DOCUMENTS = documents
+        try:
+            with parallel.process_pool(min(workers, len(tasks))) as executor:
+                shard_results = list(executor.map(_process_shard, tasks))
+        finally:
+            _WORKER_DOCUMENTS = []
+        execution = {"execution": "parallel", "workers": min(workers, len(tasks)), "shards": len(tasks)}
+    else:
+        shard_results = [
+            _process_shard((list(range(len(documents))), documents, granularity, diff_cfg, pairs, segmented))
+        ]
+        execution = {"execution": "serial", "workers": 1, "shards": 1}
+
+    # Merging in corpus order makes the output identical to a serial run.
+    merged = sorted(
+        ((table, *item) for table, results, _, _ in shard_results for item in results), key=lambda item: item[1]
+    )
+    segments = SegmentTable()
+    for table, _, start, end, _ in merged:
+        segments.copy_rows(table, range(start, end))
+    edges = [edge for *_, edge in merged if edge is not None]
+
+    segment_stats: dict[str, Any] | None = None
+    if segment_keys:
+        fresh: dict[str, list[list[Any]]] = {}
+        for table, position, start, end, _ in merged:
+            if position in segment_keys and position not in segmented:
+                rows = range(start, end)
+                fresh[segment_keys[position]] = [[table.text(row), table.token_count(row)] for row in rows]
+        segment_stats = {
+            "reused": len(segmented),
+            "segmented": len(documents) - len(segmented),
+            "removed": len((changes or {}).get("removed", [])),
+        }
+        segment_cache = _open_segment_cache(context, warnings) if segment_cache is not None else None
+        if segment_cache is not None:
+            with segment_cache:
+                segment_cache.put_many(fresh)
+                segment_stats["cache"] = {**segment_cache.stats(), **segment_lookups}
+
+    diffed = {edge["pair_key"]: edge["record"] for edge in edges if not edge["cached"]}
+    pair_stats: dict[str, Any] = {"pairs": len(edges), "diffed": len(diffed), "cached": len(edges) - len(diffed)}
+    pair_cache = _open_pair_cache(context, warnings) if pair_cache is not None else None
+    if pair_cache is not None:
+        with pair_cache:
+            pair_cache.put_many(diffed)
+            pair_stats["cache"] = {**pair_cache.stats(), **pair_lookups}
+
+    per_worker: dict[int, list[float]] = {}
+    for _, results, pid, seconds in shard_results:
+        totals = per_worker.setdefault(pid, [0, 0.0])
+        totals[0] += len(results)
+        totals[1] += seconds
+    execution["seconds"] = round(time.perf_counter() - started, 6)
+    execution["per_worker"] = [
+        {"worker": f"worker_{slot}", "documents": int(count), "seconds": round(seconds, 6)}
+        for slot, (count, seconds) in enumerate(per_worker.values(), start=1)
+    ]
+    execution["version_pairs"] = pair_stats
+    if segment_stats is not None:
+        execution["segmentation"] = segment_stats
+    return segments, edges, execution
+
+
+def _iter_deltas(edges: list[dict[str, Any]], targets: set[str]) -> Iterator[dict[str, Any]]:
+    # Delta records are derived from the pair records on the fly while they
+    # are written; the segment id of each new side is added to ``targets``.
+    for edge in edges:
+        for change in edge["record"]["changes"]:
+            if change["new_clause_id"] is not None:
+                targets.add(f"{edge['new_doc_id']}:{change['new_clause_id']}")
+            yield {
+                "old_doc_id": edge["old_doc_id"],
+                "new_doc_id": edge["new_doc_id"],
+                "clause_id": change["new_clause_id"] or change["old_clause_id"],
+                **change,
             }
-            doc_segments.append(segment)
-            segments.append(segment)
-        segments_by_doc[doc_id] = doc_segments
 
-    return segments, segments_by_doc
 
+def _version_history(
+    documents: list[dict[str, Any]],
+    segments: SegmentTable,
+    edges: list[dict[str, Any]],
+    cumulative: bool,
+    targets: set[str],
+) -> tuple[dict[str, Any], Iterator[dict[str, Any]], Iterator[dict[str, Any]]]:
+    # The version graph header, its edge records with text-free clause links,
+    # and (when enabled) cumulative deltas for every ancestor/descendant pair
+    # two or more edges apart, composed from those links; adjacent pairs are
+    # the plain deltas. Both record streams are generated while they are
+    # written; cumulative deltas add the segment id of their new side to
+    # ``targets``.
+    graph = versions.VersionGraph.from_documents(documents)
+    chains = graph.chains()
+    links = {(edge["old_doc_id"], edge["new_doc_id"]): versions.clause_links(edge["record"]) for edge in edges}
+
+    def edge_records() -> Iterator[dict[str, Any]]:
+        for edge in edges:
+            record = {key: edge[key] for key in ("old_doc_id", "new_doc_id", "pair_key", "cached")}
+            yield record | {"links": links[(edge["old_doc_id"], edge["new_doc_id"])]}
 
-def _extract_deltas(
-    documents: list[dict[str, Any]], segments_by_doc: dict[str, list[dict[str, Any]]]
-) -> list[dict[str, Any]]:
-    docs_by_id = {str(doc.get("doc_id", "")).strip(): doc for doc in documents}
-    deltas: list[dict[str, Any]] = []
+    def cumulative_deltas() -> Iterator[dict[str, Any]]:
+        # Pairs shared by several root-to-leaf chains (a branching DAG) are
+        # composed once. Only versions in some pair have their clause texts
+        # gathered.
+        pairs = list(
+            dict.fromkeys(
+                (chain[start], descendant)
+                for chain in chains
+                for start in range(len(chain))
+                for descendant in chain[start + 2 :]
+            )
+        )
+        wanted = {doc_id for pair in pairs for doc_id in pair}
+        clauses: dict[str, list[tuple[str, str]]] = {}
+        for row in range(len(segments)):
+            if segments.doc_id(row) in wanted:
+                clauses.setdefault(segments.doc_id(row), []).append((segments.clause_id(row), segments.text(row)))
+        for ancestor, descendant in pairs:
+            for change in versions.cumulative_deltas(graph, links, clauses, ancestor, descendant) or []:
+                if change["new_clause_id"] is not None:
+                    targets.add(f"{descendant}:{change['new_clause_id']}")
+                yield {
+                    "ancestor_doc_id": ancestor,
+                    "descendant_doc_id": descendant,
+                    "clause_id": change["new_clause_id"] or change["old_clause_id"],
+                    **change,
+                }
 
+    header = {"status": "ok", "edge_count": len(edges), "chains": chains}
+    return header, edge_records(), cumulative_deltas() if cumulative else iter(())
+
+
+def _dedup_report(index: dedup.NearDuplicateIndex, kept: int) -> dict[str, Any]:
+    collapsed = index.items - kept
+    return {
+        "input": index.items,
+        "kept": kept,
+        "collapsed": collapsed,
+        "dedup_ratio": round(collapsed / index.items, 4) if index.items else 0.0,
+        "comparisons": index.comparisons,
+        "clusters": index.duplicate_clusters(),
+    }
+
+
+def _document_duplicates(documents: list[dict[str, Any]], index: dedup.NearDuplicateIndex) -> dict[str, Any]:
+    # Report only: every document is still segmented, so a clause that exists
+    # only in a near-duplicate document is never lost, and the duplicates'
+    # clauses collapse at segment level with back-references instead. The two
+    # sides of a replaces_doc_id link are never reported as duplicates.
+    linked: set[str] = set()
     for doc in documents:
-        new_doc_id = str(doc.get("doc_id", "")).strip()
-        old_doc_id = str(doc.get("replaces_doc_id", "")).strip()
-        if not new_doc_id or not old_doc_id or old_doc_id not in docs_by_id:
-            continue
-
-        old_clauses = {segment["clause_id"]: segment["text"] for segment in segments_by_doc.get(old_doc_id, [])}
-        new_clauses = {segment["clause_id"]: segment["text"] for segment in segments_by_doc.get(new_doc_id, [])}
-
-        for clause_id, new_text in sorted(new_clauses.items()):
-            old_text = old_clauses.get(clause_id)
-            if old_text is None:
-                deltas.append(
-                    {
-                        "old_doc_id": old_doc_id,
-                        "new_doc_id": new_doc_id,
-                        "change_type": "added",
-                        "clause_id": clause_id,
-                        "old_text": "",
-                        "new_text": new_text,
-                    }
-                )
-            elif old_text != new_text:
-                deltas.append(
-                    {
-                        "old_doc_id": old_doc_id,
-                        "new_doc_id": new_doc_id,
-                        "change_type": "amended",
-                        "clause_id": clause_id,
-                        "old_text": old_text,
-                        "new_text": new_text,
-                    }
-                )
+        old_doc_id = str(doc.get("replaces_doc_id", "") or "").strip()
+        if old_doc_id:
+            linked.update((old_doc_id, str(doc.get("doc_id", "")).strip()))
+
+    for doc in documents:
+        doc_id = str(doc.get("doc_id", "")).strip()
+        text = str(doc.get("text", "")).strip()
+        if doc_id and text:
+            index.add(doc_id, tokenizer.tokenize(text), allow_duplicate=doc_id not in linked)
+    report = _dedup_report(index, index.items)
+    report["duplicates"] = sum(len(cluster["duplicates"]) for cluster in report["clusters"])
+    return report
 
-        for clause_id, old_text in sorted(old_clauses.items()):
-            if clause_id not in new_clauses:
-                deltas.append(
-                    {
-                        "old_doc_id": old_doc_id,
-                        "new_doc_id": new_doc_id,
-                        "change_type": "repealed",
-                        "clause_id": clause_id,
-                        "old_text": old_text,
-                        "new_text": "",
-                    }
-                )
 
-    return deltas
+def _collapse_segments(
+    segments: SegmentTable,
+    index: dedup.NearDuplicateIndex,
+    documents: list[dict[str, Any]],
+    delta_targets: set[str],
+) -> tuple[SegmentTable, dict[str, Any]]:
+    # Only clauses of unrelated documents collapse (shared boilerplate):
+    # versions in one replaces_doc_id chain never fold into each other, and
+    # the new side of a delta (``delta_targets``) is never folded away, so
+    # retrieval can always cite amended text. Newer versions are added first,
+    # so a cluster that reaches into a chain is led by its newest version.
+    graph = versions.VersionGraph.from_documents(documents)
+    lineages: dict[Any, list[str]] = {}
+    for row in range(len(segments)):
+        doc_id = segments.doc_id(row)
+        if doc_id not in lineages:
+            lineages[doc_id] = graph.lineage(str(doc_id))
+    order = sorted(range(len(segments)), key=lambda row: -len(lineages[segments.doc_id(row)]))
+
+    kept: set[int] = set()
+    for row in order:
+        segment_id = segments.segment_id(row)
+        canonical = index.add(
+            segment_id,
+            tokenizer.tokenize(segments.text(row)),
+            allow_duplicate=segment_id not in delta_targets,
+            group=lineages[segments.doc_id(row)][-1],
+        )
+        if canonical is None:
+            kept.add(row)
+    kept_rows = sorted(kept)
+    collapsed = segments.select(kept_rows)
+    report = _dedup_report(index, len(kept_rows))
+    # Canonical segments carry back-references to the clauses they stand for.
+    new_rows = {segments.segment_id(row): new_row for new_row, row in enumerate(kept_rows)}
+    for cluster in report["clusters"]:
+        collapsed.set_extra(new_rows[cluster["canonical"]], "duplicate_segment_ids", cluster["duplicates"])
+    return collapsed, report
 
 
 def run_processing(context: dict[str, Any]) -> dict[str, Any]:
@@ -150,34 +549,87 @@ def run_processing(context: dict[str, Any]) -> dict[str, Any]:
 
     cfg = context["config"].get("processing", {})
     granularity = str(cfg.get("segmentation_granularity", "clause"))
+    near_cfg = cfg.get("near_duplicate", {})
+    near_enabled = bool(near_cfg.get("enabled", True))
     documents, warnings = _load_documents(context)
-    segments, segments_by_doc = _segment_documents(documents, granularity)
-    deltas = _extract_deltas(documents, segments_by_doc)
 
-    segments_payload = {
+    near_report: dict[str, Any] | None = None
+    if near_enabled:
+        near_report = {
+            "threshold": float(near_cfg.get("threshold", 0.9)),
+            "documents": _document_duplicates(documents, dedup.index_from_config(near_cfg)),
+        }
+
+    # Deltas compare full clause lists, so they run before segment collapsing.
+    changes = _load_changes(context, warnings)
+    segments, edges, execution = _segment_and_diff(
+        context, documents, granularity, cfg.get("diff", {}), warnings, changes
+    )
+    versions_cfg = cfg.get("versions", {})
+    delta_targets: set[str] = set()
+    graph_header, edge_records, cumulative_deltas = _version_history(
+        documents, segments, edges, bool(versions_cfg.get("cumulative", True)), delta_targets
+    )
+
+    # Delta, cumulative delta and edge records are JSONL records behind a
+    # small JSON header, generated from the pair records as they are written
+    # rather than collected first; records.iter_records also reads the older
+    # single-object artifacts.
+    pretty = codec.pretty_output(context["config"])
+    shard_records = max(int(cfg.get("output_shard_records", 0)), 0)
+    delta_count = sum(len(edge["record"]["changes"]) for edge in edges)
+    deltas_path = records.write_records(
+        out_dir / "deltas.json",
+        {"status": "ok", "delta_count": delta_count},
+        _iter_deltas(edges, delta_targets),
+        shard_records,
+        pretty=pretty,
+    )
+    cumulative_path = records.write_records(
+        out_dir / "cumulative_deltas.json",
+        {"status": "ok", "pairs": "every ancestor/descendant pair two or more edges apart"},
+        cumulative_deltas,
+        shard_records,
+        pretty=pretty,
+    )
+    graph_header["cumulative_delta_count"] = records.read_header(cumulative_path)["record_count"]
+    graph_path = records.write_records(
+        out_dir / "version_graph.json", graph_header, edge_records, shard_records, pretty=pretty
+    )
+
+    if near_report is not None:
+        segments, near_report["segments"] = _collapse_segments(
+            segments, dedup.index_from_config(near_cfg), documents, delta_targets
+        )
+
+    segments_header = {
         "status": "ok",
         "granularity": granularity,
         "document_count": len(documents),
         "segment_count": len(segments),
-        "segments": segments,
+        "execution": execution,
+        "memory": segments.memory_stats(),
+        "tokenizer": tokenizer.default().stats(),
         "warnings": warnings,
     }
+    if near_report is not None:
+        segments_header["near_duplicates"] = {
+            kind: {key: value for key, value in near_report[kind].items() if key != "clusters"}
+            for kind in ("documents", "segments")
+        }
 
-    segments_path = out_dir / "normalized_segments.json"
-    with segments_path.open("w", encoding="utf-8") as f:
-        json.dump(segments_payload, f, ensure_ascii=False, indent=2)
-
-    deltas_payload = {
-        "status": "ok",
-        "delta_count": len(deltas),
-        "deltas": deltas,
-    }
-
-    deltas_path = out_dir / "deltas.json"
-    with deltas_path.open("w", encoding="utf-8") as f:
-        json.dump(deltas_payload, f, ensure_ascii=False, indent=2)
+    segments_path = records.write_records(
+        out_dir / "normalized_segments.json", segments_header, segments.records(), shard_records, pretty=pretty
+    )
 
-    return {
+    outputs = {
         "normalized_segments": str(segments_path),
         "deltas": str(deltas_path),
+        "version_graph": str(graph_path),
+        "cumulative_deltas": str(cumulative_path),
     }
+    if near_report is not None:
+        near_path = out_dir / "near_duplicates.json"
+        codec.write(near_path, {"status": "ok", **near_report}, pretty=pretty)
+        outputs["near_duplicates"] = str(near_path)
+    return outputs
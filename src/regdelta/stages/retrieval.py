@@ -1,67 +1,286 @@
 from __future__ import annotations
 
-import json
-import re
+import hashlib
+import heapq
+import math
+import os
+import sqlite3
+import time
+from array import array
 from pathlib import Path
 from typing import Any
 
+from regdelta import codec, diff, parallel, records, tokenizer
+from regdelta.cache import LRUCache, cache_key
+from regdelta.config import resolve_configured_path
+from regdelta.index import dense, lsm, storage
+from regdelta.index.bm25 import DEFAULT_B, DEFAULT_K1, BM25Index, SearchHit
+from regdelta.segments import SegmentTable
+
+# Index shared with query workers: inherited on fork, or reopened from the
+# persisted mmap parts by ``_init_query_worker``.
+_WORKER_INDEX: BM25Index | lsm.LiveIndex | None = None
+
 
 def _tokenize(text: str) -> list[str]:
-    return re.findall(r"\w+", text.lower(), flags=re.UNICODE)
+    return tokenizer.tokenize(text)
 
 
-def _load_segments(context: dict[str, Any]) -> tuple[list[dict[str, Any]], list[str]]:
+def _load_segments(context: dict[str, Any]) -> tuple[SegmentTable, list[str]]:
     warnings: list[str] = []
     processing_artifacts = context.get("artifacts", {}).get("processing", {})
     segments_path = processing_artifacts.get("normalized_segments")
 
     if not segments_path:
         warnings.append("No processing normalized_segments artifact found.")
-        return [], warnings
+        return SegmentTable(), warnings
 
     path = Path(segments_path)
     if not path.exists():
         warnings.append(f"Processing normalized_segments artifact not found: {path}")
-        return [], warnings
+        return SegmentTable(), warnings
 
-    with path.open("r", encoding="utf-8") as f:
-        payload = json.load(f)
-
-    if not isinstance(payload, dict):
-        warnings.append(f"Expected JSON object in normalized_segments artifact: {path}")
-        return [], warnings
+    # The index keeps every segment, so the stream is collected here into a
+    # columnar table; the whole file is never parsed as one object.
+    try:
+        table = SegmentTable.from_records(
+            segment for segment in records.iter_records(path, "segments") if isinstance(segment, dict)
+        )
+    except ValueError as exc:
+        warnings.append(f"Invalid normalized_segments artifact: {exc}")
+        return SegmentTable(), warnings
+    return table, warnings
 
-    segments = payload.get("segments", [])
-    if not isinstance(segments, list):
-        warnings.append(f"Expected 'segments' list in normalized_segments artifact: {path}")
-        return [], warnings
 
-    parsed_segments = [segment for segment in segments if isinstance(segment, dict)]
-    return parsed_segments, warnings
+def _open_index(
+    context: dict[str, Any], segments: SegmentTable, warnings: list[str]
+) -> tuple[BM25Index | lsm.LiveIndex, dict[str, Any]]:
+    retrieval_cfg = context.get("config", {}).get("retrieval", {})
+    k1 = float(retrieval_cfg.get("bm25_k1", DEFAULT_K1))
+    b = float(retrieval_cfg.get("bm25_b", DEFAULT_B))
+    indices_dir = resolve_configured_path(context, "indices")
+
+    if not bool(retrieval_cfg.get("persist_index", True)) or indices_dir is None:
+        index = BM25Index.build(segments, tokenize=_tokenize, k1=k1, b=b)
+        return index, {"persisted": False, "reused": False, "index_version": 0}
+
+    checksum = storage.corpus_checksum(segments, k1, b)
+    index_dir = indices_dir / "bm25"
+    info: dict[str, Any] = {
+        "persisted": True,
+        "reused": False,
+        "path": str(index_dir / lsm.MANIFEST_NAME),
+        "format_version": storage.FORMAT_VERSION,
+        "corpus_checksum": checksum,
+    }
 
+    try:
+        with lsm.locked(index_dir):
+            return _open_persisted_index(index_dir, segments, checksum, k1, b, retrieval_cfg, info, warnings)
+    except OSError as exc:
+        warnings.append(f"Could not open retrieval index {index_dir}, using an in-memory index: {exc}")
+        index = BM25Index.build(segments, tokenize=_tokenize, k1=k1, b=b)
+        return index, {"persisted": False, "reused": False, "index_version": 0}
+
+
+def _open_persisted_index(
+    index_dir: Path,
+    segments: SegmentTable,
+    checksum: str,
+    k1: float,
+    b: float,
+    retrieval_cfg: dict[str, Any],
+    info: dict[str, Any],
+    warnings: list[str],
+) -> tuple[BM25Index | lsm.LiveIndex, dict[str, Any]]:
+    # Runs under lsm.locked(index_dir).
+    manifest = lsm.load_manifest(index_dir)
+    previous = manifest
+    if manifest is not None and lsm.is_compatible(manifest, k1, b):
+        try:
+            live = lsm.open_live_index(index_dir, manifest, _tokenize)
+            if manifest.get("corpus_checksum") == checksum:
+                info.update(reused=True, update={"mode": "reused", "added": 0, "updated": 0, "removed": 0})
+            else:
+                changed, tombstones, update = lsm.plan_update(live, segments)
+                rebuild_ratio = float(retrieval_cfg.get("index_rebuild_ratio", 0.5))
+                if len(changed) + sum(map(len, tombstones.values())) > rebuild_ratio * max(live.segment_count, 1):
+                    raise _RebuildIndex(update)
+                manifest = lsm.apply_update(live, changed, tombstones, checksum, _tokenize)
+                live = lsm.open_live_index(index_dir, manifest, _tokenize)
+                info["update"] = {"mode": "incremental", **update}
+        except _RebuildIndex as exc:
+            info["update"] = {"mode": "full", **exc.update}
+        except (OSError, ValueError, KeyError) as exc:
+            warnings.append(f"Rebuilding unreadable retrieval index {index_dir}: {exc}")
+        else:
+            return live, _describe_live(live, info)
+
+    part = BM25Index.build(segments, tokenize=_tokenize, k1=k1, b=b)
+    info.setdefault("update", {"mode": "full", "added": part.segment_count, "updated": 0, "removed": 0})
+    try:
+        manifest = lsm.create(index_dir, part, checksum, previous=previous)
+        live = lsm.open_live_index(index_dir, manifest, _tokenize)
+    except (OSError, ValueError) as exc:
+        warnings.append(f"Could not persist retrieval index to {index_dir}: {exc}")
+        return part, {"persisted": False, "reused": False, "index_version": 0}
+    lsm.remove_unreferenced_parts(index_dir)
+    return live, _describe_live(live, info)
+
+
+class _RebuildIndex(Exception):
+    def __init__(self, update: dict[str, int]) -> None:
+        super().__init__("change set too large for an incremental update")
+        self.update = update
+
+
+def _describe_live(live: lsm.LiveIndex, info: dict[str, Any]) -> dict[str, Any]:
+    info.update(
+        index_version=live.version,
+        layout=live.layout(),
+        parts=len(live.parts),
+        tombstones=live.ordinal_count - live.segment_count,
+    )
+    return info
+
+
+def _merge_index(context: dict[str, Any], index: BM25Index | lsm.LiveIndex) -> dict[str, Any]:
+    # Compaction runs after query execution, never beside it: query workers
+    # are forked, and forking while another thread holds a lock (allocator,
+    # sqlite, tokenizer) can deadlock the child. Merge, publish and prune run
+    # under the index lock, and only if the manifest is still the one this
+    # run opened; superseded part files are removed afterwards.
+    if not isinstance(index, lsm.LiveIndex):
+        return {"status": "not_needed"}
+    retrieval_cfg = context.get("config", {}).get("retrieval", {})
+    max_parts = int(retrieval_cfg.get("index_max_parts", 4))
+    tombstone_ratio = float(retrieval_cfg.get("index_merge_tombstone_ratio", 0.25))
+    if not lsm.needs_merge(index, max_parts, tombstone_ratio):
+        return {"status": "not_needed"}
+    try:
+        with lsm.locked(index.directory):
+            result = lsm.compact(index.directory, index.manifest, _tokenize)
+            if result.get("status") == "merged":
+                result["removed_parts"] = lsm.remove_unreferenced_parts(index.directory)
+    except (OSError, ValueError) as exc:
+        return {"status": "failed", "error": str(exc)}
+    return result
+
+
+def _dense_settings(context: dict[str, Any]) -> dict[str, Any]:
+    config = context.get("config", {})
+    dense_cfg = config.get("retrieval", {}).get("dense", {})
+    if not isinstance(dense_cfg, dict):
+        dense_cfg = {}
+    return {
+        "embedder": str(dense_cfg.get("embedder", "hashing")),
+        "dimension": int(dense_cfg.get("dimension", 128)),
+        "quantization": str(dense_cfg.get("quantization", "float32")),
+        "nlist": int(dense_cfg.get("nlist", 0)),
+        "nprobe": int(dense_cfg.get("nprobe", 8)),
+        "iterations": int(dense_cfg.get("iterations", 8)),
+        "train_sample": int(dense_cfg.get("train_sample", dense.TRAIN_SAMPLE)),
+        "seed": int(config.get("runtime", {}).get("seed", 42)),
+    }
 
-def _build_lexical_index(
-    segments: list[dict[str, Any]],
-) -> tuple[dict[str, set[str]], dict[str, list[str]], dict[str, dict[str, Any]]]:
-    term_to_segment_ids: dict[str, set[str]] = {}
-    segment_id_to_terms: dict[str, list[str]] = {}
-    segment_lookup: dict[str, dict[str, Any]] = {}
 
-    for segment in segments:
-        segment_id = str(segment.get("segment_id", "")).strip()
-        if not segment_id:
+def _previous_centroids(
+    directory: Path, family: str, dimension: int, ordinal_count: int
+) -> array | None:
+    # Centroids are only carried over while the corpus has at most doubled
+    # since they were trained; beyond that the lists would grow too long.
+    candidates = sorted(
+        directory.glob(f"{family}-*.vec"), key=lambda item: item.stat().st_mtime, reverse=True
+    )
+    for path in candidates:
+        try:
+            previous = dense.open_index(path)
+        except (OSError, ValueError):
             continue
-
-        text = str(segment.get("text", ""))
-        terms = _tokenize(text)
-        unique_terms = sorted(set(terms))
-        segment_id_to_terms[segment_id] = unique_terms
-        segment_lookup[segment_id] = segment
-
-        for term in unique_terms:
-            term_to_segment_ids.setdefault(term, set()).add(segment_id)
-
-    return term_to_segment_ids, segment_id_to_terms, segment_lookup
+        if previous.dimension == dimension and previous.count * 2 >= ordinal_count:
+            return array("f", previous.centroids)
+        return None
+    return None
+
+
+def _open_dense_index(
+    context: dict[str, Any],
+    index: BM25Index | lsm.LiveIndex,
+    storage_info: dict[str, Any],
+    embedder: dense.Embedder,
+    settings: dict[str, Any],
+    warnings: list[str],
+) -> tuple[dense.DenseIndex, dict[str, Any]]:
+    indices_dir = resolve_configured_path(context, "indices")
+    checksum = storage_info.get("corpus_checksum")
+    dense_path: Path | None = None
+    info: dict[str, Any] = {"persisted": False, "reused": False, "centroids": "trained", **settings}
+    centroids = None
+
+    if storage_info.get("persisted") and checksum and indices_dir is not None:
+        # Dense ordinals mirror the lexical layout, tombstoned slots included.
+        # Files are prefixed by the settings fingerprint so an index built for
+        # an earlier layout can lend its centroids to the rebuild.
+        family = hashlib.sha256(codec.dumpb([embedder.name, settings], sort_keys=True)).hexdigest()[:16]
+        key = hashlib.sha256(
+            codec.dumpb([checksum, storage_info.get("layout"), embedder.name, settings], sort_keys=True)
+        ).hexdigest()
+        dense_path = indices_dir / "dense" / f"{family}-{key[:32]}.vec"
+        info.update({"persisted": True, "path": str(dense_path)})
+        if dense_path.exists():
+            try:
+                dense_index = dense.open_index(dense_path)
+            except (OSError, ValueError) as exc:
+                warnings.append(f"Rebuilding unreadable dense index {dense_path}: {exc}")
+            else:
+                info["reused"] = True
+                return dense_index, info
+        centroids = _previous_centroids(dense_path.parent, family, embedder.dimension, index.ordinal_count)
+        if centroids is not None:
+            info["centroids"] = "reused"
+
+    texts = [
+        str(index.segments[ordinal].get("text", "")) if index.is_live(ordinal) else ""
+        for ordinal in range(index.ordinal_count)
+    ]
+    dense_index = dense.DenseIndex.build(
+        embedder.embed(texts),
+        dimension=embedder.dimension,
+        nlist=settings["nlist"],
+        iterations=settings["iterations"],
+        seed=settings["seed"],
+        quantization=settings["quantization"],
+        train_sample=settings["train_sample"],
+        centroids=centroids,
+    )
+    if dense_path is not None:
+        try:
+            dense.write_index(dense_index, dense_path)
+            storage.prune_indices(
+                dense_path.parent,
+                keep=int(context["config"].get("retrieval", {}).get("index_keep", 2)),
+                pattern="*.vec",
+            )
+        except OSError as exc:
+            warnings.append(f"Could not persist dense index to {dense_path}: {exc}")
+            info["persisted"] = False
+    return dense_index, info
+
+
+def _delta_query_text(delta: dict[str, Any], mode: str, context_tokens: int) -> str:
+    new_text = str(delta.get("new_text", "")).strip()
+    old_text = str(delta.get("old_text", "")).strip()
+    spans = delta.get("changed_spans")
+    if mode == "changed_spans" and isinstance(spans, list) and spans:
+        # Query the inserted/replaced words of an amendment; pure deletions
+        # fall back to the removed words.
+        spans = [span for span in spans if isinstance(span, dict)]
+        query_text = diff.span_query(str(delta.get("new_text", "")), spans, "new", context_tokens)
+        if not query_text:
+            query_text = diff.span_query(str(delta.get("old_text", "")), spans, "old", context_tokens)
+        if query_text:
+            return query_text
+    return new_text or old_text
 
 
 def _load_queries(context: dict[str, Any]) -> list[dict[str, str]]:
@@ -82,14 +301,15 @@ def _load_queries(context: dict[str, Any]) -> list[dict[str, str]]:
     if queries:
         return queries
 
+    delta_cfg = retrieval_cfg.get("delta_query", {})
+    delta_mode = str(delta_cfg.get("mode", "changed_spans")).strip().lower()
+    context_tokens = max(int(delta_cfg.get("context_tokens", 2)), 0)
     deltas_path = context.get("artifacts", {}).get("processing", {}).get("deltas")
     if deltas_path and Path(deltas_path).exists():
-        with Path(deltas_path).open("r", encoding="utf-8") as f:
-            payload = json.load(f)
-        for idx, delta in enumerate(payload.get("deltas", []), start=1):
+        for idx, delta in enumerate(records.iter_records(deltas_path, "deltas"), start=1):
             if not isinstance(delta, dict):
                 continue
-            query_text = str(delta.get("new_text", "")).strip() or str(delta.get("old_text", "")).strip()
+            query_text = _delta_query_text(delta, delta_mode, context_tokens)
             if not query_text:
                 continue
             queries.append({"query_id": f"delta_{idx}", "query_text": query_text})
@@ -100,13 +320,210 @@ def _load_queries(context: dict[str, Any]) -> list[dict[str, str]]:
     return [{"query_id": "default_1", "query_text": "regulatory update"}]
 
 
-def _score_segment(query_terms: set[str], segment_terms: set[str]) -> tuple[float, float]:
-    if not query_terms:
-        return 0.0, 0.0
-    overlap = query_terms & segment_terms
-    overlap_ratio = len(overlap) / len(query_terms)
-    jaccard = len(overlap) / len(query_terms | segment_terms) if query_terms | segment_terms else 0.0
-    return overlap_ratio, jaccard
+def _score_queries(
+    index: BM25Index | lsm.LiveIndex, query_texts: list[str], top_k: int, batch_size: int
+) -> list[list[SearchHit]]:
+    parsed: list[tuple[list[Any], int]] = []
+    for query_text in query_texts:
+        query_term_set = set(_tokenize(query_text))
+        parsed.append((index.term_ids(query_term_set), len(query_term_set)))
+
+    if batch_size <= 0:
+        return [index.search(term_ids, term_count, top_k) for term_ids, term_count in parsed]
+
+    hits: list[list[SearchHit]] = []
+    for start in range(0, len(parsed), batch_size):
+        hits.extend(index.search_batch(parsed[start : start + batch_size], top_k))
+    return hits
+
+
+def _init_query_worker(index_dir: str | None, manifest: dict[str, Any] | None) -> None:
+    global _WORKER_INDEX
+    if index_dir and manifest is not None:
+        _WORKER_INDEX = lsm.open_live_index(Path(index_dir), manifest, _tokenize)
+
+
+def _score_query_chunk(
+    task: tuple[list[str], int, int],
+) -> tuple[list[list[SearchHit]], int, float]:
+    query_texts, top_k, batch_size = task
+    if _WORKER_INDEX is None:
+        raise RuntimeError("Retrieval worker started without an index")
+    started = time.perf_counter()
+    hits = _score_queries(_WORKER_INDEX, query_texts, top_k, batch_size)
+    return hits, os.getpid(), time.perf_counter() - started
+
+
+def _throughput(label: str, query_count: int, seconds: float) -> dict[str, Any]:
+    return {
+        "worker": label,
+        "query_count": query_count,
+        "seconds": round(seconds, 6),
+        "queries_per_second": round(query_count / seconds, 2) if seconds > 0 else None,
+    }
+
+
+def _execute_queries(
+    context: dict[str, Any],
+    index: BM25Index | lsm.LiveIndex,
+    query_texts: list[str],
+    top_k: int,
+    batch_size: int,
+) -> tuple[list[list[SearchHit]], dict[str, Any]]:
+    global _WORKER_INDEX
+    config = context.get("config", {})
+    workers = parallel.configured_workers(config)
+    min_queries = int(config.get("retrieval", {}).get("parallel_min_queries", 64))
+    # Workers reopen the exact manifest snapshot, not whatever is on disk now.
+    initargs: tuple[Any, ...] = (None, None)
+    if isinstance(index, lsm.LiveIndex):
+        initargs = (str(index.directory), index.manifest)
+
+    started = time.perf_counter()
+    use_pool = workers > 1 and len(query_texts) >= max(min_queries, 2)
+    if use_pool and not parallel.can_fork() and initargs[1] is None:
+        use_pool = False
+
+    if not use_pool:
+        hits = _score_queries(index, query_texts, top_k, batch_size)
+        elapsed = time.perf_counter() - started
+        stats = _throughput("main", len(query_texts), elapsed)
+        return hits, {
+            "execution": "serial",
+            "workers": 1,
+            "query_count": len(query_texts),
+            "seconds": stats["seconds"],
+            "queries_per_second": stats["queries_per_second"],
+            "per_worker": [stats],
+        }
+
+    # Several chunks per worker so a slow chunk does not stall the pool;
+    # map() yields chunks in submission order, which keeps output deterministic.
+    chunk_size = math.ceil(len(query_texts) / (workers * 4))
+    tasks = [(chunk, top_k, batch_size) for chunk in parallel.chunked(query_texts, chunk_size)]
+    hits: list[list[SearchHit]] = []
+    per_worker: dict[int, list[float]] = {}
+    _WORKER_INDEX = index
+    try:
+        with parallel.process_pool(workers, _init_query_worker, initargs) as executor:
+            for chunk_hits, pid, seconds in executor.map(_score_query_chunk, tasks):
+                hits.extend(chunk_hits)
+                totals = per_worker.setdefault(pid, [0, 0.0])
+                totals[0] += len(chunk_hits)
+                totals[1] += seconds
+    finally:
+        _WORKER_INDEX = None
+    elapsed = time.perf_counter() - started
+
+    return hits, {
+        "execution": "parallel",
+        "workers": workers,
+        "query_count": len(query_texts),
+        "seconds": round(elapsed, 6),
+        "queries_per_second": round(len(query_texts) / elapsed, 2) if elapsed > 0 else None,
+        "per_worker": [
+            dict(_throughput(f"worker_{slot}", int(count), seconds), pid=pid)
+            for slot, (pid, (count, seconds)) in enumerate(per_worker.items(), start=1)
+        ],
+    }
+
+
+def _segment_jaccard(index: BM25Index | lsm.LiveIndex, ordinal: int, query_term_set: set[str]) -> float:
+    segment_terms = set(_tokenize(str(index.segments[ordinal].get("text", ""))))
+    return index.jaccard(ordinal, len(segment_terms & query_term_set), len(query_term_set))
+
+
+def _fuse_hits(
+    index: BM25Index | lsm.LiveIndex,
+    query_text: str,
+    lexical_hits: list[SearchHit],
+    dense_hits: list[tuple[float, int]],
+    top_k: int,
+    rrf_k: int,
+) -> list[SearchHit]:
+    query_term_set = set(_tokenize(query_text))
+    lexical_rerank = {hit[3]: hit[1] for hit in lexical_hits}
+    fused = dense.reciprocal_rank_fusion(
+        [[hit[3] for hit in lexical_hits], [ordinal for _, ordinal in dense_hits]], k=rrf_k
+    )
+    hits: list[SearchHit] = []
+    for ordinal, score in fused.items():
+        rerank_score = lexical_rerank.get(ordinal)
+        if rerank_score is None:
+            rerank_score = _segment_jaccard(index, ordinal, query_term_set)
+        hits.append((score, rerank_score, index.segment_ids[ordinal], ordinal))
+    return heapq.nlargest(top_k, hits)
+
+
+def _leg_latency(seconds: float, query_count: int, **extra: Any) -> dict[str, Any]:
+    return {
+        "seconds": round(seconds, 6),
+        "avg_query_ms": round(1000.0 * seconds / query_count, 4) if query_count else 0.0,
+        **extra,
+    }
+
+
+def _finalize_candidates(
+    index: BM25Index | lsm.LiveIndex, top_scored: list[SearchHit], rerank_top_k: int
+) -> list[dict[str, Any]]:
+    reranked = sorted(
+        top_scored[:rerank_top_k],
+        key=lambda hit: (hit[1], hit[0], hit[2]),
+        reverse=True,
+    )
+
+    final: list[dict[str, Any]] = []
+    for rank, (score, rerank_score, _, ordinal) in enumerate(
+        reranked + top_scored[rerank_top_k:], start=1
+    ):
+        segment = index.segments[ordinal]
+        final.append(
+            {
+                "segment_id": segment["segment_id"],
+                "doc_id": segment.get("doc_id"),
+                "clause_id": segment.get("clause_id"),
+                "score": score,
+                "rerank_score": rerank_score,
+                "text": segment.get("text", ""),
+                "rank": rank,
+            }
+        )
+    return final
+
+
+def _open_result_cache(
+    context: dict[str, Any], storage_info: dict[str, Any], warnings: list[str]
+) -> LRUCache | None:
+    cache_cfg = context.get("config", {}).get("retrieval", {}).get("result_cache", {})
+    if not isinstance(cache_cfg, dict):
+        cache_cfg = {}
+    indices_dir = resolve_configured_path(context, "indices")
+    # Entries are keyed on the corpus checksum, which only a persisted index has.
+    if not bool(cache_cfg.get("enabled", True)) or not storage_info.get("persisted") or indices_dir is None:
+        return None
+    path = indices_dir / "cache" / "retrieval.sqlite"
+    try:
+        return LRUCache(
+            path,
+            max_entries=int(cache_cfg.get("max_entries", 10000)),
+            max_bytes=int(float(cache_cfg.get("max_mb", 64)) * (1 << 20)),
+        )
+    except sqlite3.Error as exc:
+        warnings.append(f"Retrieval result cache disabled, could not open {path}: {exc}")
+        return None
+
+
+def _result_cache_key(query_text: str, storage_info: dict[str, Any], settings: dict[str, Any]) -> str:
+    # Both legs only see the token stream, so case and punctuation variants
+    # of the same clause share an entry.
+    normalized = " ".join(_tokenize(query_text))
+    return cache_key(
+        "retrieval:v1",
+        hashlib.sha256(normalized.encode("utf-8")).hexdigest(),
+        storage_info.get("corpus_checksum"),
+        storage_info.get("index_version"),
+        settings,
+    )
 
 
 def run_retrieval(context: dict[str, Any]) -> dict[str, Any]:
@@ -116,56 +533,108 @@ def run_retrieval(context: dict[str, Any]) -> dict[str, Any]:
     retrieval_cfg = context["config"].get("retrieval", {})
     top_k = int(retrieval_cfg.get("top_k", 8))
     rerank_top_k = int(retrieval_cfg.get("rerank_top_k", min(4, top_k)))
+    batch_size = int(retrieval_cfg.get("batch_size", 0))
+    mode = str(retrieval_cfg.get("mode", "lexical")).strip().lower()
 
     segments, warnings = _load_segments(context)
-    term_to_segment_ids, segment_id_to_terms, segment_lookup = _build_lexical_index(segments)
+    if mode not in {"lexical", "hybrid"}:
+        warnings.append(f"Unsupported retrieval mode '{mode}'. Falling back to lexical.")
+        mode = "lexical"
+    index, storage_info = _open_index(context, segments, warnings)
     queries = _load_queries(context)
+    query_texts = [query["query_text"] for query in queries]
+
+    depth = top_k
+    cache_settings: dict[str, Any] = {"mode": mode, "top_k": top_k, "rerank_top_k": rerank_top_k}
+    if mode == "hybrid":
+        depth = max(top_k, int(retrieval_cfg.get("hybrid_depth", top_k * 4)))
+        rrf_k = int(retrieval_cfg.get("rrf_k", 60))
+        settings = _dense_settings(context)
+        cache_settings.update(depth=depth, rrf_k=rrf_k, dense=settings)
+
+    # Cache lookups happen here, before any work is dispatched to workers;
+    # only distinct uncached queries are scored. The SQLite connection is
+    # closed again before query workers fork, since a connection must not be
+    # shared across fork, and a new one is opened for the writes afterwards.
+    keys = [_result_cache_key(query_text, storage_info, cache_settings) for query_text in query_texts]
+    finals: dict[str, list[dict[str, Any]]] = {}
+    lookups: dict[str, int] = {}
+    result_cache = _open_result_cache(context, storage_info, warnings)
+    if result_cache is not None:
+        with result_cache:
+            finals = result_cache.get_many(keys)
+            lookups = {"hits": result_cache.hits, "misses": result_cache.misses}
+    pending: dict[str, str] = {}
+    for key, query_text in zip(keys, query_texts):
+        if key not in finals:
+            pending.setdefault(key, query_text)
+    pending_texts = list(pending.values())
+
+    lexical_hits, execution_stats = _execute_queries(
+        context, index, pending_texts, depth, batch_size
+    )
+    legs: dict[str, Any] = {
+        "lexical": _leg_latency(execution_stats["seconds"], len(pending_texts), depth=depth)
+    }
+    dense_info: dict[str, Any] | None = None
 
-    query_results: list[dict[str, Any]] = []
-    for query in queries:
-        query_id = query["query_id"]
-        query_text = query["query_text"]
-        query_term_set = set(_tokenize(query_text))
-
-        candidate_ids: set[str] = set()
-        for term in query_term_set:
-            candidate_ids.update(term_to_segment_ids.get(term, set()))
-
-        scored: list[dict[str, Any]] = []
-        for segment_id in candidate_ids:
-            segment = segment_lookup.get(segment_id)
-            if segment is None:
-                continue
-
-            segment_terms = set(segment_id_to_terms.get(segment_id, []))
-            score, rerank_score = _score_segment(query_term_set, segment_terms)
-            scored.append(
-                {
-                    "segment_id": segment_id,
-                    "doc_id": segment.get("doc_id"),
-                    "clause_id": segment.get("clause_id"),
-                    "score": score,
-                    "rerank_score": rerank_score,
-                    "text": segment.get("text", ""),
-                }
-            )
-
-        scored.sort(key=lambda item: (item["score"], item["rerank_score"], item["segment_id"]), reverse=True)
-        top_scored = scored[:top_k]
-        reranked = sorted(
-            top_scored[:rerank_top_k],
-            key=lambda item: (item["rerank_score"], item["score"], item["segment_id"]),
-            reverse=True,
+    if mode == "hybrid":
+        embedder = dense.build_embedder(settings["embedder"], settings["dimension"], tokenize=_tokenize)
+        started = time.perf_counter()
+        dense_index, dense_info = _open_dense_index(
+            context, index, storage_info, embedder, settings, warnings
+        )
+        index_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        query_vectors = embedder.embed(pending_texts)
+        embed_seconds = time.perf_counter() - started
+        dense_hits = [
+            [
+                (score, ordinal)
+                for score, ordinal in dense_index.search(vector, depth, nprobe=settings["nprobe"])
+                if index.is_live(ordinal)
+            ]
+            for vector in query_vectors
+        ]
+        search_seconds = time.perf_counter() - started - embed_seconds
+        legs["dense"] = _leg_latency(
+            embed_seconds + search_seconds,
+            len(pending_texts),
+            depth=depth,
+            embed_seconds=round(embed_seconds, 6),
+            search_seconds=round(search_seconds, 6),
+            index_seconds=round(index_seconds, 6),
         )
-        final = reranked + top_scored[rerank_top_k:]
 
-        for rank, item in enumerate(final, start=1):
-            item["rank"] = rank
+        started = time.perf_counter()
+        query_hits = [
+            _fuse_hits(index, query_text, lexical, dense_ranked, top_k, rrf_k)
+            for query_text, lexical, dense_ranked in zip(pending_texts, lexical_hits, dense_hits)
+        ]
+        legs["fusion"] = _leg_latency(time.perf_counter() - started, len(pending_texts), rrf_k=rrf_k)
+    else:
+        query_hits = lexical_hits
+
+    computed = {
+        key: _finalize_candidates(index, top_scored, rerank_top_k)
+        for key, top_scored in zip(pending, query_hits)
+    }
+    finals.update(computed)
+    cache_stats: dict[str, Any] = {"enabled": False}
+    result_cache = _open_result_cache(context, storage_info, warnings) if result_cache is not None else None
+    if result_cache is not None:
+        with result_cache:
+            result_cache.put_many(computed)
+            cache_stats = {"enabled": True, **result_cache.stats(), **lookups}
 
+    query_results: list[dict[str, Any]] = []
+    for query, key in zip(queries, keys):
+        final = finals[key]
         query_results.append(
             {
-                "query_id": query_id,
-                "query_text": query_text,
+                "query_id": query["query_id"],
+                "query_text": query["query_text"],
                 "candidate_count": len(final),
                 "candidates": final,
             }
@@ -173,6 +642,7 @@ def run_retrieval(context: dict[str, Any]) -> dict[str, Any]:
 
     candidates_payload = {
         "status": "ok",
+        "mode": mode,
         "top_k": top_k,
         "rerank_top_k": rerank_top_k,
         "query_count": len(query_results),
@@ -180,27 +650,54 @@ def run_retrieval(context: dict[str, Any]) -> dict[str, Any]:
         "warnings": warnings,
     }
 
+    pretty = codec.pretty_output(context["config"])
     candidates_path = out_dir / "retrieval_candidates.json"
-    with candidates_path.open("w", encoding="utf-8") as f:
-        json.dump(candidates_payload, f, ensure_ascii=False, indent=2)
+    codec.write(candidates_path, candidates_payload, pretty=pretty)
 
-    term_document_frequency = {
-        term: len(segment_ids) for term, segment_ids in sorted(term_to_segment_ids.items())
-    }
+    storage_info["merge"] = _merge_index(context, index)
+    term_document_frequency = index.term_document_frequency()
     index_payload = {
         "status": "ok",
         "index": {
-            "segment_count": len(segment_id_to_terms),
+            "scoring": "bm25",
+            "k1": index.k1,
+            "b": index.b,
+            "segment_count": index.segment_count,
             "vocabulary_size": len(term_document_frequency),
+            "postings_count": index.postings_count,
+            "average_segment_length": round(index.avg_doc_length, 4),
             "term_document_frequency": term_document_frequency,
         },
+        "index_version": storage_info.get("index_version", 0),
+        "storage": storage_info,
     }
+    if dense_info is not None:
+        index_payload["dense"] = {
+            **dense_info,
+            "vector_count": dense_index.count,
+            "nlist": dense_index.nlist,
+        }
 
     index_path = out_dir / "evidence_index.json"
-    with index_path.open("w", encoding="utf-8") as f:
-        json.dump(index_payload, f, ensure_ascii=False, indent=2)
+    codec.write(index_path, index_payload, pretty=pretty)
+
+    stats_path = out_dir / "retrieval_stats.json"
+    codec.write(
+        stats_path,
+        {
+            "status": "ok",
+            "mode": mode,
+            "queries": execution_stats,
+            "legs": legs,
+            "cache": cache_stats,
+            "segments": segments.memory_stats(),
+            "tokenizer": tokenizer.default().stats(),
+        },
+        pretty=pretty,
+    )
 
     return {
         "retrieval_candidates": str(candidates_path),
         "evidence_index": str(index_path),
+        "retrieval_stats": str(stats_path),
     }
@@ -1,36 +1,22 @@
 from __future__ import annotations
 
-import json
-import re
 from pathlib import Path
 from typing import Any
 
-
-def _load_json(path: str | None) -> dict[str, Any] | None:
-    if not path:
-        return None
-    payload_path = Path(path)
-    if not payload_path.exists():
-        return None
-    with payload_path.open("r", encoding="utf-8") as f:
-        loaded = json.load(f)
-    if not isinstance(loaded, dict):
-        return None
-    return loaded
+from regdelta import codec, tokenizer
 
 
 def _tokenize(text: str) -> set[str]:
-    return set(re.findall(r"\w+", text.lower(), flags=re.UNICODE))
+    return set(tokenizer.tokenize(text))
 
 
-def _support_score(claim_text: str, candidate_texts: list[str]) -> float:
+def _support_score(claim_text: str, candidate_terms: list[set[str]]) -> float:
     claim_terms = _tokenize(claim_text)
     if not claim_terms:
         return 0.0
 
     best_score = 0.0
-    for candidate_text in candidate_texts:
-        evidence_terms = _tokenize(candidate_text)
+    for evidence_terms in candidate_terms:
         if not evidence_terms:
             continue
         overlap = len(claim_terms & evidence_terms) / len(claim_terms)
@@ -59,7 +45,7 @@ def run_verification(context: dict[str, Any]) -> dict[str, Any]:
     abstain_when_unsupported = bool(cfg.get("abstain_when_unsupported", True))
     warnings: list[str] = []
 
-    draft_payload = _load_json(
+    draft_payload = codec.load_artifact(
         context.get("artifacts", {}).get("generation", {}).get("compliance_pack_draft")
     )
     if draft_payload is None:
@@ -69,7 +55,7 @@ def run_verification(context: dict[str, Any]) -> dict[str, Any]:
         raw_claims = draft_payload.get("claims", [])
         draft_claims = [claim for claim in raw_claims if isinstance(claim, dict)]
 
-    retrieval_payload = _load_json(
+    retrieval_payload = codec.load_artifact(
         context.get("artifacts", {}).get("retrieval", {}).get("retrieval_candidates")
     )
     if retrieval_payload is None:
@@ -77,7 +63,18 @@ def run_verification(context: dict[str, Any]) -> dict[str, Any]:
         candidates: list[dict[str, Any]] = []
     else:
         candidates = _flatten_candidates(retrieval_payload)
-    candidate_texts = [str(item.get("text", "")) for item in candidates]
+    # The same segment is usually a candidate for several queries; evidence
+    # is tokenized once per segment (or per text, for candidates without a
+    # segment_id), not once per claim.
+    candidate_terms: list[set[str]] = []
+    seen_evidence: set[tuple[str, str]] = set()
+    for item in candidates:
+        text = str(item.get("text", ""))
+        segment_id = str(item.get("segment_id") or "")
+        key = (segment_id, "") if segment_id else ("", text)
+        if key not in seen_evidence:
+            seen_evidence.add(key)
+            candidate_terms.append(_tokenize(text))
 
     verified_claims: list[dict[str, Any]] = []
     abstained_claim_ids: list[str] = []
@@ -93,12 +90,12 @@ def run_verification(context: dict[str, Any]) -> dict[str, Any]:
         if not isinstance(citations, list):
             citations = []
 
-        score = _support_score(statement, candidate_texts)
+        score = _support_score(statement, candidate_terms)
         confidences.append(score)
         if score >= threshold:
             verdict = "supported"
             supported += 1
-        elif score <= 0.05 and candidate_texts:
+        elif score <= 0.05 and candidate_terms:
             verdict = "contradicted"
             contradicted += 1
         else:
@@ -159,12 +156,11 @@ def run_verification(context: dict[str, Any]) -> dict[str, Any]:
     }
 
     verified_path = out_dir / "verified_pack.json"
-    with verified_path.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+    pretty = codec.pretty_output(context["config"])
+    codec.write(verified_path, payload, pretty=pretty)
 
     abstention_path = out_dir / "abstention_report.json"
-    with abstention_path.open("w", encoding="utf-8") as f:
-        json.dump(payload["abstention_report"], f, ensure_ascii=False, indent=2)
+    codec.write(abstention_path, payload["abstention_report"], pretty=pretty)
 
     return {
         "verified_pack": str(verified_path),
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Any
+
+# Bumped whenever normalization or token boundaries change; anything keyed on
+# tokenized text (index checksums, result caches) includes it.
+VERSION = 1
+
+_WORD = re.compile(r"\w+", flags=re.UNICODE)
+
+# Combining grave, acute, tilde, hook above and dot below.
+_TONE_MARKS = ("\u0300", "\u0301", "\u0303", "\u0309", "\u0323")
+
+
+def _tone_placement_table() -> dict[str, str]:
+    # Open syllables ending in oa/oe/uy are written with the tone mark on
+    # either vowel ("hoà"/"hòa", "thuỷ"/"thủy"); both fold to the mark on
+    # the first vowel. Closed syllables ("hoàng") have only one spelling.
+    table: dict[str, str] = {}
+    for first, second in (("o", "a"), ("o", "e"), ("u", "y")):
+        for mark in _TONE_MARKS:
+            moved = first + unicodedata.normalize("NFC", second + mark)
+            table[moved] = unicodedata.normalize("NFC", first + mark) + second
+    return table
+
+
+_TONE_PLACEMENT = _tone_placement_table()
+# "qu" is a consonant, so the tone of "quý" stays on the y.
+_TONE_PATTERN = re.compile(
+    r"(?<!q)(" + "|".join(map(re.escape, _TONE_PLACEMENT)) + r")(?!\w)", flags=re.UNICODE
+)
+
+
+def normalize(text: str) -> str:
+    # NFC first so decomposed diacritics do not split syllables, then case
+    # folding, then one tone-mark placement per syllable.
+    folded = unicodedata.normalize("NFC", text).casefold()
+    return _TONE_PATTERN.sub(lambda match: _TONE_PLACEMENT[match.group(1)], folded)
+
+
+class Tokenizer:
+    # Normalized word tokens as integer ids into a vocabulary that grows as
+    # text is seen. Results are cached by text checksum, so a clause is
+    # tokenized once however many stages (segmentation, dedup, indexing,
+    # verification) look at it. Ids are only meaningful within one process.
+    # The vocabulary and cache are shared by every thread that tokenizes
+    # (query scoring, index builds), so updates happen under one lock;
+    # normalization and splitting run outside it.
+
+    def __init__(self, max_cached: int = 200_000) -> None:
+        self.max_cached = max(int(max_cached), 0)
+        self.vocabulary: list[str] = []
+        self._ids: dict[str, int] = {}
+        self._cache: OrderedDict[bytes, array] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def token_ids(self, text: str) -> array:
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return cached
+            self.misses += 1
+
+        terms = _WORD.findall(normalize(text))
+        with self._lock:
+            ids = array("I")
+            for term in terms:
+                term_id = self._ids.get(term)
+                if term_id is None:
+                    term_id = self._ids[term] = len(self.vocabulary)
+                    self.vocabulary.append(term)
+                ids.append(term_id)
+            if self.max_cached:
+                self._cache[key] = ids
+                if len(self._cache) > self.max_cached:
+                    self._cache.popitem(last=False)
+        return ids
+
+    def tokens(self, text: str) -> list[str]:
+        # The vocabulary is append-only, so reading assigned ids needs no lock.
+        vocabulary = self.vocabulary
+        return [vocabulary[term_id] for term_id in self.token_ids(text)]
+
+    def _after_fork(self) -> None:
+        # A forked child gets a fresh lock in case another parent thread held it.
+        self._lock = threading.Lock()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+            vocabulary_size, cached_texts = len(self.vocabulary), len(self._cache)
+        lookups = hits + misses
+        return {
+            "version": VERSION,
+            "vocabulary_size": vocabulary_size,
+            "cached_texts": cached_texts,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_DEFAULT = Tokenizer()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_DEFAULT._after_fork)
+
+
+def default() -> Tokenizer:
+    return _DEFAULT
+
+
+def tokenize(text: str) -> list[str]:
+    return _DEFAULT.tokens(text)
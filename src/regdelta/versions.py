@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Iterable, Sequence
+
+from regdelta import diff
+from regdelta.cache import cache_key
+
+
+def text_checksum(text: str) -> str:
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+def pair_key(old_checksum: str, new_checksum: str, granularity: str, amend_similarity: float, max_d: int) -> str:
+    # Clause ids are positional, so a pair diff depends only on the two
+    # texts and the segmentation/diff settings, never on doc_ids.
+    return cache_key("pair_diff:v1", old_checksum, new_checksum, granularity, amend_similarity, max_d)
+
+
+def pair_record(
+    old_clauses: Sequence[tuple[str, str]],
+    new_clauses: Sequence[tuple[str, str]],
+    amend_similarity: float,
+    max_d: int,
+) -> dict[str, Any]:
+    changes, unchanged = diff.clause_mapping(old_clauses, new_clauses, amend_similarity, max_d)
+    for change in changes:
+        if change["change_type"] == "amended":
+            change["changed_spans"] = diff.word_spans(change["old_text"], change["new_text"], max_d)
+    return {"changes": changes, "unchanged": [list(pair) for pair in unchanged]}
+
+
+def clause_links(record: dict[str, Any]) -> list[list[Any]]:
+    # The text-free part of a pair record: [old_id, new_id, change_type] for
+    # every clause present on either side (change_type None when unchanged).
+    links: list[list[Any]] = [[old_id, new_id, None] for old_id, new_id in record.get("unchanged", [])]
+    links.extend(
+        [change["old_clause_id"], change["new_clause_id"], change["change_type"]]
+        for change in record.get("changes", [])
+    )
+    return links
+
+
+class VersionGraph:
+    # replaces_doc_id links as a version DAG: each document has at most one
+    # predecessor, and a document may be replaced by several successors
+    # (consolidated and amended texts of the same base). Cycles in the input
+    # are cut where a walk would revisit a document.
+
+    def __init__(self, parents: dict[str, str]) -> None:
+        self.parents = parents
+        self.children: dict[str, list[str]] = {}
+        for child, parent in parents.items():
+            self.children.setdefault(parent, []).append(child)
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[dict[str, Any]]) -> VersionGraph:
+        known: set[str] = set()
+        links: dict[str, str] = {}
+        for doc in documents:
+            doc_id = str(doc.get("doc_id", "")).strip()
+            old_doc_id = str(doc.get("replaces_doc_id", "") or "").strip()
+            if doc_id:
+                known.add(doc_id)
+                if old_doc_id and old_doc_id != doc_id:
+                    links[doc_id] = old_doc_id
+        return cls({child: parent for child, parent in links.items() if parent in known})
+
+    def lineage(self, doc_id: str) -> list[str]:
+        # ``doc_id`` followed by its predecessors, oldest last.
+        chain = [doc_id]
+        seen = {doc_id}
+        while chain[-1] in self.parents and self.parents[chain[-1]] not in seen:
+            chain.append(self.parents[chain[-1]])
+            seen.add(chain[-1])
+        return chain
+
+    def path(self, ancestor: str, descendant: str) -> list[str] | None:
+        lineage = self.lineage(descendant)
+        if ancestor not in lineage:
+            return None
+        return lineage[: lineage.index(ancestor) + 1][::-1]
+
+    def edges(self) -> list[tuple[str, str]]:
+        return sorted((parent, child) for child, parent in self.parents.items())
+
+    def chains(self) -> list[list[str]]:
+        # Root-to-leaf paths, one per leaf version.
+        leaves = sorted(doc_id for doc_id in self.parents if doc_id not in self.children)
+        return [self.lineage(leaf)[::-1] for leaf in leaves]
+
+
+def compose(
+    old_clauses: Sequence[tuple[str, str]],
+    new_clauses: Sequence[tuple[str, str]],
+    steps: Sequence[Sequence[Sequence[Any]]],
+) -> list[dict[str, Any]]:
+    # Cumulative changes from an ancestor to a descendant, composed from the
+    # clause links of each pair along the path. No text is re-diffed: each
+    # ancestor clause is followed link by link, then only its first and last
+    # texts are compared by hash. Output matches diff_clauses' records.
+    current: dict[str, str | None] = {clause_id: clause_id for clause_id, _ in old_clauses}
+    moved: set[str] = set()
+    for links in steps:
+        forward = {old_id: (new_id, change_type) for old_id, new_id, change_type in links if old_id and new_id}
+        for origin, clause_id in current.items():
+            if clause_id is None:
+                continue
+            new_id, change_type = forward.get(clause_id, (None, None))
+            current[origin] = new_id
+            if change_type == "moved":
+                moved.add(origin)
+
+    old_texts = dict(old_clauses)
+    reached = {clause_id: origin for origin, clause_id in current.items() if clause_id is not None}
+    deltas: list[dict[str, Any]] = []
+
+    def delta(change_type: str, old_id: str | None, new_id: str | None, new_text: str, **extra: Any) -> dict[str, Any]:
+        return {
+            "change_type": change_type,
+            "old_clause_id": old_id,
+            "new_clause_id": new_id,
+            "old_text": old_texts[old_id] if old_id is not None else "",
+            "new_text": new_text,
+            **extra,
+        }
+
+    for new_id, new_text in new_clauses:
+        origin = reached.get(new_id)
+        if origin is None:
+            deltas.append(delta("added", None, new_id, new_text))
+        elif diff.clause_hash(old_texts[origin]) != diff.clause_hash(new_text):
+            score = diff.similarity(old_texts[origin], new_text)
+            deltas.append(delta("amended", origin, new_id, new_text, similarity=round(score, 4)))
+        elif origin in moved:
+            deltas.append(delta("moved", origin, new_id, new_text))
+    for origin, _ in old_clauses:
+        if current[origin] is None:
+            deltas.append(delta("repealed", origin, None, ""))
+    return deltas
+
+
+def cumulative_deltas(
+    graph: VersionGraph,
+    links: dict[tuple[str, str], list[list[Any]]],
+    clauses: dict[str, list[tuple[str, str]]],
+    ancestor: str,
+    descendant: str,
+) -> list[dict[str, Any]] | None:
+    # None when ``ancestor`` is not on ``descendant``'s lineage or an edge
+    # along the way has no links.
+    path = graph.path(ancestor, descendant)
+    if path is None:
+        return None
+    steps = [links.get(edge) for edge in zip(path, path[1:])]
+    if any(step is None for step in steps):
+        return None
+    return compose(clauses.get(ancestor, []), clauses.get(descendant, []), steps)  # type: ignore[arg-type]
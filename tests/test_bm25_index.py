@@ -0,0 +1,99 @@
+import random
+import unittest
+from array import array
+
+from regdelta.index.bm25 import BM25Index
+from regdelta.stages.retrieval import _tokenize
+
+
+SEGMENTS = [
+    {"segment_id": "doc_a:cl_1", "doc_id": "doc_a", "clause_id": "cl_1", "text": "Keep records and keep logs."},
+    {"segment_id": "doc_b:cl_1", "doc_id": "doc_b", "clause_id": "cl_1", "text": "Submit report within 15 days."},
+    {"segment_id": "doc_c:cl_1", "doc_id": "doc_c", "clause_id": "cl_1", "text": "Report incidents to the regulator."},
+]
+
+
+class BM25IndexTests(unittest.TestCase):
+    def test_builds_csr_postings_with_interned_terms(self) -> None:
+        index = BM25Index.build(SEGMENTS, tokenize=_tokenize)
+
+        self.assertEqual(index.segment_count, 3)
+        self.assertEqual(list(index.vocabulary), sorted(index.vocabulary))
+        self.assertIsInstance(index.postings_segments, array)
+        self.assertIsInstance(index.postings_freqs, array)
+        self.assertEqual(len(index.offsets), len(index.vocabulary) + 1)
+
+        keep_id = index.term_id("keep")
+        self.assertIsNotNone(keep_id)
+        self.assertEqual(index.document_frequency(keep_id), 1)
+        start = index.offsets[keep_id]
+        self.assertEqual(index.postings_freqs[start], 2)
+        self.assertEqual(index.document_frequency(index.term_id("report")), 2)
+        self.assertIsNone(index.term_id("missing"))
+
+    def test_scores_rare_terms_higher_and_tracks_overlap(self) -> None:
+        index = BM25Index.build(SEGMENTS, tokenize=_tokenize)
+        query_terms = {"report", "days"}
+
+        scores = index.score(index.term_ids(query_terms))
+
+        self.assertEqual(set(scores), {1, 2})
+        self.assertGreater(scores[1][0], scores[2][0])
+        self.assertEqual(scores[1][1], 2)
+        self.assertAlmostEqual(index.jaccard(1, 2, len(query_terms)), 2 / 5)
+
+    def test_duplicate_segment_ids_keep_last_text(self) -> None:
+        segments = SEGMENTS + [{"segment_id": "doc_a:cl_1", "doc_id": "doc_a", "clause_id": "cl_1", "text": "Archive"}]
+        index = BM25Index.build(segments, tokenize=_tokenize)
+
+        self.assertEqual(index.segment_count, 3)
+        self.assertEqual(index.segments[0]["text"], "Archive")
+        self.assertIsNone(index.term_id("keep"))
+
+    def test_maxscore_search_matches_exhaustive_ranking(self) -> None:
+        rng = random.Random(7)
+        words = [f"w{idx}" for idx in range(40)]
+        segments = [
+            {
+                "segment_id": f"doc_{idx}:cl_1",
+                "doc_id": f"doc_{idx}",
+                "clause_id": "cl_1",
+                "text": " ".join(rng.choice(words[: rng.randint(5, 40)]) for _ in range(rng.randint(3, 30))),
+            }
+            for idx in range(300)
+        ]
+        index = BM25Index.build(segments, tokenize=_tokenize)
+
+        for _ in range(50):
+            query_terms = set(rng.sample(words, rng.randint(1, 12)))
+            term_ids = index.term_ids(query_terms)
+            exhaustive = sorted(
+                (
+                    (score, index.jaccard(ordinal, int(matched), len(query_terms)), index.segment_ids[ordinal], ordinal)
+                    for ordinal, (score, matched) in index.score(term_ids).items()
+                ),
+                reverse=True,
+            )
+            for k in (1, 3, 10):
+                self.assertEqual(index.search(term_ids, len(query_terms), k), exhaustive[:k])
+
+    def test_batch_search_matches_per_query_search(self) -> None:
+        rng = random.Random(11)
+        words = [f"w{idx}" for idx in range(30)]
+        segments = [
+            {"segment_id": f"doc_{idx}:cl_1", "text": " ".join(rng.choices(words, k=rng.randint(2, 20)))}
+            for idx in range(200)
+        ]
+        index = BM25Index.build(segments, tokenize=_tokenize)
+        queries = []
+        for _ in range(25):
+            query_terms = set(rng.sample(words, rng.randint(1, 8))) | {"unknown"}
+            queries.append((index.term_ids(query_terms), len(query_terms)))
+
+        batched = index.search_batch(queries, 5)
+
+        self.assertEqual(batched, [index.search(term_ids, count, 5) for term_ids, count in queries])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from regdelta.cache import LRUCache, cache_key
+
+
+class LRUCacheTests(unittest.TestCase):
+    def test_round_trips_values_and_counts_hits(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "cache" / "results.sqlite"
+            with LRUCache(path) as cache:
+                cache.put("a", [{"segment_id": "doc_a:cl_1", "score": 1.25, "text": "Lưu trữ"}])
+                self.assertEqual(cache.get("a"), [{"segment_id": "doc_a:cl_1", "score": 1.25, "text": "Lưu trữ"}])
+                self.assertIsNone(cache.get("b"))
+                self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+            with LRUCache(path) as reopened:
+                found = reopened.get_many(["a", "a", "c"])
+                self.assertEqual(list(found), ["a"])
+                self.assertEqual((reopened.hits, reopened.misses), (1, 1))
+
+    def test_evicts_least_recently_used_entries(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with LRUCache(Path(tmp_dir) / "lru.sqlite", max_entries=2) as cache:
+                cache.put("a", 1)
+                cache.put("b", 2)
+                cache.get("a")
+                cache.put("c", 3)
+                self.assertEqual(cache.get_many(["a", "b", "c"]), {"a": 1, "c": 3})
+                self.assertEqual(cache.evictions, 1)
+
+    def test_evicts_to_stay_within_byte_budget(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with LRUCache(Path(tmp_dir) / "lru.sqlite", max_bytes=250) as cache:
+                for idx in range(5):
+                    cache.put(f"k{idx}", "x" * 100)
+                stats = cache.stats()
+                self.assertLessEqual(stats["bytes"], 250)
+                self.assertEqual(stats["entries"], 2)
+                self.assertEqual(sorted(cache.get_many([f"k{idx}" for idx in range(5)])), ["k3", "k4"])
+
+    def test_cache_key_is_stable_and_order_sensitive(self) -> None:
+        self.assertEqual(cache_key("q", {"top_k": 4, "mode": "lexical"}), cache_key("q", {"mode": "lexical", "top_k": 4}))
+        self.assertNotEqual(cache_key("q", 1), cache_key(1, "q"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from regdelta import codec
+
+
+class CodecTests(unittest.TestCase):
+    def test_round_trips_unicode_and_nested_values(self) -> None:
+        payload = {"doc_id": "doc_1", "text": "Điều 1. Sửa đổi.", "scores": [1.5, 0, None], "ok": True}
+        encoded = codec.dumpb(payload)
+        self.assertIn("Điều".encode("utf-8"), encoded)
+        self.assertEqual(codec.loads(encoded), payload)
+        self.assertEqual(codec.loads(codec.dumps(payload)), payload)
+        self.assertEqual(json.loads(encoded), payload)
+
+    def test_output_is_compact_unless_pretty_is_requested(self) -> None:
+        payload = {"b": 1, "a": [1, 2]}
+        self.assertNotIn("\n", codec.dumps(payload))
+        self.assertEqual(codec.dumps(payload, sort_keys=True), '{"a":[1,2],"b":1}')
+        pretty = codec.dumps(payload, pretty=True)
+        self.assertIn('\n  "b": 1', pretty)
+        self.assertEqual(json.loads(pretty), payload)
+
+    def test_load_artifact_only_returns_objects(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            obj_path = codec.write(Path(tmp_dir) / "obj.json", {"status": "ok"})
+            list_path = codec.write_atomic(Path(tmp_dir) / "list.json", [1, 2])
+            self.assertEqual(codec.load_artifact(str(obj_path)), {"status": "ok"})
+            self.assertIsNone(codec.load_artifact(str(list_path)))
+            self.assertIsNone(codec.load_artifact(str(Path(tmp_dir) / "missing.json")))
+            self.assertIsNone(codec.load_artifact(None))
+            self.assertEqual(len(list(Path(tmp_dir).iterdir())), 2)
+
+    def test_decode_errors_are_value_errors(self) -> None:
+        with self.assertRaises(codec.DecodeError):
+            codec.loads(b'{"doc_id": ')
+        self.assertTrue(issubclass(codec.DecodeError, ValueError))
+
+    def test_pretty_output_follows_runtime_flag(self) -> None:
+        self.assertFalse(codec.pretty_output({}))
+        self.assertTrue(codec.pretty_output({"runtime": {"pretty_json": True}}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import gzip
+import tempfile
+import unittest
+from pathlib import Path
+
+from regdelta import compression
+
+
+class CompressionTests(unittest.TestCase):
+    def test_round_trips_each_stdlib_codec(self) -> None:
+        lines = [f'{{"doc_id": "doc_{idx}", "text": "Điều {idx}."}}\n' for idx in range(2000)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for codec in ("gzip", "bz2", "xz"):
+                path = Path(tmp_dir) / f"documents.jsonl{compression.suffix(codec)}"
+                with compression.open_text(path, "w") as f:
+                    f.writelines(lines)
+                self.assertEqual(compression.detect(path), codec)
+                with compression.open_text(path) as f:
+                    self.assertEqual(f.readlines(), lines)
+
+    def test_detects_codec_from_magic_bytes_without_extension(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "snapshot.jsonl"
+            path.write_bytes(gzip.compress(b"line one\nline two\n"))
+            self.assertEqual(compression.detect(path), "gzip")
+            with compression.open_binary(path) as f:
+                self.assertEqual(f.readline(), b"line one\n")
+                self.assertEqual(f.read(), b"line two\n")
+
+            plain = Path(tmp_dir) / "plain.jsonl"
+            plain.write_text("{}\n", encoding="utf-8")
+            self.assertIsNone(compression.detect(plain))
+
+    def test_threaded_reader_can_be_closed_early(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "large.gz"
+            path.write_bytes(gzip.compress(b"x" * (8 << 20)))
+            f = compression.open_binary(path)
+            self.assertEqual(f.read(10), b"x" * 10)
+            f.close()
+            self.assertTrue(f.closed)
+
+    def test_rejects_unknown_codec_names(self) -> None:
+        with self.assertRaises(ValueError):
+            compression.suffix("lz4")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from regdelta import dedup
+
+
+def _tokens(text: str) -> list[str]:
+    return text.lower().split()
+
+
+BASE = (
+    "Doanh nghiệp có trách nhiệm nộp báo cáo tài chính năm cho cơ quan thuế quản lý trực tiếp "
+    "chậm nhất là ngày thứ chín mươi kể từ ngày kết thúc năm tài chính và lưu trữ hồ sơ kế toán"
+)
+
+
+class NearDuplicateIndexTests(unittest.TestCase):
+    def test_clusters_near_copies_and_keeps_distinct_texts(self) -> None:
+        index = dedup.NearDuplicateIndex(threshold=0.8)
+        self.assertIsNone(index.add("a", _tokens(BASE)))
+        self.assertEqual(index.add("b", _tokens(BASE + " theo quy định")), "a")
+        self.assertEqual(index.add("c", _tokens(BASE)), "a")
+        self.assertIsNone(index.add("d", _tokens("Tổ chức tín dụng thông báo sự cố dữ liệu trong 72 giờ")))
+        self.assertEqual(index.duplicate_clusters(), [{"canonical": "a", "duplicates": ["b", "c"]}])
+        self.assertEqual(index.canonical_of, {"b": "a", "c": "a"})
+
+    def test_protected_items_stay_canonical(self) -> None:
+        index = dedup.NearDuplicateIndex()
+        index.add("a", _tokens(BASE))
+        self.assertIsNone(index.add("b", _tokens(BASE), allow_duplicate=False))
+        self.assertEqual(index.duplicate_clusters(), [])
+
+    def test_verbatim_boilerplate_skips_candidate_comparisons(self) -> None:
+        index = dedup.NearDuplicateIndex()
+        for idx in range(500):
+            index.add(f"s{idx}", _tokens("Điều khoản thi hành. Nghị định này có hiệu lực kể từ ngày ký."))
+        self.assertEqual(len(index.duplicate_clusters()[0]["duplicates"]), 499)
+        self.assertEqual(index.comparisons, 0)
+
+        for idx in range(200):
+            index.add(f"v{idx}", _tokens(f"Điều khoản thi hành. Nghị định này có hiệu lực kể từ ngày ký. {idx}"))
+        # Joined duplicates never enter the buckets, so each variant meets only the canonical.
+        self.assertEqual(len(index.duplicate_clusters()[0]["duplicates"]), 699)
+        self.assertEqual(index.comparisons, 200)
+
+    def test_signatures_are_deterministic(self) -> None:
+        hashes = dedup.shingles(_tokens(BASE))
+        self.assertEqual(dedup.MinHasher(seed=3).signature(hashes), dedup.MinHasher(seed=3).signature(hashes))
+        self.assertEqual(len(dedup.shingles(["một", "hai"])), 1)
+        with self.assertRaises(ValueError):
+            dedup.NearDuplicateIndex(num_perm=64, bands=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
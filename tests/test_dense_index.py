@@ -0,0 +1,95 @@
+import math
+import tempfile
+import unittest
+from pathlib import Path
+
+from regdelta.index import dense
+
+
+TEXTS = [
+    "Doanh nghiệp nộp báo cáo thuế trong 15 ngày.",
+    "Submit the annual tax report within 15 days.",
+    "Keep accounting records for ten years.",
+    "Notify the regulator about data incidents.",
+    "Renew the business license every five years.",
+    "Tax reports are due within fifteen days.",
+]
+
+
+class DenseIndexTests(unittest.TestCase):
+    def test_hashing_embedder_is_deterministic_and_normalised(self) -> None:
+        first = dense.HashingEmbedder(dimension=64).embed(TEXTS)
+        second = dense.HashingEmbedder(dimension=64).embed(TEXTS)
+
+        self.assertEqual([list(vector) for vector in first], [list(vector) for vector in second])
+        for vector in first:
+            self.assertEqual(len(vector), 64)
+            self.assertAlmostEqual(math.sqrt(sum(value * value for value in vector)), 1.0, places=5)
+
+    def test_full_probe_matches_exact_search(self) -> None:
+        embedder = dense.HashingEmbedder(dimension=64)
+        vectors = embedder.embed(TEXTS)
+        index = dense.DenseIndex.build(vectors, dimension=64, nlist=3, seed=1)
+        query = embedder.embed(["tax report due in 15 days"])[0]
+
+        exact = sorted(
+            ((sum(a * b for a, b in zip(query, vector)), ordinal) for ordinal, vector in enumerate(vectors)),
+            key=lambda item: (item[0], -item[1]),
+            reverse=True,
+        )
+        hits = index.search(query, 3, nprobe=index.nlist)
+
+        self.assertEqual([ordinal for _, ordinal in hits], [ordinal for _, ordinal in exact[:3]])
+        self.assertIn(hits[0][1], {1, 5})
+
+    def test_int8_index_roundtrips_through_disk(self) -> None:
+        embedder = dense.HashingEmbedder(dimension=32)
+        vectors = embedder.embed(TEXTS)
+        built = dense.DenseIndex.build(vectors, dimension=32, nlist=2, quantization="int8")
+        query = embedder.embed(["business license renewal"])[0]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = dense.write_index(built, Path(tmp_dir) / "dense.vec")
+            opened = dense.open_index(path)
+
+            self.assertEqual(opened.quantization, "int8")
+            self.assertEqual(opened.count, len(TEXTS))
+            self.assertEqual(opened.search(query, 2, nprobe=2), built.search(query, 2, nprobe=2))
+
+    def test_trains_on_a_sample_and_assigns_every_vector(self) -> None:
+        embedder = dense.HashingEmbedder(dimension=32)
+        vectors = embedder.embed([f"{text} {idx}" for idx in range(20) for text in TEXTS])
+        index = dense.DenseIndex.build(vectors, dimension=32, nlist=4, train_sample=10)
+
+        self.assertEqual(index.nlist, 4)
+        self.assertEqual(sorted(index.list_members), list(range(len(vectors))))
+
+    def test_persisted_centroids_skip_training(self) -> None:
+        embedder = dense.HashingEmbedder(dimension=32)
+        vectors = embedder.embed(TEXTS)
+        first = dense.DenseIndex.build(vectors, dimension=32, nlist=2, seed=3)
+        grown = dense.DenseIndex.build(
+            vectors + embedder.embed(["Tax report filing deadline."]),
+            dimension=32,
+            seed=99,
+            centroids=first.centroids,
+        )
+
+        self.assertEqual(list(grown.centroids), list(first.centroids))
+        self.assertEqual(grown.count, len(TEXTS) + 1)
+        query = embedder.embed(["keep records"])[0]
+        self.assertEqual(grown.search(query, 2, nprobe=2)[:1], first.search(query, 1, nprobe=2))
+
+    def test_reciprocal_rank_fusion_rewards_agreement(self) -> None:
+        fused = dense.reciprocal_rank_fusion([[3, 1, 2], [1, 4]], k=60)
+
+        self.assertEqual(max(fused, key=fused.get), 1)
+        self.assertAlmostEqual(fused[4], 1 / 62)
+
+    def test_unknown_embedder_is_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            dense.build_embedder("missing", 16)
+
+
+if __name__ == "__main__":
+    unittest.main()
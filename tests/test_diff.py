@@ -0,0 +1,80 @@
+import unittest
+
+from regdelta import diff
+
+
+def _clauses(texts: list[str]) -> list[tuple[str, str]]:
+    return [(f"cl_{idx}", text) for idx, text in enumerate(texts, start=1)]
+
+
+OLD = [
+    "Điều 1. Phạm vi điều chỉnh của nghị định.",
+    "Điều 2. Doanh nghiệp nộp báo cáo trong 30 ngày.",
+    "Điều 3. Hồ sơ được lưu trữ mười năm.",
+    "Điều 4. Cơ quan thuế kiểm tra định kỳ.",
+    "Điều 5. Nghị định có hiệu lực từ ngày ký.",
+]
+
+
+class ClauseDiffTests(unittest.TestCase):
+    def test_inserted_clause_does_not_shift_later_clauses(self) -> None:
+        new = OLD[:1] + ["Điều 1a. Đối tượng áp dụng mới."] + OLD[1:]
+        deltas = diff.diff_clauses(_clauses(OLD), _clauses(new))
+        self.assertEqual(len(deltas), 1)
+        self.assertEqual(deltas[0]["change_type"], "added")
+        self.assertEqual(deltas[0]["new_clause_id"], "cl_2")
+        self.assertIsNone(deltas[0]["old_clause_id"])
+
+    def test_amended_repealed_and_moved_clauses(self) -> None:
+        new = [
+            OLD[0],
+            "Điều 2. Doanh nghiệp nộp báo cáo trong 15 ngày.",
+            OLD[3],
+            OLD[4],
+            OLD[2],
+        ]
+        deltas = diff.diff_clauses(_clauses(OLD), _clauses(new))
+        by_type = {delta["change_type"]: delta for delta in deltas}
+        self.assertEqual(sorted(by_type), ["amended", "moved"])
+        self.assertEqual((by_type["amended"]["old_clause_id"], by_type["amended"]["new_clause_id"]), ("cl_2", "cl_2"))
+        self.assertGreater(by_type["amended"]["similarity"], 0.5)
+        self.assertEqual((by_type["moved"]["old_clause_id"], by_type["moved"]["new_clause_id"]), ("cl_3", "cl_5"))
+
+        deltas = diff.diff_clauses(_clauses(OLD), _clauses([OLD[0], OLD[1], OLD[4]]))
+        self.assertEqual([(d["change_type"], d["old_clause_id"]) for d in deltas], [("repealed", "cl_3"), ("repealed", "cl_4")])
+
+    def test_unrelated_replacement_is_repeal_plus_addition(self) -> None:
+        deltas = diff.diff_clauses(_clauses(["Điều 1. Thuế suất 10%."]), _clauses(["Phụ lục mẫu tờ khai."]))
+        self.assertEqual([delta["change_type"] for delta in deltas], ["added", "repealed"])
+
+    def test_align_matches_repeated_lines_with_myers(self) -> None:
+        old = list("abcabba")
+        new = list("cbabac")
+        matches = diff.align(old, new)
+        self.assertEqual(len(matches), 4)
+        self.assertTrue(all(old[i] == new[j] for i, j in matches))
+        self.assertEqual(matches, sorted(matches))
+        # Whitespace-only differences hash identically.
+        self.assertEqual(diff.clause_hash("Điều  1.\nA"), diff.clause_hash("Điều 1. A"))
+
+    def test_word_spans_carry_token_and_character_ranges(self) -> None:
+        old = "Điều 2. Nộp báo cáo trong 30 ngày."
+        new = "Điều 2. Doanh nghiệp nộp báo cáo trong 15 ngày làm việc."
+        spans = diff.word_spans(old, new)
+        self.assertEqual([span["op"] for span in spans], ["replace", "replace", "insert"])
+        for span in spans:
+            self.assertEqual(old[span["old_start"] : span["old_end"]], span["old"])
+            self.assertEqual(new[span["new_start"] : span["new_end"]], span["new"])
+        self.assertEqual((spans[1]["old"], spans[1]["new"]), ("30", "15"))
+        self.assertEqual(spans[2]["old_start"], old.index(".", old.index("ngày")))
+
+        self.assertEqual(diff.span_query(new, spans, "new"), "Doanh nghiệp nộp 15 làm việc")
+        self.assertEqual(diff.span_query(new, spans, "new", context_tokens=1), ". Doanh nghiệp nộp báo trong 15 ngày làm việc .")
+        deletion = diff.word_spans("Nộp trong 30 ngày làm việc.", "Nộp trong 30 ngày.")
+        self.assertEqual([span["op"] for span in deletion], ["delete"])
+        self.assertEqual(diff.span_query("Nộp trong 30 ngày.", deletion, "new"), "")
+        self.assertEqual(diff.span_query("Nộp trong 30 ngày làm việc.", deletion, "old"), "làm việc")
+
+
+if __name__ == "__main__":
+    unittest.main()
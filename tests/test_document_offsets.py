@@ -0,0 +1,75 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from regdelta.index import offsets
+
+
+class DocumentOffsetTests(unittest.TestCase):
+    def _write_sorted(self, path: Path, documents: list[dict]) -> Path:
+        writer = offsets.OffsetIndexWriter()
+        with path.open("wb") as f:
+            for document in documents:
+                line = (json.dumps(document, ensure_ascii=False) + "\n").encode("utf-8")
+                f.write(line)
+                writer.add(document["doc_id"], len(line))
+        return writer.write(offsets.index_path_for(path))
+
+    def test_reader_fetches_single_documents_by_doc_id(self) -> None:
+        documents = [{"doc_id": f"doc_{idx:04d}", "text": f"Điều {idx}. Nội dung."} for idx in range(500)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "documents.jsonl"
+            index_path = self._write_sorted(path, documents)
+            self.assertEqual(index_path.name, "documents.jsonl.idx")
+
+            reader = offsets.DocumentReader(path)
+            self.assertEqual(len(reader), 500)
+            self.assertEqual(reader.get("doc_0000"), documents[0])
+            self.assertEqual(reader.get("doc_0321"), documents[321])
+            self.assertEqual(reader.get("doc_0499"), documents[-1])
+            self.assertIsNone(reader.get("doc_0500"))
+            self.assertIsNone(reader.get("doc_"))
+            self.assertIn("doc_0042", reader)
+            self.assertEqual(list(reader.get_many(["doc_0002", "missing", "doc_0001"])), ["doc_0001", "doc_0002"])
+            self.assertEqual(list(reader.doc_ids())[:2], ["doc_0000", "doc_0001"])
+
+    def test_writer_rejects_unsorted_doc_ids(self) -> None:
+        writer = offsets.OffsetIndexWriter()
+        writer.add("doc_b", 10)
+        with self.assertRaises(ValueError):
+            writer.add("doc_a", 10)
+        with self.assertRaises(ValueError):
+            writer.add("doc_b", 10)
+
+    def test_builds_index_for_unsorted_files_and_detects_stale_indices(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "documents.jsonl"
+            path.write_text(
+                '{"doc_id": "doc_b", "text": "old"}\n'
+                "\n"
+                '{"doc_id": "doc_a", "text": "A"}\n'
+                '{"doc_id": "doc_b", "text": "new"}\n',
+                encoding="utf-8",
+            )
+            offsets.build_offset_index(path)
+            reader = offsets.DocumentReader(path)
+            self.assertEqual(list(reader.doc_ids()), ["doc_a", "doc_b"])
+            self.assertEqual(reader.get("doc_b")["text"], "new")
+
+            with path.open("a", encoding="utf-8") as f:
+                f.write('{"doc_id": "doc_c", "text": "C"}\n')
+            with self.assertRaises(ValueError):
+                offsets.DocumentReader(path)
+
+    def test_empty_documents_file(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "documents.jsonl"
+            self._write_sorted(path, [])
+            reader = offsets.DocumentReader(path)
+            self.assertEqual(len(reader), 0)
+            self.assertIsNone(reader.get("doc_a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import random
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from regdelta import external_sort
+from regdelta.external_sort import ExternalSorter
+
+
+class ExternalSorterTests(unittest.TestCase):
+    def test_spilled_runs_merge_in_key_then_arrival_order(self) -> None:
+        rng = random.Random(7)
+        items = [(f"doc_{rng.randrange(50):03d}", seq, f"payload {seq} ồ") for seq in range(500)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with ExternalSorter(4096, spill_dir=Path(tmp_dir)) as sorter:
+                for item in items:
+                    sorter.add(*item)
+                self.assertGreater(sorter.spill_count, 1)
+                self.assertEqual(list(sorter.sorted_items()), sorted(items))
+            self.assertEqual(list(Path(tmp_dir).iterdir()), [])
+
+    def test_merges_in_passes_when_runs_exceed_fanin(self) -> None:
+        items = [(f"k{seq % 7}", seq, "x" * 10) for seq in range(40)]
+        with tempfile.TemporaryDirectory() as tmp_dir, mock.patch.object(external_sort, "_MAX_FANIN", 3):
+            with ExternalSorter(1, spill_dir=Path(tmp_dir)) as sorter:
+                for item in items:
+                    sorter.add(*item)
+                self.assertEqual(sorter.spill_count, 40)
+                self.assertEqual(list(sorter.sorted_items()), sorted(items))
+
+    def test_stays_in_memory_within_budget(self) -> None:
+        with ExternalSorter(1 << 20) as sorter:
+            sorter.add("b", 0, "{}")
+            sorter.add("a", 1, "{}")
+            self.assertEqual(sorter.spill_count, 0)
+            self.assertEqual([key for key, _, _ in sorter.sorted_items()], ["a", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
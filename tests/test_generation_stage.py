@@ -1,11 +1,118 @@
 import json
 import tempfile
+import threading
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
+from regdelta.index import offsets
 from regdelta.stages.generation import run_generation
 
 
+class _StubCompletions(BaseHTTPRequestHandler):
+    # OpenAI-compatible /chat/completions stub: answers every claim in the
+    # batch, after failing the first `fail_first` requests with `fail_status`:
+    # an HTTP status, "malformed" (a 200 with a bad choices list) or
+    # "truncated" (a 200 whose body is cut short). With `rogue_claim_id` set,
+    # every reply that was not asked for that claim also answers it.
+
+    def do_POST(self) -> None:
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:  # type: ignore[attr-defined]
+            server.bodies.append(body)  # type: ignore[attr-defined]
+            failing = len(server.bodies) <= server.fail_first  # type: ignore[attr-defined]
+        fail_status = server.fail_status  # type: ignore[attr-defined]
+        if failing and isinstance(fail_status, int):
+            self.send_response(fail_status)
+            self.end_headers()
+            return
+        if failing:
+            reply = json.dumps({"choices": ["not an object"]}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(reply) + (100 if fail_status == "truncated" else 0)))
+            self.end_headers()
+            self.wfile.write(reply)
+            self.close_connection = True
+            return
+
+        claims = json.loads(body["messages"][-1]["content"])["claims"]
+        content = {"claims": [{"claim_id": c["claim_id"], "statement": f"LLM {c['claim_id']}"} for c in claims]}
+        rogue = server.rogue_claim_id  # type: ignore[attr-defined]
+        if rogue and rogue not in {c["claim_id"] for c in claims}:
+            content["claims"].append({"claim_id": rogue, "statement": "Rogue statement"})
+        reply = json.dumps(
+            {
+                "choices": [{"message": {"role": "assistant", "content": json.dumps(content)}}],
+                "usage": {"prompt_tokens": 50, "completion_tokens": 10 * len(claims)},
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+def _stub_server(fail_first: int = 0, fail_status: int | str = 503) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubCompletions)
+    server.lock = threading.Lock()  # type: ignore[attr-defined]
+    server.bodies = []  # type: ignore[attr-defined]
+    server.fail_first = fail_first  # type: ignore[attr-defined]
+    server.fail_status = fail_status  # type: ignore[attr-defined]
+    server.rogue_claim_id = None  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _llm_context(run_dir: Path, port: int) -> dict:
+    deltas_path = run_dir / "processing" / "deltas.json"
+    deltas_path.parent.mkdir(parents=True, exist_ok=True)
+    deltas_path.write_text(
+        json.dumps(
+            {
+                "status": "ok",
+                "deltas": [
+                    {
+                        "old_doc_id": "doc_old",
+                        "new_doc_id": "doc_new",
+                        "change_type": "amended",
+                        "clause_id": f"cl_{idx}",
+                        "old_text": f"Thời hạn {idx} ngày.",
+                        "new_text": f"Thời hạn {idx + 10} ngày.",
+                    }
+                    for idx in range(1, 4)
+                ],
+            }
+        ),
+        encoding="utf-8",
+    )
+    return {
+        "config": {
+            "runtime": {"max_workers": 2},
+            "models": {"generator_model": "stub-model"},
+            "generation": {
+                "schema_version": "compliance_pack_v1",
+                "temperature": 0.1,
+                "max_new_tokens": 256,
+                "backend": "llm",
+                "llm": {
+                    "base_url": f"http://127.0.0.1:{port}/v1",
+                    "batch_size": 2,
+                    "max_retries": 2,
+                    "backoff_seconds": 0.01,
+                    "timeout_seconds": 5,
+                },
+            },
+        },
+        "run_dir": run_dir,
+        "artifacts": {"processing": {"deltas": str(deltas_path)}},
+    }
+
+
 class GenerationStageTests(unittest.TestCase):
     def test_generation_builds_schema_enforced_claims(self) -> None:
         with tempfile.TemporaryDirectory() as tmp_dir:
@@ -80,6 +187,44 @@ class GenerationStageTests(unittest.TestCase):
             self.assertEqual(payload["claims"][0]["claim_id"], "claim_001")
             self.assertTrue(payload["claims"][0]["citations"])
 
+    def test_effective_dates_are_read_from_documents_by_doc_id(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            run_dir = Path(tmp_dir) / "run"
+            documents_path = run_dir / "ingestion" / "documents.jsonl"
+            documents_path.parent.mkdir(parents=True)
+            documents = [
+                {"doc_id": "doc_new", "effective_date": "2026-07-01", "text": "..."},
+                {"doc_id": "doc_old", "effective_date": "2025-01-01", "text": "..."},
+                {"doc_id": "doc_other", "effective_date": "2026-09-15", "text": "..."},
+            ]
+            documents_path.write_text("".join(json.dumps(doc) + "\n" for doc in documents), encoding="utf-8")
+            index_path = offsets.build_offset_index(documents_path)
+
+            deltas_path = run_dir / "processing" / "deltas.json"
+            deltas_path.parent.mkdir(parents=True)
+            deltas_path.write_text(
+                json.dumps(
+                    {
+                        "deltas": [
+                            {"old_doc_id": "doc_old", "new_doc_id": "doc_new", "change_type": "amended", "clause_id": "cl_1"},
+                            {"new_doc_id": "doc_x", "change_type": "added", "clause_id": "cl_1", "effective_date": "2026-01-01"},
+                        ]
+                    }
+                ),
+                encoding="utf-8",
+            )
+            context = {
+                "config": {"generation": {"schema_version": "compliance_pack_v1"}},
+                "run_dir": run_dir,
+                "artifacts": {
+                    "ingestion": {"documents": str(documents_path), "documents_index": str(index_path)},
+                    "processing": {"deltas": str(deltas_path)},
+                },
+            }
+
+            payload = json.loads(Path(run_generation(context)["compliance_pack_draft"]).read_text(encoding="utf-8"))
+            self.assertEqual(payload["effective_dates"], ["2026-01-01", "2026-07-01"])
+
     def test_generation_handles_missing_upstream_artifacts(self) -> None:
         with tempfile.TemporaryDirectory() as tmp_dir:
             run_dir = Path(tmp_dir) / "artifacts" / "logs" / "runs" / "run_2"
@@ -97,6 +242,127 @@ class GenerationStageTests(unittest.TestCase):
             self.assertEqual(payload["claims"][0]["change_type"], "none")
             self.assertGreaterEqual(len(payload["warnings"]), 1)
 
+    def test_llm_backend_batches_claims_and_retries(self) -> None:
+        server = _stub_server(fail_first=1)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            context = _llm_context(Path(tmp_dir) / "run", server.server_address[1])
+            result = run_generation(context)
+            payload = json.loads(Path(result["compliance_pack_draft"]).read_text(encoding="utf-8"))
+
+        self.assertEqual([claim["statement"] for claim in payload["claims"]], ["LLM claim_001", "LLM claim_002", "LLM claim_003"])
+        self.assertEqual({claim["statement_source"] for claim in payload["claims"]}, {"llm"})
+
+        # Two micro-batches (2 + 1 claims), one of them retried after a 503.
+        self.assertEqual(len(server.bodies), 3)  # type: ignore[attr-defined]
+        body = server.bodies[-1]  # type: ignore[attr-defined]
+        self.assertEqual((body["model"], body["max_tokens"], body["temperature"]), ("stub-model", 256, 0.1))
+        self.assertIn("Thời hạn", body["messages"][-1]["content"])
+
+        execution = payload["execution"]
+        self.assertEqual(execution["backend"], "llm")
+        self.assertEqual((execution["request_count"], execution["failed_requests"], execution["concurrency"]), (2, 0, 2))
+        self.assertEqual(sorted(stats["claim_count"] for stats in execution["requests"]), [1, 2])
+        self.assertEqual(sum(stats["attempts"] for stats in execution["requests"]), 3)
+        self.assertEqual(execution["completion_tokens"], 30)
+        self.assertTrue(all(stats["tokens_per_second"] for stats in execution["requests"]))
+        self.assertEqual(payload["warnings"], ["No retrieval candidates artifact found. Citations may be empty."])
+
+    def test_llm_backend_falls_back_to_templates_on_client_errors(self) -> None:
+        server = _stub_server(fail_first=100, fail_status=400)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            context = _llm_context(Path(tmp_dir) / "run", server.server_address[1])
+            payload = json.loads(Path(run_generation(context)["compliance_pack_draft"]).read_text(encoding="utf-8"))
+
+        # 400 is not retried.
+        self.assertEqual(len(server.bodies), 2)  # type: ignore[attr-defined]
+        self.assertEqual(payload["claims"][0]["statement"], "Clause cl_1 changed from doc_old to doc_new")
+        self.assertEqual({claim["statement_source"] for claim in payload["claims"]}, {"template"})
+        self.assertEqual(payload["execution"]["failed_requests"], 2)
+        self.assertIn("2 of 2 generation request(s) failed.", payload["warnings"])
+
+    def test_llm_backend_retries_malformed_and_truncated_responses(self) -> None:
+        for fail_status in ("malformed", "truncated"):
+            with self.subTest(fail_status=fail_status):
+                server = _stub_server(fail_first=2, fail_status=fail_status)
+                self.addCleanup(server.server_close)
+                self.addCleanup(server.shutdown)
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    context = _llm_context(Path(tmp_dir) / "run", server.server_address[1])
+                    context["config"]["generation"]["llm"]["batch_size"] = 3
+                    payload = json.loads(Path(run_generation(context)["compliance_pack_draft"]).read_text(encoding="utf-8"))
+
+                self.assertEqual(payload["execution"]["requests"][0]["attempts"], 3)
+                self.assertEqual({claim["statement_source"] for claim in payload["claims"]}, {"llm"})
+
+                # Past max_retries the batch falls back to templates instead of
+                # failing the stage.
+                server = _stub_server(fail_first=100, fail_status=fail_status)
+                self.addCleanup(server.server_close)
+                self.addCleanup(server.shutdown)
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    context = _llm_context(Path(tmp_dir) / "run", server.server_address[1])
+                    payload = json.loads(Path(run_generation(context)["compliance_pack_draft"]).read_text(encoding="utf-8"))
+                self.assertEqual(payload["execution"]["failed_requests"], 2)
+                self.assertEqual({claim["statement_source"] for claim in payload["claims"]}, {"template"})
+
+    def test_replies_only_set_claims_their_batch_asked_for(self) -> None:
+        server = _stub_server()
+        server.rogue_claim_id = "claim_001"  # type: ignore[attr-defined]
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            context = _llm_context(Path(tmp_dir) / "run", server.server_address[1])
+            payload = json.loads(Path(run_generation(context)["compliance_pack_draft"]).read_text(encoding="utf-8"))
+
+        # The second batch (claim_003) also answers claim_001; that answer is dropped.
+        self.assertEqual([claim["statement"] for claim in payload["claims"]], ["LLM claim_001", "LLM claim_002", "LLM claim_003"])
+        self.assertEqual([stats["unrequested_claims"] for stats in payload["execution"]["requests"]], [0, 1])
+
+    def test_llm_output_is_reused_from_generation_cache(self) -> None:
+        server = _stub_server()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+
+            def run(run_name: str, **generation: object) -> dict:
+                context = _llm_context(repo_root / run_name, server.server_address[1])
+                context["repo_root"] = repo_root
+                context["config"]["paths"] = {"data_interim": "data/interim"}
+                context["config"]["generation"].update(generation)
+                return json.loads(Path(run_generation(context)["compliance_pack_draft"]).read_text(encoding="utf-8"))
+
+            first = run("run_1")
+            second = run("run_2")
+            warmer = run("run_3", temperature=0.7)
+            shorter = run("run_4", max_new_tokens=64)
+            uncached = run("run_5", cache={"enabled": False})
+
+        self.assertEqual(first["execution"]["cache"]["misses"], 3)
+        self.assertEqual(first["execution"]["cache"]["entries"], 3)
+
+        # Same model settings and prompt inputs: no requests at all.
+        self.assertEqual(second["execution"]["request_count"], 0)
+        self.assertEqual(second["execution"]["cache"]["hits"], 3)
+        self.assertEqual(
+            [claim["statement"] for claim in second["claims"]],
+            [claim["statement"] for claim in first["claims"]],
+        )
+        self.assertEqual({claim["statement_source"] for claim in second["claims"]}, {"cache"})
+
+        # Temperature and the token limit are part of the key; the opt-out
+        # bypasses the cache.
+        self.assertEqual(warmer["execution"]["cache"]["hits"], 0)
+        self.assertEqual(warmer["execution"]["request_count"], 2)
+        self.assertEqual(shorter["execution"]["cache"]["hits"], 0)
+        self.assertEqual(uncached["execution"]["cache"], {"enabled": False})
+        self.assertEqual(uncached["execution"]["request_count"], 2)
+        self.assertEqual(len(server.bodies), 8)  # type: ignore[attr-defined]
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,83 @@
+import gzip
+import tempfile
+import unittest
+from pathlib import Path
+
+from regdelta.connectors import html
+
+
+PAGE = """<!DOCTYPE html>
+<html lang="vi">
+<head>
+  <title>Cổng thông tin | Thông tư 15/2024</title>
+  <meta name="issuer" content="Bộ Tài chính">
+  <meta name="dc.date.issued" content="05/03/2024">
+  <meta name="effective_date" content="2024-04-20">
+  <link rel="canonical" href="https://portal.example/tt-15-2024">
+  <script>var tracking = "Điều giả";</script>
+</head>
+<body>
+  <nav><a href="/">Trang chủ</a> Điều hướng</nav>
+  <main>
+    <h1>Thông tư  15/2024/TT-BTC</h1>
+    <p>Điều 1. Doanh nghiệp nộp báo cáo thuế &amp; lưu hồ sơ.</p>
+    <ul><li>Khoản 1. Trong <b>15</b> ngày.</li><li>Khoản 2. Lưu trữ<br/>mười năm.</li></ul>
+  </main>
+  <footer>Bản quyền 2024</footer>
+</body>
+</html>
+"""
+
+
+class HtmlConnectorTests(unittest.TestCase):
+    def test_extracts_metadata_and_block_text(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            page = root / "2024" / "tt-15.html"
+            page.parent.mkdir()
+            page.write_text(PAGE, encoding="utf-8")
+
+            record, stats = html.parse_file(page, root)
+
+            self.assertEqual(record["doc_id"], "2024/tt-15")
+            self.assertEqual(record["title"], "Thông tư 15/2024/TT-BTC")
+            self.assertEqual(record["issuer"], "Bộ Tài chính")
+            self.assertEqual(record["issue_date"], "2024-03-05")
+            self.assertEqual(record["effective_date"], "2024-04-20")
+            self.assertEqual(record["source_url"], "https://portal.example/tt-15-2024")
+            self.assertEqual(
+                record["text"].splitlines(),
+                [
+                    "Thông tư 15/2024/TT-BTC",
+                    "Điều 1. Doanh nghiệp nộp báo cáo thuế & lưu hồ sơ.",
+                    "Khoản 1. Trong 15 ngày.",
+                    "Khoản 2. Lưu trữ",
+                    "mười năm.",
+                ],
+            )
+            self.assertNotIn("tracking", record["text"])
+            self.assertNotIn("Bản quyền", record["text"])
+            self.assertEqual(stats["bytes"], page.stat().st_size)
+            self.assertGreater(stats["tags"], 10)
+
+    def test_streams_compressed_pages_and_falls_back_to_body_dates(self) -> None:
+        body = "<html><body><div>Nghị định ngày 7 tháng 2 năm 2023</div><div>Điều 1. Áp dụng.</div></body></html>"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            # Multi-byte characters straddle the parser's feed chunks.
+            (root / "nd-7.htm.gz").write_bytes(gzip.compress(body.replace("Áp dụng", "Áp dụng " * 20000).encode("utf-8")))
+            (root / "notes.txt").write_text("skip me", encoding="utf-8")
+
+            pages = html.list_files(root)
+            self.assertEqual([page.name for page in pages], ["nd-7.htm.gz"])
+            record, _ = html.parse_file(pages[0], root)
+
+            self.assertEqual(record["doc_id"], "nd-7")
+            self.assertEqual(record["issue_date"], "2023-02-07")
+            self.assertEqual(record["title"], "")
+            self.assertNotIn("�", record["text"])
+            self.assertTrue(record["text"].startswith("Nghị định ngày 7 tháng 2 năm 2023\nĐiều 1. Áp dụng"))
+
+
+if __name__ == "__main__":
+    unittest.main()
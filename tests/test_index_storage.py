@@ -0,0 +1,51 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from regdelta.index import storage
+from regdelta.index.bm25 import BM25Index
+from regdelta.stages.retrieval import _tokenize
+
+
+SEGMENTS = [
+    {"segment_id": "doc_a:cl_1", "doc_id": "doc_a", "clause_id": "cl_1", "text": "Lưu trữ hồ sơ kế toán."},
+    {"segment_id": "doc_b:cl_1", "doc_id": "doc_b", "clause_id": "cl_1", "text": "Submit report within 15 days."},
+    {"segment_id": "doc_c:cl_1", "doc_id": "doc_c", "clause_id": "cl_1", "text": "Report incidents; report losses."},
+]
+
+
+class IndexStorageTests(unittest.TestCase):
+    def test_memory_mapped_index_matches_in_memory_index(self) -> None:
+        built = BM25Index.build(SEGMENTS, tokenize=_tokenize)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = storage.write_index(built, Path(tmp_dir) / "bm25" / "corpus.idx")
+            opened = storage.open_index(path)
+
+            self.assertIsNotNone(opened.mapping)
+            self.assertEqual(list(opened.vocabulary), list(built.vocabulary))
+            self.assertEqual(opened.segment_count, built.segment_count)
+            self.assertEqual(opened.avg_doc_length, built.avg_doc_length)
+            self.assertEqual(opened.segments[0], built.segments[0])
+            self.assertEqual(opened.term_document_frequency(), built.term_document_frequency())
+
+            query = opened.term_ids({"report", "hồ", "sơ"})
+            self.assertEqual(query, built.term_ids({"report", "hồ", "sơ"}))
+            self.assertEqual(opened.score(query), built.score(query))
+
+    def test_rejects_foreign_files(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "bogus.idx"
+            path.write_bytes(b"not an index file at all, definitely not" * 4)
+            with self.assertRaises(ValueError):
+                storage.open_index(path)
+
+    def test_corpus_checksum_tracks_text_and_parameters(self) -> None:
+        base = storage.corpus_checksum(SEGMENTS, 1.2, 0.75)
+        self.assertEqual(base, storage.corpus_checksum(list(SEGMENTS), 1.2, 0.75))
+        self.assertNotEqual(base, storage.corpus_checksum(SEGMENTS, 1.5, 0.75))
+        changed = [dict(SEGMENTS[0], text="Lưu trữ chứng từ.")] + SEGMENTS[1:]
+        self.assertNotEqual(base, storage.corpus_checksum(changed, 1.2, 0.75))
+
+
+if __name__ == "__main__":
+    unittest.main()
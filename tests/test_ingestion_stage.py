@@ -1,9 +1,13 @@
+import gzip
 import json
+import lzma
 import tempfile
 import unittest
 from pathlib import Path
 
+from regdelta.index import offsets
 from regdelta.stages.ingestion import run_ingestion
+from regdelta.stages.processing import run_processing
 
 
 class IngestionStageTests(unittest.TestCase):
@@ -63,5 +67,286 @@ class IngestionStageTests(unittest.TestCase):
             self.assertTrue(all(doc["checksum"] for doc in docs))
 
 
+    def test_spills_to_disk_under_a_small_memory_budget(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+            source_dir = repo_root / "data" / "raw"
+            source_dir.mkdir(parents=True, exist_ok=True)
+            (source_dir / "first.jsonl").write_text(
+                "".join(
+                    json.dumps({"doc_id": f"doc_{idx % 40:02d}", "text": f"Điều {idx}. Bản đầu."}, ensure_ascii=False)
+                    + "\n"
+                    for idx in range(80)
+                ),
+                encoding="utf-8",
+            )
+            (source_dir / "second.json").write_text(
+                json.dumps([{"doc_id": "doc_07", "text": "Điều 7. Bản sửa đổi."}], ensure_ascii=False),
+                encoding="utf-8",
+            )
+
+            run_dir = repo_root / "artifacts" / "logs" / "runs" / "test_run"
+            context = {
+                "config": {
+                    "ingestion": {
+                        "memory_budget_mb": 0.002,
+                        "sources": [
+                            {"name": "first", "type": "jsonl", "path": "data/raw/first.jsonl"},
+                            {"name": "second", "type": "json", "path": "data/raw/second.json"},
+                        ],
+                    }
+                },
+                "repo_root": repo_root,
+                "run_dir": run_dir,
+                "artifacts": {},
+            }
+
+            result = run_ingestion(context)
+
+            manifest = json.loads(Path(result["raw_manifest"]).read_text(encoding="utf-8"))
+            self.assertEqual(manifest["document_count"], 40)
+            self.assertEqual(manifest["duplicate_doc_ids"], 41)
+            self.assertGreater(manifest["sort"]["spill_runs"], 1)
+
+            docs = [json.loads(line) for line in Path(result["documents"]).read_text(encoding="utf-8").splitlines()]
+            self.assertEqual([doc["doc_id"] for doc in docs], [f"doc_{idx:02d}" for idx in range(40)])
+            self.assertEqual(docs[7]["text"], "Điều 7. Bản sửa đổi.")
+            self.assertEqual(docs[8]["text"], "Điều 48. Bản đầu.")
+            self.assertEqual(sorted(path.name for path in (run_dir / "ingestion").iterdir()), ["documents.jsonl", "documents.jsonl.idx", "raw_manifest.json"])
+
+
+    def test_parallel_chunked_ingestion_matches_serial_run(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+            source_dir = repo_root / "data" / "raw"
+            source_dir.mkdir(parents=True, exist_ok=True)
+            lines = [
+                json.dumps({"doc_id": f"doc_{idx % 25:02d}", "text": f"Khoản {idx}. Nội dung."}, ensure_ascii=False)
+                for idx in range(60)
+            ]
+            lines[41] = "{not json"
+            lines[47] = "[1, 2]"
+            (source_dir / "large.jsonl").write_text("\n".join(lines) + "\n", encoding="utf-8")
+            (source_dir / "late.jsonl").write_text(
+                json.dumps({"doc_id": "doc_03", "text": "Khoản 3. Đã thay thế."}, ensure_ascii=False) + "\n",
+                encoding="utf-8",
+            )
+
+            outputs = []
+            for label, workers in (("serial", 1), ("parallel", 3)):
+                run_dir = repo_root / "runs" / label
+                context = {
+                    "config": {
+                        "runtime": {"max_workers": workers},
+                        "ingestion": {
+                            "chunk_mb": 0.0005,
+                            "sources": [
+                                {"name": "large", "type": "jsonl", "path": "data/raw/large.jsonl"},
+                                {"name": "late", "type": "jsonl", "path": "data/raw/late.jsonl"},
+                            ],
+                        },
+                    },
+                    "repo_root": repo_root,
+                    "run_dir": run_dir,
+                    "artifacts": {},
+                }
+                result = run_ingestion(context)
+                manifest = json.loads(Path(result["raw_manifest"]).read_text(encoding="utf-8"))
+                self.assertEqual(manifest["execution"]["mode"], label)
+                self.assertGreater(manifest["sources"][0]["chunks"], 1)
+                self.assertEqual(manifest["sources"][0]["records"], 58)
+                # Per-task read spills are removed once merged.
+                self.assertFalse([path for path in (run_dir / "ingestion").iterdir() if path.is_dir()])
+                outputs.append((Path(result["documents"]).read_bytes(), manifest))
+
+            (serial_docs, serial), (parallel_docs, parallel_manifest) = outputs
+            self.assertEqual(serial_docs, parallel_docs)
+            self.assertEqual(serial["duplicate_doc_ids"], parallel_manifest["duplicate_doc_ids"])
+            self.assertEqual(serial["warnings"], parallel_manifest["warnings"])
+            self.assertIn("invalid JSONL at line 42", serial["warnings"][0])
+            self.assertIn("expected JSON object at line 48", serial["warnings"][1])
+            self.assertIn("Đã thay thế", serial_docs.decode("utf-8"))
+
+
+    def test_document_store_reports_changes_and_links_unchanged_snapshots(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+            source_path = repo_root / "data" / "raw" / "documents.jsonl"
+            source_path.parent.mkdir(parents=True, exist_ok=True)
+
+            def write_source(texts: dict) -> None:
+                source_path.write_text(
+                    "".join(
+                        json.dumps({"doc_id": doc_id, "text": text}, ensure_ascii=False) + "\n"
+                        for doc_id, text in texts.items()
+                    ),
+                    encoding="utf-8",
+                )
+
+            def run(run_name: str) -> tuple[dict, dict, Path]:
+                context = {
+                    "config": {
+                        "paths": {"document_store": "data/interim/document_store"},
+                        "ingestion": {
+                            "sources": [{"name": "fixture", "type": "jsonl", "path": "data/raw/documents.jsonl"}]
+                        },
+                    },
+                    "repo_root": repo_root,
+                    "run_dir": repo_root / "runs" / run_name,
+                    "artifacts": {},
+                }
+                result = run_ingestion(context)
+                manifest = json.loads(Path(result["raw_manifest"]).read_text(encoding="utf-8"))
+                changes = json.loads(Path(result["document_changes"]).read_text(encoding="utf-8"))
+                return manifest, changes, Path(result["documents"])
+
+            write_source({"doc_a": "Điều 1.", "doc_b": "Điều 2.", "doc_c": "Điều 3."})
+            first, first_changes, first_docs = run("run_1")
+            self.assertEqual(first_changes["new"], ["doc_a", "doc_b", "doc_c"])
+            self.assertIsNone(first_changes["previous_version"])
+            self.assertEqual(first["document_store"]["objects_written"], 3)
+
+            second, second_changes, second_docs = run("run_2")
+            self.assertEqual(second["execution"]["mode"], "snapshot")
+            self.assertEqual(second_changes["counts"], {"new": 0, "changed": 0, "removed": 0, "unchanged": 3})
+            self.assertEqual(second["document_store"]["version"], 1)
+            self.assertEqual(second_docs.read_bytes(), first_docs.read_bytes())
+            self.assertEqual(second_docs.stat().st_ino, first_docs.stat().st_ino)
+            second_index = offsets.index_path_for(second_docs)
+            self.assertEqual(second["documents_index_path"], str(second_index))
+            self.assertEqual(offsets.DocumentReader(second_docs).get("doc_b")["text"], "Điều 2.")
+
+            write_source({"doc_a": "Điều 1.", "doc_b": "Điều 2 (sửa đổi).", "doc_d": "Điều 4."})
+            third, third_changes, _ = run("run_3")
+            self.assertEqual(third_changes["new"], ["doc_d"])
+            self.assertEqual(third_changes["changed"], ["doc_b"])
+            self.assertEqual(third_changes["removed"], ["doc_c"])
+            self.assertEqual(third_changes["counts"]["unchanged"], 1)
+            self.assertEqual(third_changes["previous_version"], 1)
+            self.assertEqual(third["document_store"]["version"], 2)
+            self.assertEqual(third["document_store"]["objects_written"], 2)
+            # The old text of doc_b and the removed doc_c's text are no longer referenced.
+            self.assertEqual(third["document_store"]["pruned"], {"objects": 2, "tasks": 1})
+            store_root = repo_root / "data" / "interim" / "document_store"
+            self.assertEqual(len(list((store_root / "objects").glob("*/*"))), 3)
+            self.assertEqual(len(list((store_root / "tasks").iterdir())), 1)
+            reader = offsets.DocumentReader(Path(third["documents_path"]))
+            self.assertEqual(list(reader.doc_ids()), ["doc_a", "doc_b", "doc_d"])
+            self.assertEqual(reader.get("doc_b")["text"], "Điều 2 (sửa đổi).")
+            self.assertNotIn("doc_c", reader)
+
+
+    def test_parses_html_mirror_in_parallel_with_parse_stats(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+            portal = repo_root / "data" / "raw" / "official_portal"
+            for idx in range(40):
+                page = portal / f"{idx % 3}" / f"tt-{idx:02d}.html"
+                page.parent.mkdir(parents=True, exist_ok=True)
+                page.write_text(
+                    f"<html><head><title>Thông tư {idx}</title></head><body><main>"
+                    f"<p>Điều 1. Nội dung {idx}.</p><p>Điều 2. Hiệu lực.</p></main></body></html>",
+                    encoding="utf-8",
+                )
+            (portal / "index.css").write_text("body {}", encoding="utf-8")
+
+            def run(run_name: str, workers: int) -> tuple[dict, list]:
+                context = {
+                    "config": {
+                        "runtime": {"max_workers": workers},
+                        "paths": {"document_store": "data/interim/document_store"},
+                        "ingestion": {
+                            "sources": [{"name": "official_portal", "type": "html", "path": "data/raw/official_portal"}]
+                        },
+                    },
+                    "repo_root": repo_root,
+                    "run_dir": repo_root / "runs" / run_name,
+                    "artifacts": {},
+                }
+                result = run_ingestion(context)
+                manifest = json.loads(Path(result["raw_manifest"]).read_text(encoding="utf-8"))
+                docs = [json.loads(line) for line in Path(result["documents"]).read_text(encoding="utf-8").splitlines()]
+                if manifest["execution"]["mode"] != "snapshot":
+                    parse_stats = json.loads(Path(result["parse_stats"]).read_text(encoding="utf-8"))
+                    self.assertEqual(len(parse_stats["files"]), manifest["sources"][0]["parse"]["files"])
+                return manifest, docs
+
+            parallel_manifest, parallel_docs = run("parallel", 2)
+            self.assertEqual(parallel_manifest["execution"]["mode"], "parallel")
+            self.assertEqual(parallel_manifest["execution"]["tasks"], 3)
+            self.assertEqual(parallel_manifest["document_count"], 40)
+            self.assertEqual(parallel_manifest["warnings"], [])
+            parse = parallel_manifest["sources"][0]["parse"]
+            self.assertEqual(parse["files"], 40)
+            self.assertEqual(len(parse["slowest"]), 5)
+            self.assertGreaterEqual(parse["slowest"][0]["seconds"], parse["slowest"][-1]["seconds"])
+            self.assertEqual(parallel_docs[0]["doc_id"], "0/tt-00")
+            self.assertEqual(parallel_docs[0]["title"], "Thông tư 0")
+            self.assertEqual(parallel_docs[0]["text"], "Điều 1. Nội dung 0.\nĐiều 2. Hiệu lực.")
+
+            self.assertEqual(run("unchanged", 1)[0]["execution"]["mode"], "snapshot")
+
+            # An in-place edit keeps the directory mtime but must still be seen.
+            edited = portal / "1" / "tt-01.html"
+            edited.write_text(edited.read_text(encoding="utf-8").replace("Nội dung 1.", "Nội dung mới."), encoding="utf-8")
+            serial_manifest, serial_docs = run("serial", 1)
+            self.assertEqual(serial_manifest["execution"]["mode"], "serial")
+            self.assertEqual(serial_manifest["document_store"]["changes"]["changed"], 1)
+            # Only the edited page's batch is parsed again; the other two are
+            # rebuilt from the document store.
+            self.assertEqual(serial_manifest["sources"][0]["reused_chunks"], 2)
+            self.assertEqual(serial_manifest["sources"][0]["parse"]["files"], 16)
+            self.assertEqual(serial_manifest["document_store"]["objects_written"], 1)
+            self.assertEqual(serial_manifest["document_store"]["pruned"], {"objects": 1, "tasks": 1})
+            self.assertEqual([doc["doc_id"] for doc in serial_docs], [doc["doc_id"] for doc in parallel_docs])
+            self.assertEqual(
+                [doc for doc in serial_docs if doc["doc_id"] != "1/tt-01"],
+                [doc for doc in parallel_docs if doc["doc_id"] != "1/tt-01"],
+            )
+
+
+    def test_reads_compressed_sources_and_writes_compressed_documents(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+            source_dir = repo_root / "data" / "raw"
+            source_dir.mkdir(parents=True, exist_ok=True)
+            records = [{"doc_id": f"doc_{idx}", "text": f"Điều {idx}. Nộp báo cáo."} for idx in range(3)]
+            with lzma.open(source_dir / "snapshot.jsonl.xz", "wt", encoding="utf-8") as f:
+                f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+            # No extension: the codec is detected from the gzip magic bytes.
+            (source_dir / "extra.json").write_bytes(
+                gzip.compress(json.dumps({"doc_id": "doc_9", "text": "Điều 9."}).encode("utf-8"))
+            )
+
+            context = {
+                "config": {
+                    "ingestion": {
+                        "documents_compression": "gzip",
+                        "sources": [
+                            {"name": "snapshot", "type": "jsonl", "path": "data/raw/snapshot.jsonl.xz"},
+                            {"name": "extra", "type": "json", "path": "data/raw/extra.json"},
+                        ],
+                    }
+                },
+                "repo_root": repo_root,
+                "run_dir": repo_root / "runs" / "compressed",
+                "artifacts": {},
+            }
+
+            result = run_ingestion(context)
+
+            documents_path = Path(result["documents"])
+            self.assertEqual(documents_path.name, "documents.jsonl.gz")
+            self.assertNotIn("documents_index", result)
+            with gzip.open(documents_path, "rt", encoding="utf-8") as f:
+                docs = [json.loads(line) for line in f]
+            self.assertEqual([doc["doc_id"] for doc in docs], ["doc_0", "doc_1", "doc_2", "doc_9"])
+
+            context["artifacts"]["ingestion"] = result
+            segments_path = Path(run_processing(context)["normalized_segments"])
+            segments = json.loads(segments_path.read_text(encoding="utf-8"))
+            self.assertEqual(segments["document_count"], 4)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,157 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from regdelta.index import lsm
+from regdelta.index.bm25 import BM25Index
+from regdelta.stages.retrieval import _tokenize
+
+
+def _segment(doc: str, clause: str, text: str) -> dict:
+    return {"segment_id": f"{doc}:{clause}", "doc_id": doc, "clause_id": clause, "text": text}
+
+
+BASELINE = [
+    _segment("doc_a", "cl_1", "Submit the annual report within 15 days."),
+    _segment("doc_a", "cl_2", "Retain accounting records for ten years."),
+    _segment("doc_b", "cl_1", "Report incidents to the authority; report losses monthly."),
+    _segment("doc_c", "cl_1", "Tax filing deadline is extended for small firms."),
+    _segment("doc_d", "cl_1", "Banks must report suspicious transactions promptly."),
+    _segment("doc_e", "cl_1", "Annual audit report is mandatory for listed companies."),
+]
+
+UPDATED = [
+    BASELINE[0],
+    _segment("doc_a", "cl_2", "Retain accounting records and report copies for five years."),
+    BASELINE[2],
+    BASELINE[4],
+    BASELINE[5],
+    _segment("doc_f", "cl_1", "New rule: report tax incidents within 30 days."),
+]
+
+QUERIES = ["report within days", "accounting records", "tax incidents", "annual audit"]
+
+
+def _ranked(index, query: str, k: int = 4) -> list[tuple[float, float, str]]:
+    terms = set(_tokenize(query))
+    return [hit[:3] for hit in index.search(index.term_ids(terms), len(terms), k)]
+
+
+def _ranked_batch(index, k: int = 4) -> list[list[tuple[float, float, str]]]:
+    parsed = [(index.term_ids(set(_tokenize(query))), len(set(_tokenize(query)))) for query in QUERIES]
+    return [[hit[:3] for hit in hits] for hits in index.search_batch(parsed, k)]
+
+
+class LiveIndexTests(unittest.TestCase):
+    def _updated_live(self, index_dir: Path) -> lsm.LiveIndex:
+        part = BM25Index.build(BASELINE, tokenize=_tokenize)
+        manifest = lsm.create(index_dir, part, "baseline")
+        live = lsm.open_live_index(index_dir, manifest, _tokenize)
+        changed, tombstones, stats = lsm.plan_update(live, UPDATED)
+        self.assertEqual(stats, {"added": 1, "updated": 1, "removed": 1})
+        self.assertEqual(sorted(segment["segment_id"] for segment in changed), ["doc_a:cl_2", "doc_f:cl_1"])
+        manifest = lsm.apply_update(live, changed, tombstones, "updated", _tokenize)
+        self.assertEqual(manifest["version"], 2)
+        return lsm.open_live_index(index_dir, manifest, _tokenize)
+
+    def test_incremental_update_scores_like_a_full_rebuild(self) -> None:
+        rebuilt = BM25Index.build(UPDATED, tokenize=_tokenize)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            live = self._updated_live(Path(tmp_dir))
+
+            self.assertEqual(len(live.parts), 2)
+            self.assertEqual(live.segment_count, rebuilt.segment_count)
+            self.assertEqual(live.avg_doc_length, rebuilt.avg_doc_length)
+            self.assertEqual(live.term_document_frequency(), rebuilt.term_document_frequency())
+            self.assertFalse(live.is_live(1))
+            self.assertFalse(live.is_live(3))
+            for query in QUERIES:
+                self.assertEqual(_ranked(live, query), _ranked(rebuilt, query))
+            self.assertEqual(_ranked_batch(live), _ranked_batch(rebuilt))
+
+    def test_reopening_reads_dead_document_frequencies_from_manifest(self) -> None:
+        def no_tokenize(text: str) -> list[str]:
+            raise AssertionError("opening an index must not re-tokenize dead segments")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir)
+            live = self._updated_live(index_dir)
+            manifest = lsm.load_manifest(index_dir)
+            self.assertEqual(manifest["parts"][0]["dead"], [1, 3])
+            self.assertEqual(manifest["parts"][0]["dead_df"]["tax"], 1)
+
+            reopened = lsm.open_live_index(index_dir, manifest, no_tokenize)
+            self.assertEqual(reopened.term_document_frequency(), live.term_document_frequency())
+
+            # Older manifests without dead_df are still read correctly.
+            for entry in manifest["parts"]:
+                entry.pop("dead_df")
+            legacy = lsm.open_live_index(index_dir, manifest, _tokenize)
+            self.assertEqual(legacy.term_document_frequency(), live.term_document_frequency())
+
+    def test_unchanged_segments_produce_no_new_part(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir)
+            manifest = lsm.create(index_dir, BM25Index.build(BASELINE, tokenize=_tokenize), "baseline")
+            live = lsm.open_live_index(index_dir, manifest, _tokenize)
+            changed, tombstones, stats = lsm.plan_update(live, list(reversed(BASELINE)))
+
+            self.assertEqual((changed, tombstones), ([], {}))
+            self.assertEqual(stats, {"added": 0, "updated": 0, "removed": 0})
+            manifest = lsm.apply_update(live, changed, tombstones, "reordered", _tokenize)
+            self.assertEqual(manifest["version"], 1)
+            self.assertEqual(len(manifest["parts"]), 1)
+
+    def test_compaction_merges_parts_and_drops_tombstones(self) -> None:
+        rebuilt = BM25Index.build(UPDATED, tokenize=_tokenize)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir)
+            live = self._updated_live(index_dir)
+            self.assertTrue(lsm.needs_merge(live, max_parts=1, tombstone_ratio=0.25))
+
+            result = lsm.compact(index_dir, live.manifest, _tokenize)
+            self.assertEqual(result["status"], "merged")
+            merged = lsm.open_live_index(index_dir, lsm.load_manifest(index_dir), _tokenize)
+            self.assertEqual(len(merged.parts), 1)
+            self.assertEqual(merged.ordinal_count, merged.segment_count)
+            self.assertEqual(merged.version, live.version)
+            self.assertEqual(list(merged.parts[0].vocabulary), list(rebuilt.vocabulary))
+            for query in QUERIES:
+                self.assertEqual(_ranked(merged, query), _ranked(rebuilt, query))
+
+            self.assertEqual(len(lsm.remove_unreferenced_parts(index_dir)), 2)
+            self.assertEqual(len(list(index_dir.glob("*.idx"))), 1)
+
+    def test_compaction_skips_when_manifest_changed(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir)
+            live = self._updated_live(index_dir)
+            snapshot = live.manifest
+            lsm.write_manifest(index_dir, dict(snapshot, corpus_checksum="concurrent"))
+
+            result = lsm.compact(index_dir, snapshot, _tokenize)
+            self.assertEqual(result["status"], "skipped")
+            self.assertEqual(len(lsm.load_manifest(index_dir)["parts"]), 2)
+
+    def test_lock_serializes_index_writers(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir) / "bm25"
+            order: list[str] = []
+
+            def writer() -> None:
+                with lsm.locked(index_dir):
+                    order.append("second")
+
+            with lsm.locked(index_dir):
+                thread = threading.Thread(target=writer)
+                thread.start()
+                thread.join(0.2)
+                self.assertTrue(thread.is_alive())
+                order.append("first")
+            thread.join()
+            self.assertEqual(order, ["first", "second"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from regdelta.parallel import chunked, configured_workers, ordered_map
+
+
+class ParallelHelpersTests(unittest.TestCase):
+    def test_configured_workers_defaults_to_one(self) -> None:
+        self.assertEqual(configured_workers({}), 1)
+        self.assertEqual(configured_workers({"runtime": {"max_workers": 6}}), 6)
+        self.assertEqual(configured_workers({"runtime": {"max_workers": "bad"}}), 1)
+        self.assertEqual(configured_workers({"runtime": {"max_workers": 0}}), 1)
+
+    def test_ordered_map_preserves_task_order(self) -> None:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(ordered_map(executor, lambda value: value * value, range(20), window=3))
+        self.assertEqual(results, [value * value for value in range(20)])
+
+    def test_chunked_splits_into_contiguous_slices(self) -> None:
+        self.assertEqual(chunked([1, 2, 3, 4, 5], 2), [[1, 2], [3, 4], [5]])
+        self.assertEqual(chunked([], 3), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
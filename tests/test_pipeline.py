@@ -1,3 +1,5 @@
+import shutil
+import tempfile
 import unittest
 from pathlib import Path
 
@@ -9,8 +11,13 @@ class PipelineTests(unittest.TestCase):
     def test_pipeline_writes_summary(self) -> None:
         cfg = load_config("configs/base.json", "dev_cpu")
         stages = resolve_stage_list(cfg, "ingestion,processing")
-        summary_path = run_pipeline(cfg, stages, repo_root=Path("."))
-        self.assertTrue(summary_path.exists())
+        # A scratch repo root keeps run logs, the document store and the
+        # interim caches out of the working tree and out of later runs.
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+            shutil.copytree("pipelines", repo_root / "pipelines")
+            summary_path = run_pipeline(cfg, stages, repo_root=repo_root)
+            self.assertTrue(summary_path.exists())
 
 
 if __name__ == "__main__":
@@ -2,7 +2,12 @@ import json
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
+from regdelta import dedup, parallel, records
+from regdelta.cache import LRUCache
+from regdelta.segments import SegmentTable
+from regdelta.stages import processing
 from regdelta.stages.processing import run_processing
 
 
@@ -47,12 +52,327 @@ class ProcessingStageTests(unittest.TestCase):
             segments_payload = json.loads(Path(result["normalized_segments"]).read_text(encoding="utf-8"))
             self.assertEqual(segments_payload["status"], "ok")
             self.assertEqual(segments_payload["segment_count"], 5)
+            # Versions of one document never collapse into each other.
+            self.assertEqual(segments_payload["near_duplicates"]["segments"]["collapsed"], 0)
+            self.assertEqual(segments_payload["near_duplicates"]["documents"]["collapsed"], 0)
+            self.assertEqual(segments_payload["memory"]["segment_count"], 5)
 
             deltas_payload = json.loads(Path(result["deltas"]).read_text(encoding="utf-8"))
             self.assertEqual(deltas_payload["status"], "ok")
             self.assertEqual(deltas_payload["delta_count"], 2)
-            delta_types = {delta["change_type"] for delta in deltas_payload["deltas"]}
+            deltas = list(records.iter_records(result["deltas"], "deltas"))
+            delta_types = {delta["change_type"] for delta in deltas}
             self.assertEqual(delta_types, {"amended", "added"})
+            amended = next(delta for delta in deltas if delta["change_type"] == "amended")
+            self.assertEqual((amended["old_clause_id"], amended["new_clause_id"]), ("cl_2", "cl_2"))
+            self.assertEqual(
+                [(span["op"], span["old"], span["new"]) for span in amended["changed_spans"]],
+                [("replace", "30", "15")],
+            )
+
+    def test_reports_near_duplicate_documents_and_collapses_their_clauses(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            run_dir = Path(tmp_dir) / "run"
+            documents_path = run_dir / "ingestion" / "documents.jsonl"
+            documents_path.parent.mkdir(parents=True, exist_ok=True)
+            boilerplate = "Điều 9. Hồ sơ kế toán được lưu trữ tối thiểu mười năm kể từ ngày kết thúc năm tài chính."
+            body = (
+                "Điều 1. Doanh nghiệp nộp báo cáo tài chính năm cho cơ quan thuế quản lý trực tiếp trong 30 ngày.\n"
+                + boilerplate
+            )
+            documents = [
+                {"doc_id": "nd_01", "text": body},
+                {"doc_id": "nd_01_hop_nhat", "text": body + "\nNơi nhận: như trên."},
+                {"doc_id": "nd_02", "replaces_doc_id": "nd_01", "text": body.replace("30 ngày", "15 ngày")},
+                {"doc_id": "tt_09", "text": "Điều 1. Ngân hàng công bố lãi suất cơ bản hằng tháng.\n" + boilerplate},
+            ]
+            documents_path.write_text(
+                "".join(json.dumps(doc, ensure_ascii=False) + "\n" for doc in documents), encoding="utf-8"
+            )
+            context = {
+                "config": {"processing": {"near_duplicate": {"threshold": 0.8}}},
+                "repo_root": Path(tmp_dir),
+                "run_dir": run_dir,
+                "artifacts": {"ingestion": {"documents": str(documents_path)}},
+            }
+
+            result = run_processing(context)
+
+            report = json.loads(Path(result["near_duplicates"]).read_text(encoding="utf-8"))
+            self.assertEqual(report["documents"]["clusters"], [{"canonical": "nd_01", "duplicates": ["nd_01_hop_nhat"]}])
+            self.assertEqual((report["documents"]["duplicates"], report["documents"]["collapsed"]), (1, 0))
+            segments = {
+                segment["segment_id"]: segment for segment in records.iter_records(result["normalized_segments"], "segments")
+            }
+            # Document-level detection is report-only: the duplicate's own clause
+            # survives and its shared clauses fold into the originals.
+            self.assertEqual(segments["nd_01_hop_nhat:cl_3"]["text"], "Nơi nhận: như trên.")
+            self.assertEqual(segments["nd_01:cl_1"]["duplicate_segment_ids"], ["nd_01_hop_nhat:cl_1"])
+            # Both versions keep their clauses, so the amended 15-day text stays citable.
+            self.assertIn("15 ngày", segments["nd_02:cl_1"]["text"])
+            self.assertIn("30 ngày", segments["nd_01:cl_1"]["text"])
+            self.assertIn("nd_01:cl_2", segments)
+            # Boilerplate shared with an unrelated document collapses into the newest version.
+            self.assertEqual(
+                report["segments"]["clusters"],
+                [
+                    {"canonical": "nd_02:cl_2", "duplicates": ["nd_01_hop_nhat:cl_2", "tt_09:cl_2"]},
+                    {"canonical": "nd_01:cl_1", "duplicates": ["nd_01_hop_nhat:cl_1"]},
+                ],
+            )
+            self.assertEqual(segments["nd_02:cl_2"]["duplicate_segment_ids"], ["nd_01_hop_nhat:cl_2", "tt_09:cl_2"])
+            deltas = list(records.iter_records(result["deltas"], "deltas"))
+            self.assertEqual([(delta["change_type"], delta["new_clause_id"]) for delta in deltas], [("amended", "cl_1")])
+
+            context["config"]["processing"]["near_duplicate"]["enabled"] = False
+            context["run_dir"] = Path(tmp_dir) / "run_plain"
+            plain = run_processing(context)
+            self.assertNotIn("near_duplicates", plain)
+            plain_segments = json.loads(Path(plain["normalized_segments"]).read_text(encoding="utf-8"))
+            self.assertEqual(plain_segments["segment_count"], 9)
+
+    def test_delta_targets_are_never_collapsed(self) -> None:
+        text = "Điều 1. Doanh nghiệp nộp báo cáo tài chính năm cho cơ quan thuế trong 15 ngày."
+        segments = SegmentTable()
+        segments.add("tt_01", "cl_1", text)
+        segments.add("nd_02", "cl_1", text)
+        documents = [{"doc_id": "tt_01"}, {"doc_id": "nd_02"}]
+
+        plain, _ = processing._collapse_segments(segments, dedup.NearDuplicateIndex(), documents, set())
+        self.assertEqual(list(plain.segment_ids), ["tt_01:cl_1"])
+        kept, report = processing._collapse_segments(segments, dedup.NearDuplicateIndex(), documents, {"nd_02:cl_1"})
+        self.assertEqual(list(kept.segment_ids), ["tt_01:cl_1", "nd_02:cl_1"])
+        self.assertEqual(report["collapsed"], 0)
+
+    def test_parallel_sharding_matches_serial_output(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            documents_path = Path(tmp_dir) / "documents.jsonl"
+            documents = []
+            for chain in range(6):
+                text = "\n".join(f"Article {idx} Chain {chain} keeps rule {idx}." for idx in range(1, 4 + chain))
+                documents.append({"doc_id": f"c{chain}_v1", "text": text})
+                documents.append(
+                    {"doc_id": f"c{chain}_v2", "replaces_doc_id": f"c{chain}_v1", "text": text.replace("rule 2", "rule 20")}
+                )
+                documents.append(
+                    {"doc_id": f"c{chain}_v3", "replaces_doc_id": f"c{chain}_v2", "text": text + "\nArticle 99 Added."}
+                )
+            documents_path.write_text(
+                "".join(json.dumps(doc) + "\n" for doc in reversed(documents)), encoding="utf-8"
+            )
+
+            outputs = []
+            for workers in (1, 3):
+                context = {
+                    "config": {
+                        "runtime": {"max_workers": workers},
+                        "processing": {"parallel_min_documents": 2, "near_duplicate": {"enabled": False}},
+                    },
+                    "repo_root": Path(tmp_dir),
+                    "run_dir": Path(tmp_dir) / f"run_{workers}",
+                    "artifacts": {"ingestion": {"documents": str(documents_path)}},
+                }
+                result = run_processing(context)
+                header = records.read_header(result["normalized_segments"])
+                segments = list(records.iter_records(result["normalized_segments"], "segments"))
+                deltas = list(records.iter_records(result["deltas"], "deltas"))
+                outputs.append((header["execution"], segments, deltas))
+
+            (serial_execution, *serial), (parallel_execution, *sharded) = outputs
+            self.assertEqual(serial_execution["execution"], "serial")
+            self.assertEqual(parallel_execution["execution"], "parallel")
+            self.assertEqual(parallel_execution["shards"], 6)
+            self.assertEqual(sharded, serial)
+            # v2 amends rule 2; v3 reverts it and adds an article.
+            self.assertEqual(len(serial[1]), 18)
+
+    def test_pair_diffs_are_cached_across_runs_and_composed(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+            documents_path = repo_root / "documents.jsonl"
+            documents = [
+                {"doc_id": "v1", "text": "Article 1 Keep records.\nArticle 2 Submit report within 30 days."},
+                {
+                    "doc_id": "v2",
+                    "replaces_doc_id": "v1",
+                    "text": "Article 1 Keep records.\nArticle 2 Submit report within 15 days.",
+                },
+                {
+                    "doc_id": "v3",
+                    "replaces_doc_id": "v2",
+                    "text": "Article 1 Keep records for ten years.\nArticle 2 Submit report within 15 days.",
+                },
+                {
+                    "doc_id": "v4",
+                    "replaces_doc_id": "v3",
+                    "text": "Article 1 Keep records for ten years.\nArticle 2 Submit report within 10 days.",
+                },
+            ]
+            documents_path.write_text("".join(json.dumps(doc) + "\n" for doc in documents), encoding="utf-8")
+
+            def run(name: str) -> dict[str, str]:
+                return run_processing(
+                    {
+                        "config": {
+                            "paths": {"data_interim": "data/interim"},
+                            "processing": {"near_duplicate": {"enabled": False}},
+                        },
+                        "repo_root": repo_root,
+                        "run_dir": repo_root / name,
+                        "artifacts": {"ingestion": {"documents": str(documents_path)}},
+                    }
+                )
+
+            first, second = run("run_1"), run("run_2")
+
+            pair_stats = [
+                records.read_header(result["normalized_segments"])["execution"]["version_pairs"]
+                for result in (first, second)
+            ]
+            self.assertEqual((pair_stats[0]["diffed"], pair_stats[0]["cached"]), (3, 0))
+            self.assertEqual((pair_stats[1]["diffed"], pair_stats[1]["cached"]), (0, 3))
+            self.assertEqual((pair_stats[1]["cache"]["hits"], pair_stats[1]["cache"]["misses"]), (3, 0))
+            self.assertEqual(
+                list(records.iter_records(first["deltas"], "deltas")),
+                list(records.iter_records(second["deltas"], "deltas")),
+            )
+
+            graph = records.read_header(second["version_graph"])
+            self.assertEqual(graph["chains"], [["v1", "v2", "v3", "v4"]])
+            edges = list(records.iter_records(second["version_graph"], "edges"))
+            self.assertTrue(all(edge["cached"] for edge in edges))
+            self.assertEqual(
+                records.read_header(second["cumulative_deltas"])["pairs"],
+                "every ancestor/descendant pair two or more edges apart",
+            )
+            cumulative = list(records.iter_records(second["cumulative_deltas"], "deltas"))
+            self.assertEqual(
+                [(delta["ancestor_doc_id"], delta["descendant_doc_id"], delta["clause_id"]) for delta in cumulative],
+                [
+                    ("v1", "v3", "cl_1"),
+                    ("v1", "v3", "cl_2"),
+                    ("v1", "v4", "cl_1"),
+                    ("v1", "v4", "cl_2"),
+                    ("v2", "v4", "cl_1"),
+                    ("v2", "v4", "cl_2"),
+                ],
+            )
+            self.assertEqual(cumulative[1]["old_text"], "Article 2 Submit report within 30 days.")
+            self.assertEqual(
+                (cumulative[5]["old_text"], cumulative[5]["new_text"]),
+                ("Article 2 Submit report within 15 days.", "Article 2 Submit report within 10 days."),
+            )
+
+    def test_caches_are_closed_while_processing_workers_run(self) -> None:
+        open_caches: list[LRUCache] = []
+
+        class TrackedCache(LRUCache):
+            def __init__(self, *args: object, **kwargs: object) -> None:
+                super().__init__(*args, **kwargs)
+                open_caches.append(self)
+
+            def close(self) -> None:
+                open_caches.remove(self)
+                super().close()
+
+        process_pool = parallel.process_pool
+
+        def checked_pool(*args: object, **kwargs: object) -> object:
+            # A forked worker must not inherit an open SQLite connection.
+            self.assertEqual(open_caches, [])
+            return process_pool(*args, **kwargs)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+            documents_path = repo_root / "documents.jsonl"
+            documents = [
+                {
+                    "doc_id": f"v{idx}",
+                    "replaces_doc_id": f"v{idx - 1}" if idx else None,
+                    "text": f"Article 1 Keep records.\nArticle 2 Submit report within {idx + 10} days.",
+                }
+                for idx in range(4)
+            ]
+            documents_path.write_text("".join(json.dumps(doc) + "\n" for doc in documents), encoding="utf-8")
+            context = {
+                "config": {
+                    "paths": {"data_interim": "data/interim"},
+                    "runtime": {"max_workers": 2},
+                    "processing": {"parallel_min_documents": 0, "near_duplicate": {"enabled": False}},
+                },
+                "repo_root": repo_root,
+                "run_dir": repo_root / "run",
+                "artifacts": {"ingestion": {"documents": str(documents_path)}},
+            }
+            with mock.patch.object(processing, "LRUCache", TrackedCache), mock.patch.object(
+                parallel, "process_pool", checked_pool
+            ):
+                result = run_processing(context)
+                self.assertEqual(open_caches, [])
+                execution = records.read_header(result["normalized_segments"])["execution"]
+                self.assertEqual(execution["version_pairs"]["cache"]["misses"], 3)
+
+                with mock.patch.object(parallel, "process_pool", side_effect=RuntimeError("boom")):
+                    with self.assertRaises(RuntimeError):
+                        run_processing(context)
+                self.assertEqual(open_caches, [])
+
+    def test_reuses_segmentation_of_documents_ingestion_reports_unchanged(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+
+            def run(name: str, texts: dict, changes: dict | None) -> dict[str, str]:
+                run_dir = repo_root / name
+                run_dir.mkdir(parents=True)
+                documents_path = run_dir / "documents.jsonl"
+                documents_path.write_text(
+                    "".join(json.dumps({"doc_id": doc_id, "text": text}) + "\n" for doc_id, text in texts.items()),
+                    encoding="utf-8",
+                )
+                artifacts = {"documents": str(documents_path)}
+                if changes is not None:
+                    changes_path = run_dir / "document_changes.json"
+                    changes_path.write_text(json.dumps({"status": "ok", **changes}), encoding="utf-8")
+                    artifacts["document_changes"] = str(changes_path)
+                return run_processing(
+                    {
+                        "config": {
+                            "paths": {"data_interim": "data/interim"},
+                            "processing": {"near_duplicate": {"enabled": False}},
+                        },
+                        "repo_root": repo_root,
+                        "run_dir": run_dir,
+                        "artifacts": {"ingestion": artifacts},
+                    }
+                )
+
+            texts = {"doc_a": "Article 1. Keep records.\nArticle 2. Report.", "doc_b": "Article 1. Pay fees."}
+            first = run("run_1", texts, {"new": ["doc_a", "doc_b"], "changed": [], "removed": []})
+            texts["doc_b"] = "Article 1. Pay fees monthly.\nArticle 2. Keep receipts."
+            second = run("run_2", texts, {"new": [], "changed": ["doc_b"], "removed": ["doc_c"]})
+            full = run("run_3", texts, None)
+
+            stats = [
+                records.read_header(result["normalized_segments"])["execution"].get("segmentation")
+                for result in (first, second, full)
+            ]
+            self.assertEqual((stats[0]["reused"], stats[0]["segmented"]), (0, 2))
+            self.assertEqual((stats[1]["reused"], stats[1]["segmented"], stats[1]["removed"]), (1, 1, 1))
+            self.assertIsNone(stats[2])
+            self.assertEqual(
+                list(records.iter_records(second["normalized_segments"], "segments")),
+                list(records.iter_records(full["normalized_segments"], "segments")),
+            )
+
+    def test_version_groups_follow_replacement_chains(self) -> None:
+        documents = [
+            {"doc_id": "b2", "replaces_doc_id": "b1"},
+            {"doc_id": "a1"},
+            {"doc_id": "b3", "replaces_doc_id": "b2"},
+            {"doc_id": "b1"},
+            {"doc_id": ""},
+        ]
+        self.assertEqual(processing._version_groups(documents), [[0, 2, 3], [1], [4]])
 
 
 if __name__ == "__main__":
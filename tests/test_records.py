@@ -0,0 +1,39 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from regdelta import records
+
+
+class RecordArtifactTests(unittest.TestCase):
+    def test_sharded_records_round_trip_behind_header(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            header_path = Path(tmp_dir) / "deltas.json"
+            items = [{"clause_id": f"cl_{idx}", "text": "Điều khoản"} for idx in range(5)]
+
+            records.write_records(header_path, {"status": "ok", "delta_count": 5}, iter(items), shard_records=2)
+
+            header = records.read_header(header_path)
+            self.assertEqual(header["record_count"], 5)
+            self.assertEqual(header["shards"], ["deltas-00000.jsonl", "deltas-00001.jsonl", "deltas-00002.jsonl"])
+            self.assertEqual(list(records.iter_records(header_path, "deltas")), items)
+
+            # Rewriting unsharded removes the old shards.
+            records.write_records(header_path, {"status": "ok"}, items[:1])
+            self.assertEqual(sorted(path.name for path in Path(tmp_dir).iterdir()), ["deltas.json", "deltas.jsonl"])
+            self.assertEqual(list(records.iter_records(header_path, "deltas")), items[:1])
+
+    def test_reads_single_object_artifacts_from_older_runs(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "normalized_segments.json"
+            path.write_text(json.dumps({"status": "ok", "segments": [{"segment_id": "a:cl_1"}]}), encoding="utf-8")
+            self.assertEqual(list(records.iter_records(path, "segments")), [{"segment_id": "a:cl_1"}])
+
+            path.write_text(json.dumps({"segments": "broken"}), encoding="utf-8")
+            with self.assertRaises(ValueError):
+                list(records.iter_records(path, "segments"))
+
+
+if __name__ == "__main__":
+    unittest.main()
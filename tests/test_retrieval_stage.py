@@ -2,7 +2,11 @@ import json
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
+from regdelta import diff, parallel
+from regdelta.cache import LRUCache
+from regdelta.stages import retrieval
 from regdelta.stages.retrieval import run_retrieval
 
 
@@ -68,6 +72,437 @@ class RetrievalStageTests(unittest.TestCase):
             self.assertEqual(index_payload["index"]["segment_count"], 3)
             self.assertGreater(index_payload["index"]["vocabulary_size"], 0)
 
+    def test_reuses_persisted_index_across_runs(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+            segments_path = repo_root / "normalized_segments.json"
+            segments_path.write_text(
+                json.dumps(
+                    {
+                        "status": "ok",
+                        "segments": [
+                            {
+                                "segment_id": f"doc_{idx}:cl_1",
+                                "doc_id": f"doc_{idx}",
+                                "clause_id": "cl_1",
+                                "text": f"Clause {idx} requires a report every {idx} days.",
+                            }
+                            for idx in range(1, 6)
+                        ],
+                    }
+                ),
+                encoding="utf-8",
+            )
+
+            payloads = []
+            storage_infos = []
+            cache_stats = []
+            for run_name in ("run_1", "run_2"):
+                run_dir = repo_root / "artifacts" / "logs" / "runs" / run_name
+                run_dir.mkdir(parents=True, exist_ok=True)
+                context = {
+                    "config": {
+                        "paths": {"indices": "artifacts/indices"},
+                        "retrieval": {
+                            "top_k": 3,
+                            "rerank_top_k": 2,
+                            "queries": [{"query_id": "q_1", "query_text": "report 3 days"}],
+                        },
+                    },
+                    "repo_root": repo_root,
+                    "run_dir": run_dir,
+                    "artifacts": {"processing": {"normalized_segments": str(segments_path)}},
+                }
+                result = run_retrieval(context)
+                payloads.append(
+                    json.loads(Path(result["retrieval_candidates"]).read_text(encoding="utf-8"))
+                )
+                index_payload = json.loads(Path(result["evidence_index"]).read_text(encoding="utf-8"))
+                storage_infos.append(index_payload["storage"])
+                stats = json.loads(Path(result["retrieval_stats"]).read_text(encoding="utf-8"))
+                cache_stats.append(stats["cache"])
+
+            self.assertEqual((cache_stats[0]["hits"], cache_stats[0]["misses"]), (0, 1))
+            self.assertEqual((cache_stats[1]["hits"], cache_stats[1]["misses"]), (1, 0))
+            self.assertFalse(storage_infos[0]["reused"])
+            self.assertTrue(storage_infos[1]["reused"])
+            self.assertTrue(Path(storage_infos[1]["path"]).exists())
+            self.assertEqual(payloads[0]["candidates"], payloads[1]["candidates"])
+
+    def test_applies_incremental_updates_to_persisted_index(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+            segments = [
+                {
+                    "segment_id": f"doc_{idx}:cl_1",
+                    "doc_id": f"doc_{idx}",
+                    "clause_id": "cl_1",
+                    "text": f"Clause {idx} requires a report every {idx} days.",
+                }
+                for idx in range(1, 11)
+            ]
+            amended = [dict(segment) for segment in segments[:-1]]
+            amended[2]["text"] = "Clause 3 requires an audit report every 3 days."
+            amended.append(
+                {"segment_id": "doc_11:cl_1", "doc_id": "doc_11", "clause_id": "cl_1", "text": "New audit duty."}
+            )
+
+            def run(run_name: str, corpus: list, persist: bool) -> tuple[dict, dict]:
+                run_dir = repo_root / "artifacts" / "logs" / "runs" / run_name
+                segments_path = run_dir / "normalized_segments.json"
+                segments_path.parent.mkdir(parents=True, exist_ok=True)
+                segments_path.write_text(json.dumps({"status": "ok", "segments": corpus}), encoding="utf-8")
+                context = {
+                    "config": {
+                        "paths": {"indices": "artifacts/indices"},
+                        "retrieval": {
+                            "top_k": 4,
+                            "rerank_top_k": 2,
+                            "persist_index": persist,
+                            "queries": [{"query_id": "q_1", "query_text": "audit report 3 days"}],
+                        },
+                    },
+                    "repo_root": repo_root,
+                    "run_dir": run_dir,
+                    "artifacts": {"processing": {"normalized_segments": str(segments_path)}},
+                }
+                result = run_retrieval(context)
+                return (
+                    json.loads(Path(result["retrieval_candidates"]).read_text(encoding="utf-8")),
+                    json.loads(Path(result["evidence_index"]).read_text(encoding="utf-8")),
+                )
+
+            _, first_index = run("run_1", segments, True)
+            incremental, second_index = run("run_2", amended, True)
+            rebuilt, rebuilt_index = run("run_3", amended, False)
+
+            self.assertEqual(first_index["index_version"], 1)
+            self.assertEqual(second_index["index_version"], 2)
+            self.assertEqual(
+                second_index["storage"]["update"],
+                {"mode": "incremental", "added": 1, "updated": 1, "removed": 1},
+            )
+            self.assertEqual(second_index["storage"]["parts"], 2)
+            self.assertEqual(second_index["index"]["segment_count"], 10)
+            self.assertEqual(
+                second_index["index"]["term_document_frequency"],
+                rebuilt_index["index"]["term_document_frequency"],
+            )
+            self.assertEqual(incremental["candidates"], rebuilt["candidates"])
+
+            # The index changed, so run_2 could not be served from run_1's cache.
+            stats_path = repo_root / "artifacts" / "logs" / "runs" / "run_2" / "retrieval" / "retrieval_stats.json"
+            cache_stats = json.loads(stats_path.read_text(encoding="utf-8"))["cache"]
+            self.assertEqual((cache_stats["hits"], cache_stats["misses"]), (0, 1))
+
+    def test_batch_scoring_mode_matches_per_query_output(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+            segments_path = repo_root / "normalized_segments.json"
+            words = ["report", "deadline", "tax", "license", "notify", "records", "audit"]
+            segments_path.write_text(
+                json.dumps(
+                    {
+                        "segments": [
+                            {
+                                "segment_id": f"doc_{idx}:cl_1",
+                                "doc_id": f"doc_{idx}",
+                                "clause_id": "cl_1",
+                                "text": " ".join(words[(idx * step) % len(words)] for step in range(1, 5)),
+                            }
+                            for idx in range(20)
+                        ]
+                    }
+                ),
+                encoding="utf-8",
+            )
+            queries = [
+                {"query_id": f"q_{idx}", "query_text": f"{words[idx % 7]} {words[(idx * 3) % 7]}"}
+                for idx in range(9)
+            ]
+
+            outputs = []
+            for batch_size in (0, 4):
+                run_dir = repo_root / f"run_batch_{batch_size}"
+                run_dir.mkdir()
+                context = {
+                    "config": {
+                        "retrieval": {
+                            "top_k": 3,
+                            "rerank_top_k": 2,
+                            "batch_size": batch_size,
+                            "queries": queries,
+                        }
+                    },
+                    "repo_root": repo_root,
+                    "run_dir": run_dir,
+                    "artifacts": {"processing": {"normalized_segments": str(segments_path)}},
+                }
+                result = run_retrieval(context)
+                outputs.append(Path(result["retrieval_candidates"]).read_bytes())
+
+            self.assertEqual(outputs[0], outputs[1])
+
+    def test_parallel_execution_is_byte_identical_to_serial(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+            segments_path = repo_root / "normalized_segments.json"
+            words = ["báo", "cáo", "thuế", "giấy", "phép", "kiểm", "toán", "hồ", "sơ"]
+            segments_path.write_text(
+                json.dumps(
+                    {
+                        "segments": [
+                            {
+                                "segment_id": f"doc_{idx}:cl_{idx % 3 + 1}",
+                                "doc_id": f"doc_{idx}",
+                                "clause_id": f"cl_{idx % 3 + 1}",
+                                "text": " ".join(words[(idx + step * 2) % len(words)] for step in range(5)),
+                            }
+                            for idx in range(40)
+                        ]
+                    },
+                    ensure_ascii=False,
+                ),
+                encoding="utf-8",
+            )
+            queries = [
+                {"query_id": f"q_{idx}", "query_text": f"{words[idx % 9]} {words[(idx * 4) % 9]}"}
+                for idx in range(30)
+            ]
+
+            outputs = []
+            for label, workers, paths in (
+                ("serial", 1, {}),
+                ("forked", 3, {}),
+                ("mapped", 3, {"indices": "artifacts/indices"}),
+            ):
+                run_dir = repo_root / f"run_{label}"
+                run_dir.mkdir()
+                context = {
+                    "config": {
+                        "paths": paths,
+                        "runtime": {"max_workers": workers},
+                        "retrieval": {
+                            "top_k": 4,
+                            "rerank_top_k": 2,
+                            "parallel_min_queries": 0,
+                            "queries": queries,
+                        },
+                    },
+                    "repo_root": repo_root,
+                    "run_dir": run_dir,
+                    "artifacts": {"processing": {"normalized_segments": str(segments_path)}},
+                }
+                result = run_retrieval(context)
+                outputs.append(Path(result["retrieval_candidates"]).read_bytes())
+                stats = json.loads(Path(result["retrieval_stats"]).read_text(encoding="utf-8"))
+                expected = "serial" if workers == 1 else "parallel"
+                self.assertEqual(stats["queries"]["execution"], expected)
+                # Repeated query texts are scored once per run.
+                self.assertEqual(
+                    sum(item["query_count"] for item in stats["queries"]["per_worker"]),
+                    len({query["query_text"] for query in queries}),
+                )
+
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertEqual(outputs[0], outputs[2])
+
+    def test_result_cache_is_closed_while_query_workers_run(self) -> None:
+        open_caches: list[LRUCache] = []
+
+        class TrackedCache(LRUCache):
+            def __init__(self, *args: object, **kwargs: object) -> None:
+                super().__init__(*args, **kwargs)
+                open_caches.append(self)
+
+            def close(self) -> None:
+                open_caches.remove(self)
+                super().close()
+
+        process_pool = parallel.process_pool
+
+        def checked_pool(*args: object, **kwargs: object) -> object:
+            # A forked worker must not inherit an open SQLite connection.
+            self.assertEqual(open_caches, [])
+            return process_pool(*args, **kwargs)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+            segments_path = repo_root / "normalized_segments.json"
+            segments_path.write_text(
+                json.dumps(
+                    {
+                        "segments": [
+                            {"segment_id": f"doc_{idx}:cl_1", "doc_id": f"doc_{idx}", "clause_id": "cl_1", "text": f"Report {idx} due."}
+                            for idx in range(6)
+                        ]
+                    }
+                ),
+                encoding="utf-8",
+            )
+            context = {
+                "config": {
+                    "paths": {"indices": "artifacts/indices"},
+                    "runtime": {"max_workers": 2},
+                    "retrieval": {
+                        "top_k": 2,
+                        "parallel_min_queries": 0,
+                        "queries": [{"query_id": f"q_{idx}", "query_text": f"report {idx}"} for idx in range(4)],
+                    },
+                },
+                "repo_root": repo_root,
+                "run_dir": repo_root / "run",
+                "artifacts": {"processing": {"normalized_segments": str(segments_path)}},
+            }
+            with mock.patch.object(retrieval, "LRUCache", TrackedCache), mock.patch.object(
+                parallel, "process_pool", checked_pool
+            ):
+                result = run_retrieval(context)
+                self.assertEqual(open_caches, [])
+                stats = json.loads(Path(result["retrieval_stats"]).read_text(encoding="utf-8"))
+                self.assertEqual(stats["queries"]["execution"], "parallel")
+                self.assertEqual((stats["cache"]["hits"], stats["cache"]["misses"]), (0, 4))
+
+                context["config"]["retrieval"]["queries"].append({"query_id": "q_new", "query_text": "report 5"})
+                with mock.patch.object(retrieval, "_execute_queries", side_effect=RuntimeError("boom")):
+                    with self.assertRaises(RuntimeError):
+                        run_retrieval(context)
+                self.assertEqual(open_caches, [])
+
+    def test_hybrid_mode_fuses_dense_and_lexical_legs(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+            run_dir = repo_root / "artifacts" / "logs" / "runs" / "hybrid"
+            run_dir.mkdir(parents=True, exist_ok=True)
+            segments_path = repo_root / "normalized_segments.json"
+            texts = [
+                "Reporting obligations apply to licensed entities.",
+                "Submit a report before the deadline.",
+                "Keep accounting records for ten years.",
+                "Notify the regulator about incidents.",
+            ]
+            segments_path.write_text(
+                json.dumps(
+                    {
+                        "segments": [
+                            {
+                                "segment_id": f"doc_{idx}:cl_1",
+                                "doc_id": f"doc_{idx}",
+                                "clause_id": "cl_1",
+                                "text": text,
+                            }
+                            for idx, text in enumerate(texts)
+                        ]
+                    }
+                ),
+                encoding="utf-8",
+            )
+            context = {
+                "config": {
+                    "paths": {"indices": "artifacts/indices"},
+                    "retrieval": {
+                        "mode": "hybrid",
+                        "top_k": 3,
+                        "rerank_top_k": 1,
+                        "dense": {"dimension": 64, "nprobe": 4},
+                        "queries": [{"query_id": "q_1", "query_text": "reporting deadline"}],
+                    },
+                },
+                "repo_root": repo_root,
+                "run_dir": run_dir,
+                "artifacts": {"processing": {"normalized_segments": str(segments_path)}},
+            }
+
+            result = run_retrieval(context)
+
+            payload = json.loads(Path(result["retrieval_candidates"]).read_text(encoding="utf-8"))
+            self.assertEqual(payload["mode"], "hybrid")
+            doc_ids = {item["doc_id"] for item in payload["candidates"][0]["candidates"]}
+            # "reporting" only matches doc_0 through the dense leg's character n-grams.
+            self.assertIn("doc_0", doc_ids)
+            self.assertIn("doc_1", doc_ids)
+
+            stats = json.loads(Path(result["retrieval_stats"]).read_text(encoding="utf-8"))
+            self.assertEqual(set(stats["legs"]), {"lexical", "dense", "fusion"})
+            index_payload = json.loads(Path(result["evidence_index"]).read_text(encoding="utf-8"))
+            self.assertEqual(index_payload["dense"]["vector_count"], 4)
+            self.assertTrue(Path(index_payload["dense"]["path"]).exists())
+            self.assertEqual(index_payload["dense"]["centroids"], "trained")
+
+            # An incremental update rebuilds the vectors but keeps the trained centroids.
+            segments = json.loads(segments_path.read_text(encoding="utf-8"))["segments"]
+            segments.append(
+                {"segment_id": "doc_4:cl_1", "doc_id": "doc_4", "clause_id": "cl_1", "text": "Report incidents promptly."}
+            )
+            segments_path.write_text(json.dumps({"segments": segments}), encoding="utf-8")
+            context["run_dir"] = repo_root / "artifacts" / "logs" / "runs" / "hybrid_2"
+            result = run_retrieval(context)
+
+            updated = json.loads(Path(result["evidence_index"]).read_text(encoding="utf-8"))["dense"]
+            self.assertEqual(updated["vector_count"], 5)
+            self.assertEqual(updated["centroids"], "reused")
+            self.assertEqual(updated["nlist"], index_payload["dense"]["nlist"])
+            self.assertNotEqual(updated["path"], index_payload["dense"]["path"])
+
+    def test_delta_queries_use_changed_spans(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_root = Path(tmp_dir)
+            run_dir = repo_root / "run"
+            run_dir.mkdir(parents=True, exist_ok=True)
+            segments_path = repo_root / "normalized_segments.json"
+            segments_path.write_text(
+                json.dumps(
+                    {
+                        "segments": [
+                            {"segment_id": "doc_new:cl_2", "doc_id": "doc_new", "clause_id": "cl_2",
+                             "text": "Article 2 Submit report within 15 days."},
+                            {"segment_id": "doc_x:cl_1", "doc_id": "doc_x", "clause_id": "cl_1",
+                             "text": "Article 2 Submit report to the ministry."},
+                        ]
+                    }
+                ),
+                encoding="utf-8",
+            )
+            old_text = "Article 2 Submit report within 30 days."
+            new_text = "Article 2 Submit report within 15 days."
+            deltas_path = repo_root / "deltas.json"
+            deltas_path.write_text(
+                json.dumps(
+                    {
+                        "deltas": [
+                            {
+                                "change_type": "amended",
+                                "old_text": old_text,
+                                "new_text": new_text,
+                                "changed_spans": diff.word_spans(old_text, new_text),
+                            },
+                            {"change_type": "added", "new_text": "Notify regulator within 5 days."},
+                        ]
+                    }
+                ),
+                encoding="utf-8",
+            )
+
+            def query_texts(delta_query: dict[str, object]) -> list[str]:
+                context = {
+                    "config": {"retrieval": {"mode": "lexical", "top_k": 2, "delta_query": delta_query}},
+                    "repo_root": repo_root,
+                    "run_dir": run_dir,
+                    "artifacts": {
+                        "processing": {"normalized_segments": str(segments_path), "deltas": str(deltas_path)}
+                    },
+                }
+                result = run_retrieval(context)
+                payload = json.loads(Path(result["retrieval_candidates"]).read_text(encoding="utf-8"))
+                self.assertEqual(payload["candidates"][0]["candidates"][0]["doc_id"], "doc_new")
+                return [item["query_text"] for item in payload["candidates"]]
+
+            self.assertEqual(
+                query_texts({"context_tokens": 1}),
+                ["within 15 days", "Notify regulator within 5 days."],
+            )
+            self.assertEqual(query_texts({"mode": "full_text"})[0], new_text)
+
 
 if __name__ == "__main__":
     unittest.main()
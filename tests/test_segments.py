@@ -0,0 +1,43 @@
+import pickle
+import unittest
+
+from regdelta.segments import SegmentTable
+
+RECORDS = [
+    {"segment_id": "nd_01:cl_1", "doc_id": "nd_01", "clause_id": "cl_1", "text": "Điều 1. Phạm vi.", "token_count": 3},
+    {"segment_id": "nd_01:cl_2", "doc_id": "nd_01", "clause_id": "cl_2", "text": "Điều 2. Báo cáo.", "token_count": 3},
+    {"segment_id": "custom-id", "doc_id": None, "clause_id": "cl_1", "text": "", "note": ["x"]},
+]
+
+
+class SegmentTableTests(unittest.TestCase):
+    def test_views_round_trip_the_original_records(self) -> None:
+        table = SegmentTable.from_records(RECORDS)
+        self.assertEqual(list(table.records()), RECORDS)
+        self.assertEqual(list(table.segment_ids), ["nd_01:cl_1", "nd_01:cl_2", "custom-id"])
+        segment = table[1]
+        self.assertEqual(segment.get("text"), "Điều 2. Báo cáo.")
+        self.assertIsNone(segment.get("missing"))
+        self.assertNotIn("token_count", table[2])
+        self.assertEqual(table[-1]["note"], ["x"])
+        with self.assertRaises(IndexError):
+            table[3]
+        self.assertEqual(list(pickle.loads(pickle.dumps(table)).records()), RECORDS)
+
+    def test_select_and_copy_rows_keep_extras(self) -> None:
+        table = SegmentTable.from_records(RECORDS)
+        selected = table.select([2, 0])
+        selected.set_extra(1, "duplicate_segment_ids", ["nd_02:cl_1"])
+        self.assertEqual(
+            [dict(segment) for segment in selected],
+            [RECORDS[2], {**RECORDS[0], "duplicate_segment_ids": ["nd_02:cl_1"]}],
+        )
+        self.assertNotIn("duplicate_segment_ids", table[0])
+
+        stats = table.memory_stats()
+        self.assertEqual(stats["segment_count"], 3)
+        self.assertGreater(stats["bytes_per_segment"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import threading
+import unicodedata
+import unittest
+
+from regdelta import tokenizer
+
+
+class TokenizerTests(unittest.TestCase):
+    def test_composed_and_decomposed_text_share_tokens(self) -> None:
+        tok = tokenizer.Tokenizer()
+        text = "Điều 5. Thuế suất ưu đãi"
+        nfd = unicodedata.normalize("NFD", text)
+        self.assertNotEqual(text, nfd)
+        self.assertEqual(tok.token_ids(nfd), tok.token_ids(text))
+        self.assertEqual(tok.tokens(nfd), ["điều", "5", "thuế", "suất", "ưu", "đãi"])
+
+    def test_tone_placement_and_case_fold(self) -> None:
+        self.assertEqual(tokenizer.normalize("HOÀ bình"), tokenizer.normalize("hòa bình"))
+        self.assertEqual(tokenizer.normalize("thuỷ lợi, khoẻ"), "thủy lợi, khỏe")
+        # Closed syllables and the "qu" consonant keep their spelling.
+        self.assertEqual(tokenizer.normalize("hoàng quý"), "hoàng quý")
+
+    def test_tokenized_text_is_cached_by_checksum(self) -> None:
+        tok = tokenizer.Tokenizer(max_cached=2)
+        first = tok.token_ids("Doanh nghiệp nộp báo cáo")
+        self.assertIs(tok.token_ids("Doanh nghiệp nộp báo cáo"), first)
+        tok.token_ids("a")
+        tok.token_ids("b")
+        self.assertIsNot(tok.token_ids("Doanh nghiệp nộp báo cáo"), first)
+        stats = tok.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["cached_texts"]), (1, 4, 2))
+        self.assertEqual(stats["vocabulary_size"], 7)
+
+    def test_concurrent_threads_assign_distinct_ids(self) -> None:
+        tok = tokenizer.Tokenizer(max_cached=64)
+        texts = [f"điều {idx} khoản {idx % 7} mục {idx * 31}" for idx in range(400)]
+        barrier = threading.Barrier(4)
+
+        def work(offset: int) -> None:
+            barrier.wait()
+            for text in texts[offset:] + texts[:offset]:
+                tok.token_ids(text)
+
+        threads = [threading.Thread(target=work, args=(offset,)) for offset in (0, 100, 200, 300)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(tok.vocabulary)), len(tok.vocabulary))
+        for text in texts:
+            self.assertEqual(tok.tokens(text), tokenizer.normalize(text).split())
+
+
+if __name__ == "__main__":
+    unittest.main()
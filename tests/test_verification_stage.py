@@ -143,6 +143,41 @@ class VerificationStageFeatureTests(unittest.TestCase):
             self.assertEqual(report_payload["abstained"], 1)
             self.assertEqual(report_payload["abstained_claim_ids"], ["claim_002"])
 
+    def test_candidates_without_ids_are_scored_separately(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            run_dir = Path(tmp_dir) / "run"
+            draft_path = run_dir / "compliance_pack_draft.json"
+            retrieval_path = run_dir / "retrieval_candidates.json"
+            run_dir.mkdir(parents=True)
+            draft_path.write_text(
+                json.dumps({"claims": [{"claim_id": "claim_001", "statement": "tax rate reduced", "citations": []}]}),
+                encoding="utf-8",
+            )
+            # Neither candidate has segment/doc/clause ids; only the second supports the claim.
+            retrieval_path.write_text(
+                json.dumps(
+                    {
+                        "candidates": [
+                            {"query_id": "q_1", "candidates": [{"text": "Inspection procedures were clarified."}]},
+                            {"query_id": "q_2", "candidates": [{"text": "The tax rate is reduced."}]},
+                        ]
+                    }
+                ),
+                encoding="utf-8",
+            )
+            context = {
+                "config": {"verification": {"claim_confidence_threshold": 0.7}},
+                "run_dir": run_dir,
+                "artifacts": {
+                    "generation": {"compliance_pack_draft": str(draft_path)},
+                    "retrieval": {"retrieval_candidates": str(retrieval_path)},
+                },
+            }
+
+            result = run_verification(context)
+            report = json.loads(Path(result["abstention_report"]).read_text(encoding="utf-8"))
+            self.assertEqual((report["supported"], report["abstained"]), (1, 0))
+
 
 if __name__ == "__main__":
     unittest.main()
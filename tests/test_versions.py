@@ -0,0 +1,77 @@
+import unittest
+
+from regdelta import diff, versions
+
+
+def _clauses(texts: list[str]) -> list[tuple[str, str]]:
+    return [(f"cl_{idx}", text) for idx, text in enumerate(texts, start=1)]
+
+
+V1 = _clauses(
+    [
+        "Điều 1. Phạm vi điều chỉnh.",
+        "Điều 2. Doanh nghiệp nộp báo cáo trong 30 ngày.",
+        "Điều 3. Hồ sơ được lưu trữ mười năm.",
+        "Điều 4. Cơ quan thuế kiểm tra định kỳ.",
+    ]
+)
+V2 = _clauses(
+    [
+        "Điều 1. Phạm vi điều chỉnh.",
+        "Điều 1a. Đối tượng áp dụng.",
+        "Điều 2. Doanh nghiệp nộp báo cáo trong 15 ngày.",
+        "Điều 3. Hồ sơ được lưu trữ mười năm.",
+        "Điều 4. Cơ quan thuế kiểm tra định kỳ.",
+    ]
+)
+V3 = _clauses(
+    [
+        "Điều 1. Phạm vi điều chỉnh.",
+        "Điều 1a. Đối tượng áp dụng.",
+        "Điều 2. Doanh nghiệp nộp báo cáo trong 15 ngày làm việc.",
+        "Điều 4. Cơ quan thuế kiểm tra định kỳ.",
+    ]
+)
+
+
+class VersionHistoryTests(unittest.TestCase):
+    def test_composed_deltas_match_a_direct_diff(self) -> None:
+        steps = [
+            versions.clause_links(versions.pair_record(V1, V2, 0.5, diff.MAX_EDIT_DISTANCE)),
+            versions.clause_links(versions.pair_record(V2, V3, 0.5, diff.MAX_EDIT_DISTANCE)),
+        ]
+        composed = versions.compose(V1, V3, steps)
+        direct = diff.diff_clauses(V1, V3)
+
+        def summary(deltas: list[dict]) -> list[tuple]:
+            return sorted(
+                (d["change_type"], d["old_clause_id"] or "", d["new_clause_id"] or "", d["old_text"], d["new_text"])
+                for d in deltas
+            )
+
+        self.assertEqual(summary(composed), summary(direct))
+        self.assertEqual(
+            sorted(d["change_type"] for d in composed), ["added", "amended", "repealed"]
+        )
+
+    def test_graph_paths_chains_and_cycles(self) -> None:
+        graph = versions.VersionGraph.from_documents(
+            [
+                {"doc_id": "v1"},
+                {"doc_id": "v2", "replaces_doc_id": "v1"},
+                {"doc_id": "v3", "replaces_doc_id": "v2"},
+                {"doc_id": "v2_hop_nhat", "replaces_doc_id": "v1"},
+                {"doc_id": "orphan", "replaces_doc_id": "missing"},
+                {"doc_id": "x", "replaces_doc_id": "y"},
+                {"doc_id": "y", "replaces_doc_id": "x"},
+            ]
+        )
+        self.assertEqual(graph.path("v1", "v3"), ["v1", "v2", "v3"])
+        self.assertIsNone(graph.path("v2_hop_nhat", "v3"))
+        self.assertEqual(graph.chains(), [["v1", "v2_hop_nhat"], ["v1", "v2", "v3"]])
+        self.assertEqual(graph.lineage("x"), ["x", "y"])
+        self.assertNotIn("orphan", graph.parents)
+
+
+if __name__ == "__main__":
+    unittest.main()